@@ -5,15 +5,31 @@
 Options:
     --apikey=    if not provided, will ask interactively
     --fqdn=      if not provided, will ask interactively
+    --timeout=SECS
+                 give up on each of tklbam-init, hubdns-init and
+                 hubdns-update after SECS (default: 120)
+    --probe-timeout=SECS
+                 give up on reaching the Hub (DNS lookup & connection) after
+                 SECS (default: 5)
+    --hub=HOST[:PORT]
+                 Hub address to check for connectivity
+                 (default: inithooks_netcheck's hub endpoint,
+                 hub.turnkeylinux.org:443)
+    --json       print the result of each step as JSON (with --apikey)
+
+With --apikey, TKLBAM and HubDNS are initialized concurrently. Whether the
+Hub can be reached is checked (and cached) with inithooks_netcheck.
 """
 
 import sys
 import getopt
+import os
 import signal
-import subprocess
-from typing import NoReturn
+import time
+from typing import NamedTuple, NoReturn
 
-from libinithooks.dialog_wrapper import Dialog
+STEP_TIMEOUT = 120.0
+PROBE_TIMEOUT = 5.0
 
 TEXT_SERVICES = (
     "1) TurnKey Backup and Migration: saves changes to files,\n"
@@ -73,19 +89,116 @@ def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
     sys.exit(1)
 
 
+class Result(NamedTuple):
+    step: str
+    # None if timed out
+    returncode: int | None
+    output: str
+    duration: float
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+
+def probe(hub: str = "", timeout: float = PROBE_TIMEOUT) -> Result:
+    """Check that the Hub (default: the netcheck hub endpoint) can be
+    reached (see inithooks_netcheck)"""
+    from libinithooks import inithooks_netcheck
+
+    status = inithooks_netcheck.check(
+        {"hub": hub} if hub else ["hub"], timeout
+    )["hub"]
+    output = f"{status.address}: {status.message}"
+    if status.cached:
+        output += f" (checked {time.time() - status.checked:.0f}s ago)"
+    return Result("probe", 0 if status.ok else 1, output,
+                  0.0 if status.cached else status.duration)
+
+
+async def run_step(
+    step: str, command: list[str], timeout: float = STEP_TIMEOUT
+) -> Result:
+    """Run command; output is its stderr (or stdout if none)"""
+    import asyncio
+
+    start = time.monotonic()
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            # so that its children are killed too, if it times out
+            start_new_session=True,
+        )
+    except OSError as e:
+        return Result(step, 127, str(e), time.monotonic() - start)
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except TimeoutError:
+        os.killpg(proc.pid, signal.SIGKILL)
+        await proc.wait()
+        return Result(step, None, f"timed out after {timeout}s",
+                      time.monotonic() - start)
+    output = (stderr.strip() or stdout.strip()).decode(errors="replace")
+    return Result(step, proc.returncode, output, time.monotonic() - start)
+
+
+async def init_services(
+    apikey: str, fqdn: str, timeout: float = STEP_TIMEOUT
+) -> list[Result]:
+    """Initialize TKLBAM and (if fqdn) HubDNS concurrently"""
+    import asyncio
+
+    tklbam = asyncio.create_task(
+        run_step("tklbam-init", ["tklbam-init", apikey], timeout)
+    )
+    results = []
+    if fqdn:
+        hubdns_init = await run_step(
+            "hubdns-init", ["hubdns-init", apikey, fqdn], timeout
+        )
+        results.append(hubdns_init)
+        # nothing to update unless registered
+        if hubdns_init.ok:
+            results.append(
+                await run_step("hubdns-update", ["hubdns-update"], timeout)
+            )
+    return [await tklbam] + results
+
+
+def print_result(result: Result) -> None:
+    if result.ok:
+        print(f"INFO: {result.step} ok ({result.duration:.2f}s)")
+        return
+    status = "timed out" if result.returncode is None else (
+        f"failed - exit code {result.returncode}"
+    )
+    print(f"ERROR: {result.step} {status} ({result.duration:.2f}s)",
+          file=sys.stderr)
+    if result.output:
+        print(result.output, file=sys.stderr)
+
+
 def main():
     signal.signal(signal.SIGINT, signal.SIG_IGN)
     try:
         opts, _ = getopt.gnu_getopt(
             sys.argv[1:],
             "h",
-            ["help", "apikey=", "fqdn="],
+            ["help", "apikey=", "fqdn=", "timeout=", "probe-timeout=",
+             "hub=", "json"],
         )
     except getopt.GetoptError as e:
         usage(e)
 
     apikey = ""
     fqdn = ""
+    timeout = STEP_TIMEOUT
+    probe_timeout = PROBE_TIMEOUT
+    hub = ""
+    as_json = False
     for opt, val in opts:
         if opt in ("-h", "--help"):
             usage()
@@ -93,27 +206,50 @@ def main():
             apikey = val
         elif opt == "--fqdn":
             fqdn = val
+        elif opt in ("--timeout", "--probe-timeout"):
+            try:
+                secs = float(val)
+            except ValueError:
+                usage(f"invalid {opt}: '{val}'")
+            if opt == "--timeout":
+                timeout = secs
+            else:
+                probe_timeout = secs
+        elif opt == "--hub":
+            hub = val
+        elif opt == "--json":
+            as_json = True
 
     if apikey:
-        subprocess.run(
-            ["tklbam-init", apikey],
-            encoding=sys.stdin.encoding,
-            check=True,
-        )
+        import asyncio
 
-        if fqdn:
-            subprocess.run(
-                ["hubdns-init", apikey, fqdn],
-                encoding=sys.stdin.encoding,
-                check=True,
-            )
-            subprocess.run(
-                ["hubdns-update"],
-                encoding=sys.stdin.encoding,
-                check=True,
-            )
+        results = [probe(hub, probe_timeout)]
+        if results[0].ok:
+            results += asyncio.run(init_services(apikey, fqdn, timeout))
+        if as_json:
+            import json
+
+            print(json.dumps(
+                [dict(result._asdict(), ok=result.ok) for result in results],
+                indent=2,
+            ))
+        else:
+            for result in results:
+                print_result(result)
+        if not all(result.ok for result in results):
+            sys.exit(1)
         return
 
+    # only needed when interactive
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    from libinithooks.dialog_wrapper import Dialog
+
+    # check the Hub can be reached while the API key is entered
+    pool = ThreadPoolExecutor(max_workers=1)
+    hub_probe = pool.submit(probe, hub, probe_timeout)
+    pool.shutdown(wait=False)
+
     initialized_tklbam = False
     d = Dialog("TurnKey GNU/Linux - First boot configuration")
     while 1:
@@ -130,25 +266,19 @@ def main():
 
         d.infobox("Linking TKLBAM to the TurnKey Hub...")
 
-        hub_connect = subprocess.run(
-            ["host", "-W", "2", "hub.turnkeylinux.org"],
-            capture_output=True,
-        )
-        if hub_connect.returncode != 0:
+        if not hub_probe.result().ok:
             d.error(CONNECTIVITY_ERROR)
             break
 
-        tklbam_init = subprocess.run(
-            ["tklbam-init", apikey],
-            capture_output=True,
-            text=True,
+        tklbam_init = asyncio.run(
+            run_step("tklbam-init", ["tklbam-init", apikey], timeout)
         )
-        if tklbam_init.returncode == 0:
+        if tklbam_init.ok:
             d.msgbox("Success! Linked TKLBAM to Hub", SUCCESS_TKLBAM)
             initialized_tklbam = True
             break
         else:
-            d.msgbox("Failure", tklbam_init.stderr)
+            d.msgbox("Failure", tklbam_init.output)
             continue
 
     if initialized_tklbam:
@@ -166,21 +296,18 @@ def main():
 
             d.infobox("Linking HubDNS to the TurnKey Hub...")
 
-            hubdns_init = subprocess.run(
-                ["hubdns-init", apikey, fqdn],
-                capture_output=True,
-                text=True,
+            hubdns_init = asyncio.run(
+                run_step("hubdns-init", ["hubdns-init", apikey, fqdn],
+                         timeout)
             )
-            hubdns_update = subprocess.run(
-                ["hubdns-update"],
-                capture_output=True,
-                text=True,
-            )
-            if hubdns_init.returncode != 0:
-                d.msgbox("Failure", hubdns_init.stderr)
+            if not hubdns_init.ok:
+                d.msgbox("Failure", hubdns_init.output)
                 continue
-            elif hubdns_update.returncode != 0:
-                d.msgbox("Failure", hubdns_update.stderr)
+            hubdns_update = asyncio.run(
+                run_step("hubdns-update", ["hubdns-update"], timeout)
+            )
+            if not hubdns_update.ok:
+                d.msgbox("Failure", hubdns_update.output)
                 continue
             else:
                 d.msgbox(f"Success! Assigned {fqdn}", SUCCESS_HUBDNS)
@@ -4,6 +4,7 @@
 Options:
     --email=                if not provided, will ask interactively
     --email-placeholder=    placeholder when asking interactively
+                            (default: APP_EMAIL from inithooks cache)
 
 """
 
@@ -70,6 +71,11 @@ def main():
         fatal("email is not valid")
 
     if not email:
+        if not email_placeholder:
+            # only needed when interactive (imports sqlite3)
+            from libinithooks import inithooks_cache
+
+            email_placeholder = inithooks_cache.read("APP_EMAIL")
         d = Dialog("TurnKey Linux - First boot configuration")
         email = email_placeholder
         while 1:
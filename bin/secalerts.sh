@@ -3,6 +3,8 @@
 fatal() { echo "fatal [$(basename $0)]: $@" 1>&2; exit 1; }
 info() { echo "info [$(basename $0)]: $@"; }
 
+HUB_API="${HUB_API:-https://hub.turnkeylinux.org/api}"
+
 usage() {
 cat<<EOF
 Syntax: $(basename $0) email
@@ -32,11 +34,17 @@ configure_cronapt() {
     sed -i "s/^${key}=.*/$key=\"$val\"/" $cfg
 }
 
+# hub calls and mails are queued (and sent in the background, retried by
+# inithooks-outbox.timer if offline) rather than waited for
+outbox() {
+    python3 -m libinithooks.inithooks_outbox "$@"
+}
+
 send_enabled_notification() {
     info $FUNCNAME $@
     recipient=$1
     subject="[$(hostname)] system alerts and notifications enabled"
-    mail -s "$subject" $recipient <<EOF
+    outbox mail --key=secalerts-notification "$recipient" "$subject" <<EOF
 This server is configured to send you system alerts and notifications.
 For more information, see:
 https://www.turnkeylinux.org/security-alerts
@@ -54,20 +62,10 @@ enable_security_alerts() {
     [ -e "$f" ] && turnkey_version=$(sed "s/.*(\(.*\)).*/\1/" $f)
     [ -n "$turnkey_version" ] || turnkey_version=$(turnkey-version)
 
-    script=/etc/cron.hourly/enable_secalerts
-    cat>$script<<EOF
-#!/bin/bash -e
-# created by: $(readlink -f $0)
-curl https://hub.turnkeylinux.org/api/server/secalerts/ \\
-    -d email="$email" \\
-    -d turnkey_version="$turnkey_version" \\
-    --silent --fail --output /dev/null || exit 0
-
-rm -f \$0
-EOF
-
-    chmod +x $script
-    $script
+    # superseded by the outbox (if set up previously, with another email)
+    rm -f /etc/cron.hourly/enable_secalerts
+    outbox hub --key=secalerts "$HUB_API/server/secalerts/" \
+        email="$email" turnkey_version="$turnkey_version"
 }
 
 if [[ "$#" != "1" ]]; then
@@ -81,4 +79,5 @@ configure_cronapt "MAILON" "output"
 configure_cronapt "MAILTO" "root"
 send_enabled_notification "root"
 enable_security_alerts "$email"
-
+systemctl start --no-block inithooks-outbox.service 2>/dev/null \
+    || info "inithooks-outbox.service not started - queued items will be sent later"
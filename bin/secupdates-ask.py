@@ -6,7 +6,6 @@ import sys
 import getopt
 import signal
 import logging
-import subprocess
 from typing import NoReturn
 from libinithooks.dialog_wrapper import Dialog
 
@@ -52,12 +51,9 @@ def main():
     if not install:
         sys.exit(99)
 
-    try:
-        subprocess.run(
-            ["host", "-W", "2", "archive.turnkeylinux.org"],
-            check=True,
-        )
-    except subprocess.CalledProcessError:
+    from libinithooks import inithooks_netcheck
+
+    if not inithooks_netcheck.reachable("archive", "security"):
         d.error(CONNECTIVITY_ERROR)
         sys.exit(1)
 
@@ -1,20 +1,45 @@
 #!/usr/bin/python3
 # Copyright (c) 2010 Alon Swartz <alon@turnkeylinux.org>
-"""Set account password
+"""Set account password(s)
 
 Arguments:
-    username      username of account to set password for
+    username      username of account to set password for (unless --batch)
 
 Options:
-    -p --pass=    if not provided, will ask interactively
+    -p --pass=    if not provided, will ask interactively (note: --pass is
+                  visible in the process list; --batch isn't)
+    --batch       set the passwords of the accounts read from stdin (or
+                  --fd), one 'username:password' per line, with a single
+                  chpasswd; accounts with an empty password are asked for
+                  interactively
+    --fd=N        read --batch accounts from file descriptor N (so stdin
+                  is free to ask for passwords)
+    -e --encrypted
+                  --batch passwords are already hashed (as chpasswd -e)
+    --min-length=N
+                  minimum password length (default: 8)
+    --min-categories=N
+                  minimum number of character categories (lowercase,
+                  uppercase, numbers, symbols) in password (default: 3)
+    --strict      don't set a password given with --pass (or --batch) which
+                  doesn't meet the above (by default, a warning is printed)
+
+Exit codes:
+    0             all passwords set
+    1             at least one password not set (each is reported)
 """
 
+import os
+import pwd
+import re
 import sys
 import getopt
 import subprocess
 import signal
 from typing import NoReturn
 
+from libinithooks.inithooks_password import PasswordPolicy
+
 
 def fatal(
     msg: str | subprocess.TimeoutExpired | subprocess.CalledProcessError,
@@ -27,46 +52,173 @@ def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
     if msg:
         print(f"Error: {msg}", file=sys.stderr)
     print(f"Syntax: {sys.argv[0]} <username> [options]", file=sys.stderr)
+    print(f"Syntax: {sys.argv[0]} --batch [options]", file=sys.stderr)
     print(__doc__, file=sys.stderr)
     sys.exit(1)
 
 
+def read_entries(fob) -> list[tuple[str, str]]:
+    """Return [(username, password)] from 'username:password' lines"""
+    entries = []
+    for i, line in enumerate(fob, 1):
+        line = line.rstrip("\n")
+        if not line or line.startswith("#"):
+            continue
+        username, sep, password = line.partition(":")
+        if not sep or not username:
+            # don't echo the line; it may well be a password
+            raise ValueError(f"line {i}: expected 'username:password'")
+        entries.append((username, password))
+    return entries
+
+
+def chpasswd(
+    entries: list[tuple[str, str]], encrypted: bool = False
+) -> dict[str, str]:
+    """Set passwords with a single chpasswd; returns {username: error} of
+    those not set"""
+    if not entries:
+        return {}
+    command = ["chpasswd"]
+    if encrypted:
+        command.append("--encrypted")
+    proc = subprocess.run(
+        command,
+        input="".join(f"{user}:{password}\n" for user, password in entries)
+        .encode(),
+        capture_output=True,
+        # messages are parsed below
+        env=dict(os.environ, LC_ALL="C"),
+    )
+    if proc.returncode == 0:
+        return {}
+
+    # which users failed - e.g. "line 2: user 'foo' does not exist" or
+    # "(user foo) pam_chauthtok() failed"
+    stderr = proc.stderr.decode(errors="replace")
+    failed: dict[str, str] = {}
+    for line in stderr.splitlines():
+        match = re.search(r"line (\d+)", line)
+        if match and 0 < int(match.group(1)) <= len(entries):
+            user = entries[int(match.group(1)) - 1][0]
+            failed.setdefault(user, line.strip())
+            continue
+        match = re.search(r"\(user ([^)]+)\)", line)
+        if match:
+            failed.setdefault(match.group(1), line.strip())
+
+    rest = [entry for entry in entries if entry[0] not in failed]
+    if not failed or len(rest) == len(entries):
+        error = (
+            stderr.strip().splitlines()
+            or [f"chpasswd exit code {proc.returncode}"]
+        )[-1]
+        return {user: error for user, _ in entries}
+    if rest and "changes ignored" in stderr:
+        # none were set (e.g. chpasswd -e); once more without the failures
+        failed |= chpasswd(rest, encrypted)
+    return failed
+
+
 def main():
     signal.signal(signal.SIGINT, signal.SIG_IGN)
     try:
-        opts, args = getopt.gnu_getopt(sys.argv[1:], "hp:", ["help", "pass="])
+        opts, args = getopt.gnu_getopt(
+            sys.argv[1:],
+            "hp:e",
+            ["help", "pass=", "batch", "fd=", "encrypted", "min-length=",
+             "min-categories=", "strict"],
+        )
     except getopt.GetoptError as e:
         usage(e)
 
-    if len(args) != 1:
-        usage()
-
-    username = args[0]
     password = ""
+    batch = False
+    fd = 0
+    encrypted = False
+    min_length = 8
+    min_categories = 3
+    strict = False
     for opt, val in opts:
         if opt in ("-h", "--help"):
             usage()
         elif opt in ("-p", "--pass"):
             password = val
-
-    if not password:
-        from libinithooks.dialog_wrapper import Dialog
-
-        d = Dialog("TurnKey GNU/Linux - First boot configuration")
-        password = d.get_password(
-            f"{username.capitalize()} Password",
-            f"Please enter new password for the {username} account.",
-        )
-
-    assert password
-    command = ["chpasswd"]
-    std_input = ":".join([username, password])
-
-    try:
-        p = subprocess.Popen(command, stdin=subprocess.PIPE, shell=False)
-        p.communicate(std_input.encode(sys.stdin.encoding))
-    except (subprocess.TimeoutExpired, subprocess.CalledProcessError) as e:
-        fatal(e)
+        elif opt == "--batch":
+            batch = True
+        elif opt in ("-e", "--encrypted"):
+            encrypted = True
+        elif opt in ("--fd", "--min-length", "--min-categories"):
+            try:
+                if opt == "--fd":
+                    fd = int(val)
+                elif opt == "--min-length":
+                    min_length = int(val)
+                else:
+                    min_categories = int(val)
+            except ValueError:
+                usage(f"invalid {opt}: '{val}'")
+        elif opt == "--strict":
+            strict = True
+
+    if batch:
+        if args or password:
+            usage("--batch reads usernames and passwords from input")
+        try:
+            with open(fd, encoding="utf-8", closefd=fd != 0) as fob:
+                entries = read_entries(fob)
+        except (OSError, ValueError) as e:
+            fatal(e)
+    else:
+        if len(args) != 1 or encrypted:
+            usage()
+        entries = [(args[0], password)]
+
+    policy = PasswordPolicy(min_length, min_categories)
+    failed: dict[str, str] = {}
+    todo = []
+    for username, password in entries:
+        try:
+            pwd.getpwnam(username)
+        except KeyError:
+            failed[username] = "no such user"
+            continue
+        if not password and encrypted:
+            failed[username] = "no password given"
+            continue
+        if not password:
+            if batch and fd == 0:
+                # stdin is what was read, not a terminal
+                failed[username] = "no password given (and can't ask)"
+                continue
+            from libinithooks.dialog_wrapper import Dialog
+
+            d = Dialog("TurnKey GNU/Linux - First boot configuration")
+            password = d.get_password(
+                f"{username.capitalize()} Password",
+                f"Please enter new password for the {username} account.",
+                policy=policy,
+            )
+        elif not encrypted:
+            # preseeded; same policy as when asked interactively (but
+            # generated preseeds such as 'mcookie | cut -b 1-8' are still
+            # allowed)
+            errors = " ".join(policy.check(password))
+            if errors and strict:
+                failed[username] = errors
+                continue
+            elif errors:
+                print(f"Warning: {username} password - {errors}",
+                      file=sys.stderr)
+        assert password
+        todo.append((username, password))
+
+    failed |= chpasswd(todo, encrypted)
+    for username, error in failed.items():
+        print(f"Error: {username} password not set - {error}",
+              file=sys.stderr)
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
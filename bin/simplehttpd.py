@@ -15,6 +15,27 @@ Options:
     --runas=username
     --daemonize=/path/to/pidfile
     --logfile=/path/to/logfile
+    --engine=thread|fork        serve each connection from a bounded pool
+                                of threads (default) or a forked process
+    --max-connections=N         maximum number of concurrent connections
+                                (default: 40); further connections wait in
+                                the listen backlog
+    --keepalive-timeout=SECS    close idle (keep-alive) connections after
+                                SECS (default: 15)
+    --control=/path/to/socket   listen on a unix socket for --takeover
+    --takeover                  take over the listening sockets of the
+                                instance on --control (instead of binding
+                                them), then tell it to stop accepting; it
+                                exits once its in-flight requests are done
+
+Signals:
+
+    SIGHUP                      reload files from webroot (served from
+                                memory) and, if still readable, the TLS
+                                cert/key
+    SIGUSR1                     stop accepting connections and exit once
+                                in-flight requests are done
+    SIGTERM                     stop
 
 Known bugs:
 
@@ -22,20 +43,34 @@ Known bugs:
 
 """
 
+import email.utils
 import getopt
 import grp
+import gzip
+import hashlib
 import http.server
+import mimetypes
 import os
+import posixpath
 import pwd
 import signal
 import socket
 import socketserver
 import ssl
 import sys
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from os.path import abspath, exists, isdir, splitext
 from tempfile import NamedTemporaryFile
 from typing import NoReturn
+from urllib.parse import unquote, urlsplit
+
+from libinithooks.inithooks_cert import wait_for_cert
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 
 class SimpleWebServerError(Exception):
@@ -61,39 +96,6 @@ def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
     sys.exit(1)
 
 
-def wait_for_valid_cert(
-        certfile: str,
-        keyfile: str | None = None,
-        timeout: int = 30,
-        interval: float = 0.5,
-    ) -> None:
-    """Wait until certfile and keyfile exist and are a matching pair.
-
-    If keyfile is None, certfile is expected to contain both cert and key.
-    """
-    deadline = time.monotonic() + timeout
-
-    files_to_check = [f for f in (certfile, keyfile) if f is not None]
-
-    while time.monotonic() < deadline:
-        try:
-            # Relevant file/s must exist and be non-empty
-            if not all(os.path.getsize(f) > 0 for f in files_to_check):
-                time.sleep(interval)
-                continue
-
-            # Try loading it/them
-            ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
-            ctx.load_cert_chain(certfile=certfile, keyfile=keyfile)
-            return  # Success
-        except (ssl.SSLError, OSError):
-            time.sleep(interval)
-    raise TimeoutError(
-        f"Timed out after {timeout}s waiting for a valid cert/key pair: "
-        f"{certfile}, {keyfile}"
-    )
-
-
 def is_writeable(path: str) -> bool:
     if not os.path.exists(path):
         path = os.path.dirname(path)
@@ -124,6 +126,19 @@ def daemonize(pidfile: str, logfile: str | None = None) -> None:
 class SecureHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     ALLOWED_EXTS: list[str] = []
 
+    # keep-alive; every response (including errors) sets Content-Length
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately; without TCP_NODELAY the body
+    # waits for the client's delayed ACK of the headers on a kept alive
+    # connection (~40ms a response)
+    disable_nagle_algorithm = True
+
+    def end_headers(self) -> None:
+        if getattr(self.server, "draining", False):
+            # handed over to another server; don't keep the client here
+            self.send_header("Connection", "close")
+        super().end_headers()
+
     def list_directory(self, path: os.PathLike | str) -> None:
         _ = path
         self.send_error(404, "No permission to list directory")
@@ -139,17 +154,259 @@ class SecureHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         )
 
 
+class StaticAsset:
+    """A file held in memory, with precompressed variants"""
+
+    COMPRESSIBLE = ("text/", "application/javascript", "image/svg+xml")
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as fob:
+            self.body = fob.read()
+            mtime = os.fstat(fob.fileno()).st_mtime
+
+        ctype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.content_type = ctype
+        self.mtime = int(mtime)
+        self.last_modified = email.utils.formatdate(self.mtime, usegmt=True)
+        self.etag = f'"{hashlib.sha1(self.body).hexdigest()[:20]}"'
+
+        self.variants: dict[str, bytes] = {}
+        if ctype.startswith(self.COMPRESSIBLE):
+            encoded = gzip.compress(self.body, 9, mtime=0)
+            if len(encoded) < len(self.body):
+                self.variants["gzip"] = encoded
+            if brotli is not None:
+                encoded = brotli.compress(self.body)
+                if len(encoded) < len(self.body):
+                    self.variants["br"] = encoded
+
+    def negotiate(self, accept_encoding: str) -> tuple[str | None, bytes]:
+        """Return (content-encoding, body) best matching accept_encoding"""
+        accepted = set()
+        for item in accept_encoding.split(","):
+            coding, _, params = item.strip().partition(";")
+            q = params.strip().replace(" ", "")
+            if q in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                continue
+            accepted.add(coding.strip().lower())
+        for coding in ("br", "gzip"):
+            if coding in self.variants and coding in accepted:
+                return coding, self.variants[coding]
+        return None, self.body
+
+
+class StaticCache:
+    """Allowed files under webroot, preloaded into memory
+
+    Keyed by URL path; directories map to their index.html.
+    """
+
+    def __init__(self, webroot: str, allowed_exts: list[str]) -> None:
+        self.webroot = abspath(webroot)
+        self.allowed_exts = allowed_exts
+        self.assets: dict[str, StaticAsset] = {}
+
+    def load(self) -> None:
+        assets = {}
+        for dpath, _, fnames in os.walk(self.webroot):
+            for fname in fnames:
+                ext = splitext(fname)[1].lower()
+                if ext[1:] not in self.allowed_exts:
+                    continue
+                fpath = os.path.join(dpath, fname)
+                try:
+                    asset = StaticAsset(fpath)
+                except OSError:
+                    continue
+                urlpath = "/" + os.path.relpath(fpath, self.webroot)
+                assets[urlpath] = asset
+                if fname in ("index.html", "index.htm"):
+                    urldir = posixpath.dirname(urlpath).rstrip("/") + "/"
+                    if fname == "index.html" or urldir not in assets:
+                        assets[urldir] = asset
+        # swap in one go; requests in flight keep the old assets
+        self.assets = assets
+
+    def get(self, urlpath: str) -> StaticAsset | None:
+        return self.assets.get(urlpath)
+
+
+class CachedHTTPRequestHandler(SecureHTTPRequestHandler):
+    """Serve GET/HEAD from the server's StaticCache (if it has one)"""
+
+    def _lookup(self, cache: StaticCache) -> StaticAsset | None:
+        """Return the requested asset, or send a redirect/error & None"""
+        path = unquote(urlsplit(self.path).path)
+        trailing = path.endswith("/")
+        path = posixpath.normpath(path)
+        if path == ".":
+            path = "/"
+        if trailing and not path.endswith("/"):
+            path += "/"
+
+        asset = cache.get(path)
+        if asset is None and cache.get(path + "/") is not None:
+            self.send_response(301)
+            self.send_header("Location", self.path.split("?")[0] + "/")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return None
+        if asset is None:
+            self.send_error(404, "File not found")
+            return None
+        return asset
+
+    def _not_modified(self, asset: StaticAsset) -> bool:
+        inm = self.headers.get("If-None-Match")
+        if inm is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in inm.split(",")]
+            return "*" in tags or asset.etag in tags
+
+        ims = self.headers.get("If-Modified-Since")
+        if ims is not None:
+            try:
+                since = email.utils.parsedate_to_datetime(ims)
+            except (TypeError, ValueError):
+                return False
+            return asset.mtime <= int(since.timestamp())
+        return False
+
+    def _send_asset(self, head_only: bool) -> None:
+        cache = getattr(self.server, "static_cache", None)
+        if cache is None:
+            if head_only:
+                return super().do_HEAD()
+            return super().do_GET()
+
+        asset = self._lookup(cache)
+        if asset is None:
+            return
+
+        if self._not_modified(asset):
+            self.send_response(304)
+            self.send_header("ETag", asset.etag)
+            self.send_header("Last-Modified", asset.last_modified)
+            self.end_headers()
+            return
+
+        coding, body = asset.negotiate(
+            self.headers.get("Accept-Encoding", "")
+        )
+        self.send_response(200)
+        self.send_header("Content-Type", asset.content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", asset.etag)
+        self.send_header("Last-Modified", asset.last_modified)
+        if asset.variants:
+            self.send_header("Vary", "Accept-Encoding")
+        if coding:
+            self.send_header("Content-Encoding", coding)
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        self._send_asset(head_only=False)
+
+    def do_HEAD(self) -> None:
+        self._send_asset(head_only=True)
+
+
+class DualStackMixIn:
+    allow_reuse_address = True
+    address_family = socket.AF_INET6  # enables IPv6
+
+    # idle keep-alive connections (and stalled TLS handshakes) are closed
+    # after this many seconds
+    timeout_secs: float = 15
+
+    # connections are wrapped per request (rather than wrapping the listening
+    # socket) so reload() can swap in a new context
+    ssl_context: ssl.SSLContext | None = None
+
+    # set once stop() is called; handlers close keep-alive connections
+    draining = False
+
+    def server_bind(self):
+        # Disable IPV6_V6ONLY so the socket accepts IPv4 too (dual-stack)
+        self.socket.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 0)
+        super().server_bind()
+
+    def finish_request(self, request, client_address):
+        request.settimeout(self.timeout_secs)
+        if self.ssl_context is None:
+            return super().finish_request(request, client_address)
+
+        # handshake here (in the worker) rather than in accept()
+        try:
+            conn = self.ssl_context.wrap_socket(
+                request, server_side=True, do_handshake_on_connect=False
+            )
+        except (ssl.SSLError, OSError):
+            return
+        try:
+            conn.do_handshake()
+        except (ssl.SSLError, OSError):
+            conn.close()
+            return
+        try:
+            super().finish_request(conn, client_address)
+        finally:
+            self.shutdown_request(conn)
+
+
+class PoolingMixIn:
+    """Handle each connection in a bounded pool of worker threads
+
+    Once all workers are busy, accept() waits for one to become free, so
+    excess connections queue in the kernel's listen backlog.
+    """
+
+    max_connections = 40
+
+    _pool: ThreadPoolExecutor | None = None
+    _slots: threading.BoundedSemaphore | None = None
+
+    def process_request(self, request, client_address):
+        if self._pool is None or self._slots is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_connections)
+            self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._slots.acquire()
+        self._pool.submit(self._process_request_thread, request,
+                          client_address)
+
+    def _process_request_thread(self, request, client_address):
+        assert self._slots is not None
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self):
+        super().server_close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+
+
 class SimpleWebServer:
-    class TCPServer(socketserver.ForkingTCPServer):
-        allow_reuse_address = True
-        address_family = socket.AF_INET6  # enables IPv6
+    class ForkingTCPServer(DualStackMixIn, socketserver.ForkingTCPServer):
+        pass
 
-        def server_bind(self):
-            # Disable IPV6_V6ONLY so the socket accepts IPv4 too (dual-stack)
-            self.socket.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 0)
-            super().server_bind()
+    class ThreadingTCPServer(
+        DualStackMixIn, PoolingMixIn, socketserver.TCPServer
+    ):
+        pass
 
-    class HTTPRequestHandler(SecureHTTPRequestHandler):
+    ENGINES = {
+        "fork": ForkingTCPServer,
+        "thread": ThreadingTCPServer,
+    }
+    DEFAULT_ENGINE = "thread"
+
+    class HTTPRequestHandler(CachedHTTPRequestHandler):
         ALLOWED_EXTS = ["css", "gif", "html", "js", "png", "jpg", "txt"]
 
     class Address:
@@ -275,10 +532,28 @@ class SimpleWebServer:
         http_address: Address | None = None,
         https_conf: HTTPSConf | None = None,
         runas: str | None = None,
+        engine: str = DEFAULT_ENGINE,
+        max_connections: int = 40,
+        keepalive_timeout: float = 15,
+        control: str | None = None,
+        takeover: bool = False,
     ) -> None:
+        if engine not in self.ENGINES:
+            raise SimpleWebServerError(f"Unknown engine '{engine}'")
+        if takeover and not control:
+            raise SimpleWebServerError("takeover requires a control socket")
+        self.engine = engine
+        self.max_connections = max_connections
+        self.keepalive_timeout = keepalive_timeout
+
+        self._takeover_conn: socket.socket | None = None
+        inherited = self._take_over(control) if takeover and control else {}
+
         self.httpd = (
-            self.TCPServer(
-                (http_address.host, http_address.port), self.HTTPRequestHandler
+            self._make_server(
+                http_address.host,
+                http_address.port,
+                self._inherit(inherited, "http", http_address.port),
             )
             if http_address
             else None
@@ -295,25 +570,182 @@ class SimpleWebServer:
                 certfile = _certfile.name()
                 keyfile = _keyfile.name()
 
-            httpsd = self.TCPServer(
-                (https_conf.host, https_conf.port), self.HTTPRequestHandler
+            httpsd = self._make_server(
+                https_conf.host,
+                https_conf.port,
+                self._inherit(inherited, "https", https_conf.port),
+            )
+            httpsd.ssl_context = self._ssl_context(
+                certfile, keyfile, https_conf.CIPHERS
             )
 
-            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
-            context.load_cert_chain(certfile=certfile, keyfile=keyfile)
-            context.minimum_version = ssl.TLSVersion.TLSv1_2
-            context.maximum_version = ssl.TLSVersion.TLSv1_3
-            context.set_ciphers(https_conf.CIPHERS)
+        for sock in inherited.values():
+            sock.close()
 
-            httpsd.socket = context.wrap_socket(
-                httpsd.socket, server_side=True,
-            )
+        self._control = self._listen_control(control) if control else None
 
         if runas:
             self.drop_privileges(runas)
 
         self.httpsd = httpsd
+        self.https_conf = https_conf
         self.webroot = webroot
+        self._children: list[int] = []
+        self._serving: list[socketserver.TCPServer] = []
+
+        # loaded after dropping privileges, so reload() sees the same files
+        self.static_cache = StaticCache(
+            webroot, self.HTTPRequestHandler.ALLOWED_EXTS
+        )
+        self.static_cache.load()
+        for server in (self.httpd, self.httpsd):
+            if server is not None:
+                server.static_cache = self.static_cache
+
+    def _make_server(
+        self, host: str, port: int, sock: socket.socket | None = None
+    ) -> socketserver.TCPServer:
+        server_class = self.ENGINES[self.engine]
+        if sock is None:
+            server = server_class((host, port), self.HTTPRequestHandler)
+        else:
+            server = server_class(
+                (host, port), self.HTTPRequestHandler, bind_and_activate=False
+            )
+            server.socket.close()
+            server.socket = sock
+            server.server_address = sock.getsockname()
+        server.timeout_secs = self.keepalive_timeout
+        if self.engine == "fork":
+            server.max_children = self.max_connections
+        else:
+            server.max_connections = self.max_connections
+        return server
+
+    @staticmethod
+    def _ssl_context(
+        certfile: str, keyfile: str, ciphers: str
+    ) -> ssl.SSLContext:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile=certfile, keyfile=keyfile)
+        context.minimum_version = ssl.TLSVersion.TLSv1_2
+        context.maximum_version = ssl.TLSVersion.TLSv1_3
+        context.set_ciphers(ciphers)
+        return context
+
+    TAKEOVER_ACK = b"ok"
+
+    def _take_over(self, control: str) -> dict[str, socket.socket]:
+        """Receive the listening sockets of the instance on control
+
+        The old instance keeps accepting until serve_forever() acks.
+        """
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(control)
+            conn.settimeout(30)
+            msg, fds, _, _ = socket.recv_fds(conn, 1024, 2)
+        except OSError as e:
+            conn.close()
+            print(
+                f"warning: can't take over from '{control}' ({e}) - binding"
+                " instead",
+                file=sys.stderr,
+            )
+            return {}
+        self._takeover_conn = conn
+        names = msg.decode().split()
+        return {
+            name: socket.socket(fileno=fd) for name, fd in zip(names, fds)
+        }
+
+    @staticmethod
+    def _inherit(
+        inherited: dict[str, socket.socket], name: str, port: int
+    ) -> socket.socket | None:
+        sock = inherited.pop(name, None)
+        if sock is not None and sock.getsockname()[1] != port:
+            # port changed; bind a new socket instead
+            sock.close()
+            return None
+        return sock
+
+    @staticmethod
+    def _listen_control(path: str) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        sock.bind(path)
+        os.chmod(path, 0o600)
+        sock.listen(1)
+        return sock
+
+    def _serve_control(self) -> None:
+        """Hand the listening sockets to a new instance, then stop"""
+        assert self._control is not None
+        names = []
+        fds = []
+        for name, server in (("http", self.httpd), ("https", self.httpsd)):
+            if server is not None:
+                names.append(name)
+                fds.append(server.socket.fileno())
+
+        while True:
+            try:
+                conn, _ = self._control.accept()
+            except OSError:
+                return
+            with conn:
+                conn.settimeout(60)
+                try:
+                    socket.send_fds(conn, [" ".join(names).encode()], fds)
+                    ack = conn.recv(len(self.TAKEOVER_ACK))
+                except OSError:
+                    continue
+            if ack == self.TAKEOVER_ACK:
+                # the new instance owns the control socket path now
+                self._control.close()
+                self.stop()
+                return
+
+    def reload(self) -> None:
+        """Reload the webroot (e.g. on SIGHUP) without closing sockets"""
+        self.static_cache.load()
+        if self.https_conf and self.httpsd in self._serving:
+            assert self.httpsd is not None
+            try:
+                self.httpsd.ssl_context = self._ssl_context(
+                    self.https_conf.certfile,
+                    self.https_conf.keyfile,
+                    self.https_conf.CIPHERS,
+                )
+            except (OSError, ssl.SSLError) as e:
+                print(
+                    f"warning: TLS cert/key not reloaded ({e}) - use"
+                    " --takeover to pick up a new cert",
+                    file=sys.stderr,
+                )
+        for pid in self._children:
+            try:
+                os.kill(pid, signal.SIGHUP)
+            except ProcessLookupError:
+                pass
+
+    def stop(self) -> None:
+        """Stop accepting connections; serve_forever() returns once
+        in-flight requests are done
+        """
+        for pid in self._children:
+            try:
+                os.kill(pid, signal.SIGUSR1)
+            except ProcessLookupError:
+                pass
+        for server in self._serving:
+            server.draining = True
+            # shutdown() blocks until serve_forever() returns
+            threading.Thread(target=server.shutdown).start()
 
     @staticmethod
     def drop_privileges(user):
@@ -335,25 +767,44 @@ class SimpleWebServer:
 
     def serve_forever(self):
         os.chdir(self.webroot)
-        httpd = self.httpd
-        httpsd = self.httpsd
-
-        if not httpsd and not httpd:
+        servers = [
+            server for server in (self.httpd, self.httpsd) if server
+        ]
+        if not servers:
             raise SimpleWebServerError("Nothing to serve")
 
-        if not httpsd and httpd:
-            return httpd.serve_forever()
-
-        if not httpd and httpsd:
-            return httpsd.serve_forever()
-
-        assert httpsd is not None
-        assert httpd is not None
-        pid = os.fork()
-        if pid == 0:
-            return httpsd.serve_forever()
-        else:
-            return httpd.serve_forever()
+        if self._takeover_conn is not None:
+            # ready to accept; the old instance stops accepting
+            self._takeover_conn.sendall(self.TAKEOVER_ACK)
+            self._takeover_conn.close()
+            self._takeover_conn = None
+
+        if self.engine == "fork" and len(servers) == 2:
+            pid = os.fork()
+            if pid == 0:
+                if self._control is not None:
+                    self._control.close()
+                    self._control = None
+                servers = [self.httpsd]
+            else:
+                self._children.append(pid)
+                servers = [self.httpd]
+
+        self._serving = servers
+        if self._control is not None:
+            threading.Thread(target=self._serve_control, daemon=True).start()
+
+        threads = [
+            threading.Thread(target=server.serve_forever, daemon=True)
+            for server in servers[1:]
+        ]
+        for thread in threads:
+            thread.start()
+        servers[0].serve_forever()
+        for thread in threads:
+            thread.join()
+        for server in servers:
+            server.server_close()
 
 
 def main():
@@ -362,7 +813,16 @@ def main():
         opts, args = getopt.gnu_getopt(
             sys.argv[1:],
             "h",
-            ["daemonize=", "logfile=", "runas="],
+            [
+                "daemonize=",
+                "logfile=",
+                "runas=",
+                "engine=",
+                "max-connections=",
+                "keepalive-timeout=",
+                "control=",
+                "takeover",
+            ],
         )
     except getopt.GetoptError as e:
         usage(e)
@@ -370,6 +830,11 @@ def main():
     daemonize_pidfile = None
     logfile = None
     runas = None
+    engine = SimpleWebServer.DEFAULT_ENGINE
+    max_connections = 40
+    keepalive_timeout = 15.0
+    control = None
+    takeover = False
 
     for opt, val in opts:
         if opt == "-h":
@@ -389,12 +854,43 @@ def main():
 
             runas = val
 
+        if opt == "--engine":
+            if val not in SimpleWebServer.ENGINES:
+                fatal(
+                    f"Unknown engine '{val}' - valid engines:"
+                    f" {'|'.join(SimpleWebServer.ENGINES)}"
+                )
+            engine = val
+
+        if opt == "--max-connections":
+            try:
+                max_connections = int(val)
+                assert max_connections > 0
+            except (ValueError, AssertionError):
+                fatal(f"Illegal max connections: '{val}'")
+
+        if opt == "--keepalive-timeout":
+            try:
+                keepalive_timeout = float(val)
+                assert keepalive_timeout > 0
+            except (ValueError, AssertionError):
+                fatal(f"Illegal keep-alive timeout: '{val}'")
+
+        if opt == "--control":
+            control = abspath(val)
+
+        if opt == "--takeover":
+            takeover = True
+
     if not args:
         usage()
 
     if len(args) not in (2, 4, 5):
         usage("incorrect number of arguments")
 
+    if takeover and not control:
+        fatal("--takeover can only be used with --control")
+
     if daemonize_pidfile and not is_writeable(daemonize_pidfile):
         fatal(f"pidfile '{daemonize_pidfile}' not writeable")
 
@@ -426,22 +922,45 @@ def main():
     def sighandler(signum: int, stack) -> NoReturn:
         _ = stack
         if signum == signal.SIGTERM:
-            os.killpg(os.getpgrp(), signal.SIGHUP)
+            # stop the rest of the process group (https server, request
+            # handlers) too
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)
+            os.killpg(os.getpgrp(), signal.SIGTERM)
+            # don't wait for pooled keep-alive connections (threads are
+            # joined at exit) - the ports must be free for a restart
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(1)
         sys.exit(1)
 
     signal.signal(signal.SIGHUP, sighandler)
     signal.signal(signal.SIGTERM, sighandler)
 
-    try:
-        # ensure cert generation has finished
-        wait_for_valid_cert(certfile, keyfile)
-    except TimeoutError as e:
-        fatal(e)
-
-    server = SimpleWebServer(webroot, http_address, https_conf, runas)
+    if https_conf:
+        try:
+            # ensure cert generation has finished
+            wait_for_cert(https_conf.certfile, https_conf.keyfile)
+        except TimeoutError as e:
+            fatal(str(e))
+
+    server = SimpleWebServer(
+        webroot,
+        http_address,
+        https_conf,
+        runas,
+        engine,
+        max_connections,
+        keepalive_timeout,
+        control,
+        takeover,
+    )
     if daemonize_pidfile:
         daemonize(daemonize_pidfile, logfile)
 
+    # SIGHUP reloads the webroot (until now it just exits)
+    signal.signal(signal.SIGHUP, lambda signum, stack: server.reload())
+    signal.signal(signal.SIGUSR1, lambda signum, stack: server.stop())
+
     server.serve_forever()
 
 
@@ -1,48 +1,65 @@
-import subprocess
 import sys
 from os import environ
 from os.path import abspath
 
+from libinithooks.inithooks_log import (
+    LOG_LEVELS,
+    file_sink,
+    journal,
+    structured_fields,
+)
+
 
 def is_interactive() -> bool:
+    import subprocess
+
     return (
         len(subprocess.run(["stty", "size"], capture_output=True).stdout) > 0
     )
 
 
 # logging is done this way to ensure it's done the same as with inithooks run
-def _log(level: str, message: str) -> None:
-    args = ["logger", "-t", "inithooks"]
-
+def _log(
+    level: str,
+    message: str,
+    hook: str | None = None,
+    duration: float | None = None,
+) -> None:
     level = level.lower()
-    if level not in ("err", "warn", "info", "debug"):
+    if level not in LOG_LEVELS:
         m = sys.modules["__main__"]
         err_msg = "unknown log level in main"
         if hasattr(m, "__file__") and m.__file__ is not None:
-            f"{err_msg} ({abspath(m.__file__)})"
+            err_msg = f"{err_msg} ({abspath(m.__file__)})"
         error(err_msg)
-    else:
-        args.extend(["-p", level])
-    args.append(message)
+        level = "info"
 
-    subprocess.run(args)
+    journal().send(message, level, **structured_fields(hook, duration))
     if "INITHOOKS_LOGFILE" in environ:
-        logfile = environ["INITHOOKS_LOGFILE"]
-        with open(logfile, "a") as fob:
-            fob.write(f"{level.upper()}: {message}")
+        file_sink(environ["INITHOOKS_LOGFILE"]).write(
+            f"{level.upper()}: {message}"
+        )
 
 
-def debug(message: str) -> None:
-    _log("debug", message)
+def debug(
+    message: str, hook: str | None = None, duration: float | None = None
+) -> None:
+    _log("debug", message, hook, duration)
 
 
-def info(message: str) -> None:
-    _log("info", message)
+def info(
+    message: str, hook: str | None = None, duration: float | None = None
+) -> None:
+    _log("info", message, hook, duration)
 
 
-def warn(message: str) -> None:
-    _log("warn", message)
+def warn(
+    message: str, hook: str | None = None, duration: float | None = None
+) -> None:
+    _log("warn", message, hook, duration)
 
 
-def error(message: str) -> None:
-    _log("error", message)
+def error(
+    message: str, hook: str | None = None, duration: float | None = None
+) -> None:
+    _log("err", message, hook, duration)
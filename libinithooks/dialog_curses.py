@@ -0,0 +1,538 @@
+# Copyright (c) 2025 TurnKey GNU/Linux <admin@turnkeylinux.org>
+
+"""curses backend for dialog_wrapper.Dialog
+
+Draws the dialog(1) widgets Dialog uses within one curses screen per
+process, which all Dialogs (and widgets) share. Moving from one widget to
+the next only sends what changed on screen, rather than a new dialog process
+repainting it all - much faster over serial consoles and slow VNC links.
+
+Widgets not implemented here are handed to pythondialog (if installed).
+"""
+
+import atexit
+import curses
+import locale
+import os
+import textwrap
+
+OK = "ok"
+CANCEL = "cancel"
+ESC = "esc"
+
+KEY_TAB = 9
+KEY_ESC = 27
+KEYS_ENTER = (10, 13, curses.KEY_ENTER)
+KEYS_BACKSPACE = (8, 127, curses.KEY_BACKSPACE)
+
+# default size of widgets which aren't given one
+WIDTH = 60
+MIN_WIDTH = 20
+
+
+class Screen:
+    """The curses screen (once started) - background, colors and input"""
+
+    def __init__(self) -> None:
+        self.stdscr: curses.window | None = None
+        self.backtitle = ""
+        self.attrs: dict[str, int] = {}
+
+    def start(self) -> curses.window:
+        if self.stdscr is not None:
+            return self.stdscr
+        locale.setlocale(locale.LC_ALL, "")
+        # don't wait a second to tell ESC from an escape sequence
+        os.environ.setdefault("ESCDELAY", "25")
+        stdscr = curses.initscr()
+        atexit.register(self.stop)
+        curses.noecho()
+        curses.cbreak()
+        stdscr.keypad(True)
+        self._cursor(0)
+        self.attrs = {
+            "screen": curses.A_NORMAL,
+            "box": curses.A_NORMAL,
+            "title": curses.A_BOLD,
+            "button": curses.A_NORMAL,
+            "active": curses.A_REVERSE,
+            "field": curses.A_UNDERLINE,
+        }
+        if curses.has_colors():
+            curses.start_color()
+            pairs = {
+                "screen": (curses.COLOR_CYAN, curses.COLOR_BLUE, 0),
+                "box": (curses.COLOR_BLACK, curses.COLOR_WHITE, 0),
+                "title": (curses.COLOR_BLUE, curses.COLOR_WHITE,
+                          curses.A_BOLD),
+                "button": (curses.COLOR_BLACK, curses.COLOR_WHITE, 0),
+                "active": (curses.COLOR_WHITE, curses.COLOR_BLUE,
+                           curses.A_BOLD),
+                "field": (curses.COLOR_WHITE, curses.COLOR_BLUE, 0),
+            }
+            for i, (name, (fg, bg, attr)) in enumerate(pairs.items(), 1):
+                curses.init_pair(i, fg, bg)
+                self.attrs[name] = curses.color_pair(i) | attr
+        self.stdscr = stdscr
+        self.draw_background()
+        return stdscr
+
+    def stop(self) -> None:
+        """Clear the screen and give the terminal back"""
+        if self.stdscr is None:
+            return
+        self.stdscr.erase()
+        self.stdscr.refresh()
+        curses.endwin()
+        self.stdscr = None
+
+    def suspend(self) -> None:
+        """Give the terminal to another program (e.g. dialog) for a while"""
+        if self.stdscr is not None:
+            curses.endwin()
+
+    def resume(self) -> None:
+        if self.stdscr is not None:
+            # the other program drew over it; repaint it all
+            self.stdscr.clearok(True)
+            self.draw_background()
+
+    def _cursor(self, visibility: int) -> None:
+        try:
+            curses.curs_set(visibility)
+        except curses.error:
+            pass
+
+    def set_backtitle(self, backtitle: str) -> None:
+        self.backtitle = backtitle
+        if self.stdscr is not None:
+            self.draw_background()
+
+    def draw_background(self) -> None:
+        stdscr = self.stdscr
+        assert stdscr is not None
+        stdscr.bkgd(" ", self.attrs["screen"])
+        stdscr.erase()
+        if self.backtitle:
+            put(stdscr, 0, 1, self.backtitle, self.attrs["screen"]
+                | curses.A_BOLD)
+            stdscr.hline(1, 1, curses.ACS_HLINE, curses.COLS - 2)
+
+    def show(self, win: curses.window, cursor: tuple[int, int] | None = None
+             ) -> None:
+        """Update the terminal with win over the background
+
+        Only what differs from what is already on the terminal is sent.
+        """
+        assert self.stdscr is not None
+        self.stdscr.touchwin()
+        self.stdscr.noutrefresh()
+        if cursor:
+            win.move(*cursor)
+            self._cursor(1)
+        else:
+            self._cursor(0)
+        win.noutrefresh()
+        curses.doupdate()
+
+    def resize(self) -> None:
+        curses.update_lines_cols()
+        assert self.stdscr is not None
+        self.stdscr.clearok(True)
+        self.draw_background()
+
+
+_screen = Screen()
+
+
+def put(win: curses.window, y: int, x: int, text: str, attr: int = 0
+        ) -> None:
+    """addstr, truncated to fit win"""
+    height, width = win.getmaxyx()
+    if not 0 <= y < height or not 0 <= x < width:
+        return
+    try:
+        win.addstr(y, x, text[:width - x], attr)
+    except curses.error:
+        # writing the bottom right corner moves the cursor off the window
+        pass
+
+
+def read_key(win: curses.window) -> int | str:
+    """Return next key; control characters as ints"""
+    while True:
+        try:
+            key = win.get_wch()
+        except curses.error:
+            continue
+        if isinstance(key, str) and (ord(key) < 32 or ord(key) == 127):
+            return ord(key)
+        return key
+
+
+def wrap(text: str, width: int) -> list[str]:
+    lines = []
+    for paragraph in text.expandtabs().split("\n"):
+        # like dialog --no-collapse, keep the spacing within lines
+        lines.extend(textwrap.wrap(
+            paragraph, width, replace_whitespace=False,
+            drop_whitespace=True
+        ) or [""])
+    return lines
+
+
+class Widget:
+    """A box with a title, (scrollable) text, optional input field or menu
+    and buttons"""
+
+    def __init__(
+        self,
+        text: str,
+        height: int | None,
+        width: int | None,
+        title: str = "",
+        buttons: tuple[str, ...] = ("OK",),
+        field: str | None = None,
+        secret: bool = False,
+        choices: list[tuple[str, str]] | None = None,
+        menu_height: int | None = None,
+    ) -> None:
+        self.text = text
+        self.req_height = height
+        self.req_width = width or WIDTH
+        self.title = title
+        self.buttons = buttons
+        self.field = field
+        self.cursor = len(field or "")
+        self.offset = 0
+        self.secret = secret
+        self.choices = choices
+        self.menu_height = menu_height or len(choices or [])
+        self.selected = 0
+        self.button = 0
+        # what has focus: 'field', 'menu' or 'buttons'
+        self.focus = "buttons"
+        if field is not None:
+            self.focus = "field"
+        elif choices:
+            self.focus = "menu"
+        self.scroll = 0
+        self.menu_scroll = 0
+        self.win: curses.window | None = None
+
+    def layout(self) -> None:
+        width = max(MIN_WIDTH, min(self.req_width, curses.COLS - 2))
+        self.lines = wrap(self.text, width - 4)
+        extra = 0
+        if self.field is not None:
+            extra = 2
+        elif self.choices:
+            extra = self.menu_height + 1
+        height = self.req_height or len(self.lines) + extra + 4
+        # leave the backtitle visible
+        height = max(6 + extra, min(height, curses.LINES - 2))
+        height = min(height, curses.LINES)
+        self.sep_row = height - 3
+        self.menu_rows = 0
+        if self.choices:
+            self.menu_rows = max(1, min(self.menu_height,
+                                        self.sep_row - 2))
+            extra = self.menu_rows + 1
+        self.text_rows = max(0, self.sep_row - 1 - extra)
+        y = max(0, (curses.LINES - height) // 2)
+        x = max(0, (curses.COLS - width) // 2)
+        self.win = curses.newwin(height, width, y, x)
+        self.win.keypad(True)
+
+    def draw(self) -> tuple[int, int] | None:
+        """Draw widget; returns where the cursor should be (if anywhere)"""
+        win = self.win
+        assert win is not None
+        attrs = _screen.attrs
+        height, width = win.getmaxyx()
+        win.bkgd(" ", attrs["box"])
+        win.erase()
+        win.box()
+        if self.title:
+            title = f" {self.title} "[:width - 2]
+            put(win, 0, (width - len(title)) // 2, title, attrs["title"])
+
+        visible = self.lines[self.scroll:self.scroll + self.text_rows]
+        for i, line in enumerate(visible):
+            put(win, 1 + i, 2, line)
+        if self.scroll + self.text_rows < len(self.lines):
+            put(win, self.text_rows, width - 3, "+", attrs["title"])
+
+        cursor = None
+        if self.field is not None:
+            cursor = self._draw_field(win, self.sep_row - 1, width - 4)
+        elif self.choices:
+            self._draw_menu(win, self.sep_row - self.menu_rows, width - 4)
+
+        win.hline(self.sep_row, 1, curses.ACS_HLINE, width - 2)
+        try:
+            win.addch(self.sep_row, 0, curses.ACS_LTEE)
+            win.addch(self.sep_row, width - 1, curses.ACS_RTEE)
+        except curses.error:
+            pass
+        self._draw_buttons(win, self.sep_row + 1, width)
+        return cursor
+
+    def _draw_field(self, win: curses.window, row: int, width: int
+                    ) -> tuple[int, int] | None:
+        value = self.field or ""
+        shown = "*" * len(value) if self.secret else value
+        # scroll by half a field at a time to keep the cursor in view (so
+        # typing doesn't redraw the whole field with every key)
+        if not self.offset <= self.cursor < self.offset + width:
+            self.offset = max(0, self.cursor - width // 2)
+        shown = shown[self.offset:self.offset + width]
+        put(win, row, 2, shown.ljust(width), _screen.attrs["field"])
+        if self.focus == "field":
+            return row, 2 + self.cursor - self.offset
+        return None
+
+    def _draw_menu(self, win: curses.window, row: int, width: int) -> None:
+        assert self.choices is not None
+        if self.selected < self.menu_scroll:
+            self.menu_scroll = self.selected
+        elif self.selected >= self.menu_scroll + self.menu_rows:
+            self.menu_scroll = self.selected - self.menu_rows + 1
+        tag_width = max(len(tag) for tag, _ in self.choices)
+        shown = self.choices[self.menu_scroll:
+                             self.menu_scroll + self.menu_rows]
+        for i, (tag, item) in enumerate(shown, self.menu_scroll):
+            attr = _screen.attrs["box"]
+            if i == self.selected:
+                attr = _screen.attrs["active"]
+            put(win, row + i - self.menu_scroll, 2,
+                f" {tag:{tag_width}}  {item}"[:width].ljust(width), attr)
+
+    def _draw_buttons(self, win: curses.window, row: int, width: int
+                      ) -> None:
+        labels = [f"<{label:^8}>" for label in self.buttons]
+        total = sum(len(label) for label in labels) + 3 * (len(labels) - 1)
+        x = max(1, (width - total) // 2)
+        for i, label in enumerate(labels):
+            attr = _screen.attrs["button"]
+            if i == self.button and self.focus == "buttons":
+                attr = _screen.attrs["active"]
+            elif i == self.button:
+                attr |= curses.A_BOLD
+            put(win, row, x, label, attr)
+            x += len(label) + 3
+
+    def run(self, wait: bool = True) -> tuple[str, str]:
+        """Show widget (and handle keys until done if wait)
+
+        Returns (exit code, field value or selected menu tag).
+        """
+        _screen.start()
+        self.layout()
+        _screen.show(self.win, self.draw())
+        while wait:
+            key = read_key(self.win)
+            if key == curses.KEY_RESIZE:
+                _screen.resize()
+                self.layout()
+            else:
+                done = self.handle(key)
+                if done:
+                    return done
+            _screen.show(self.win, self.draw())
+        return OK, ""
+
+    def _result(self, code: str) -> tuple[str, str]:
+        if self.choices:
+            return code, self.choices[self.selected][0]
+        return code, self.field or ""
+
+    def _focus_next(self) -> None:
+        if self.focus == "buttons":
+            if self.button < len(self.buttons) - 1:
+                self.button += 1
+            elif self.field is not None:
+                self.focus = "field"
+                self.button = 0
+            elif self.choices:
+                self.focus = "menu"
+                self.button = 0
+            else:
+                self.button = 0
+        else:
+            self.focus = "buttons"
+
+    def handle(self, key: int | str) -> tuple[str, str] | None:
+        """Handle key; returns result once the widget is done"""
+        if key == KEY_ESC:
+            return self._result(ESC)
+        if key in KEYS_ENTER:
+            return self._press()
+        if key == KEY_TAB:
+            self._focus_next()
+        elif self.focus == "field":
+            self._handle_field(key)
+        elif self.focus == "menu":
+            self._handle_menu(key)
+        else:
+            return self._handle_buttons(key)
+        return None
+
+    def _press(self) -> tuple[str, str]:
+        """Result of pressing Enter (the 2nd button is cancel/no)"""
+        code = OK
+        if self.focus == "buttons" and self.button:
+            code = CANCEL
+        return self._result(code)
+
+    def _handle_field(self, key: int | str) -> None:
+        value = self.field or ""
+        if isinstance(key, str):
+            value = value[:self.cursor] + key + value[self.cursor:]
+            self.cursor += 1
+        elif key in KEYS_BACKSPACE and self.cursor:
+            value = value[:self.cursor - 1] + value[self.cursor:]
+            self.cursor -= 1
+        elif key == curses.KEY_DC:
+            value = value[:self.cursor] + value[self.cursor + 1:]
+        elif key == curses.KEY_LEFT:
+            self.cursor = max(0, self.cursor - 1)
+        elif key == curses.KEY_RIGHT:
+            self.cursor = min(len(value), self.cursor + 1)
+        elif key == curses.KEY_HOME:
+            self.cursor = 0
+        elif key == curses.KEY_END:
+            self.cursor = len(value)
+        self.field = value
+
+    def _handle_menu(self, key: int | str) -> None:
+        assert self.choices is not None
+        last = len(self.choices) - 1
+        if key == curses.KEY_UP:
+            self.selected = max(0, self.selected - 1)
+        elif key == curses.KEY_DOWN:
+            self.selected = min(last, self.selected + 1)
+        elif key == curses.KEY_PPAGE:
+            self.selected = max(0, self.selected - self.menu_rows)
+        elif key == curses.KEY_NPAGE:
+            self.selected = min(last, self.selected + self.menu_rows)
+        elif key == curses.KEY_HOME:
+            self.selected = 0
+        elif key == curses.KEY_END:
+            self.selected = last
+        elif isinstance(key, str):
+            # jump to the next choice starting with key
+            tags = [tag.lower() for tag, _ in self.choices]
+            for i in list(range(self.selected + 1, last + 1)) + list(
+                range(self.selected + 1)
+            ):
+                if tags[i].startswith(key.lower()):
+                    self.selected = i
+                    break
+
+    def _handle_buttons(self, key: int | str) -> tuple[str, str] | None:
+        if key in (curses.KEY_LEFT, curses.KEY_BTAB):
+            self.button = max(0, self.button - 1)
+        elif key == curses.KEY_RIGHT:
+            self.button = min(len(self.buttons) - 1, self.button + 1)
+        elif key == curses.KEY_UP:
+            self.scroll = max(0, self.scroll - 1)
+        elif key == curses.KEY_DOWN:
+            self.scroll = min(max(0, len(self.lines) - self.text_rows),
+                              self.scroll + 1)
+        elif isinstance(key, str):
+            # like dialog, a button's first letter selects it
+            for i, label in enumerate(self.buttons):
+                if label[:1].lower() == key.lower():
+                    self.button = i
+                    return self._press()
+        return None
+
+
+class Console:
+    """Implements the pythondialog Dialog methods dialog_wrapper uses"""
+
+    OK = OK
+    CANCEL = CANCEL
+    ESC = ESC
+
+    def __init__(self, backtitle: str = "") -> None:
+        self.backtitle = backtitle
+        self._dialog = None
+
+    def _widget(self, *args, **kws) -> tuple[str, str]:
+        _screen.set_backtitle(self.backtitle)
+        return Widget(*args, **kws).run()
+
+    def msgbox(self, text: str, height: int | None = None,
+               width: int | None = None, title: str = "",
+               ok_label: str = "OK", **_) -> str:
+        return self._widget(text, height, width, title, (ok_label,))[0]
+
+    def infobox(self, text: str, height: int | None = None,
+                width: int | None = None, title: str = "", **_) -> str:
+        """Show text and return straight away (it stays until replaced)"""
+        _screen.set_backtitle(self.backtitle)
+        return Widget(text, height, width, title, ()).run(wait=False)[0]
+
+    def yesno(self, text: str, height: int | None = None,
+              width: int | None = None, title: str = "",
+              yes_label: str = "Yes", no_label: str = "No", **_) -> str:
+        return self._widget(
+            text, height, width, title, (yes_label, no_label)
+        )[0]
+
+    def inputbox(self, text: str, height: int | None = None,
+                 width: int | None = None, title: str = "", init: str = "",
+                 ok_label: str = "OK", cancel_label: str = "Cancel",
+                 no_cancel: bool = False, **_) -> tuple[str, str]:
+        buttons = (ok_label,) if no_cancel else (ok_label, cancel_label)
+        return self._widget(text, height, width, title, buttons, field=init)
+
+    def passwordbox(self, text: str, height: int | None = None,
+                    width: int | None = None, title: str = "",
+                    init: str = "", ok_label: str = "OK",
+                    cancel_label: str = "Cancel", no_cancel: bool = False,
+                    **_) -> tuple[str, str]:
+        buttons = (ok_label,) if no_cancel else (ok_label, cancel_label)
+        return self._widget(
+            text, height, width, title, buttons, field=init, secret=True
+        )
+
+    def menu(self, text: str, height: int | None = None,
+             width: int | None = None, menu_height: int | None = None,
+             choices: list[tuple[str, str]] | None = None, title: str = "",
+             ok_label: str = "OK", cancel_label: str = "Cancel",
+             no_cancel: bool = False, **_) -> tuple[str, str]:
+        if not choices:
+            raise ValueError("menu needs at least one choice")
+        buttons = (ok_label,) if no_cancel else (ok_label, cancel_label)
+        return self._widget(
+            text, height, width, title, buttons, choices=choices,
+            menu_height=menu_height,
+        )
+
+    def __getattr__(self, name: str):
+        """Other widgets are shown by dialog(1), via pythondialog"""
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if self._dialog is None:
+            import dialog
+
+            self._dialog = dialog.Dialog(dialog="dialog")
+            self._dialog.add_persistent_args(
+                ["--no-collapse", "--no-mouse", "--backtitle",
+                 self.backtitle]
+            )
+        method = getattr(self._dialog, name)
+        if not callable(method):
+            return method
+
+        def call(*args, **kws):
+            _screen.suspend()
+            try:
+                return method(*args, **kws)
+            finally:
+                _screen.resume()
+
+        return call
@@ -1,14 +1,18 @@
 # Copyright (c) 2010 Alon Swartz <alon@turnkeylinux.org>
 # Copyright (c) 2020-2025 TurnKey GNU/Linux <admin@turnkeylinux.org>
 
+# pythondialog, urllib etc are only imported (and the log only opened) once
+# a dialog is actually shown - preseeded (non-interactive) runs of the bin/
+# helpers don't need them
+
 import re
 import sys
-import dialog
-import traceback
-from io import StringIO
 from os import environ
-from urllib.parse import urlparse
 import logging
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from libinithooks.inithooks_password import PasswordPolicy
 
 EMAIL_RE = re.compile(r"(?:^|\s).*\S@\S+(?:\s|$)", re.IGNORECASE)
 
@@ -16,9 +20,27 @@ LOG_LEVEL = logging.INFO
 if "DIALOG_DEBUG" in environ.keys():
     LOG_LEVEL = logging.DEBUG
 
-logging.basicConfig(
-    filename="/var/log/dialog.log", encoding="utf-8", level=LOG_LEVEL
-)
+# 'dialog' (a dialog process per widget) or 'curses' (see dialog_curses)
+BACKEND = environ.get("INITHOOKS_DIALOG", "dialog")
+
+
+_logging_setup = False
+
+
+def setup_logging() -> None:
+    """Log to /var/log/dialog.log (once)"""
+    global _logging_setup
+    if _logging_setup:
+        return
+    # force: replaces the stderr handler logging sets up if anything was
+    # logged before now
+    logging.basicConfig(
+        filename="/var/log/dialog.log",
+        encoding="utf-8",
+        level=LOG_LEVEL,
+        force=True,
+    )
+    _logging_setup = True
 
 
 class Error(Exception):
@@ -27,24 +49,28 @@ class Error(Exception):
 
 def password_complexity(password: str) -> int:
     """return password complexity score from 0 (invalid) to 4 (strong)"""
+    from libinithooks.inithooks_password import complexity
 
-    lowercase = re.search("[a-z]", password) is not None
-    uppercase = re.search("[A-Z]", password) is not None
-    number = re.search(r"\d", password) is not None
-    nonalpha = re.search(r"\W", password) is not None
-
-    return sum([lowercase, uppercase, number, nonalpha])
+    return complexity(password)
 
 
 class Dialog:
     def __init__(self, title: str, width: int = 60, height: int = 20) -> None:
+        setup_logging()
         self.width = width
         self.height = height
 
-        self.console = dialog.Dialog(dialog="dialog")
-        self.console.add_persistent_args(["--no-collapse"])
-        self.console.add_persistent_args(["--backtitle", title])
-        self.console.add_persistent_args(["--no-mouse"])
+        if BACKEND == "curses":
+            from libinithooks.dialog_curses import Console
+
+            self.console = Console(backtitle=title)
+        else:
+            import dialog
+
+            self.console = dialog.Dialog(dialog="dialog")
+            self.console.add_persistent_args(["--no-collapse"])
+            self.console.add_persistent_args(["--backtitle", title])
+            self.console.add_persistent_args(["--no-mouse"])
 
     def _handle_exitcode(self, retcode: int) -> bool:
         logging.debug(f"_handle_exitcode(retcode={retcode!r})")
@@ -92,6 +118,9 @@ class Dialog:
                     break
 
             except Exception as e:
+                import traceback
+                from io import StringIO
+
                 sio = StringIO()
                 traceback.print_exc(file=sio)
                 logging.error(
@@ -207,26 +236,25 @@ class Dialog:
         self,
         title: str,
         text: str,
-        pass_req: int = 8,
+        pass_req: int | str = 8,
         min_complexity: int = 3,
         blacklist: list[str] | None = None,
+        policy: "PasswordPolicy | None" = None,
     ) -> str | None:
         """Validated titled message with password (redacted input) box &
-        'ok' button - also accepts password limitations
+        'ok' button - also accepts password limitations (pass_req is a
+        minimum length or a regex to match), or a PasswordPolicy
         Returns password"""
-        req_string = (
-            f"\n\nPassword Requirements\n - must be at least {pass_req}"
-            " characters long\n - must contain characters from at"
-            f" least {min_complexity} of the following categories: uppercase,"
-            " lowercase, numbers, symbols"
-        )
-        if blacklist:
-            req_string = (
-                f"{req_string}. Also must NOT contain these characters:"
-                f" {' '.join(blacklist)}"
-            )
-        else:
-            blacklist = []
+        from libinithooks.inithooks_password import PasswordPolicy
+
+        if policy is None:
+            if isinstance(pass_req, int):
+                policy = PasswordPolicy(pass_req, min_complexity,
+                                        blacklist or [])
+            else:
+                policy = PasswordPolicy(0, min_complexity, blacklist or [],
+                                        pattern=pass_req)
+        req_string = f"\n\n{policy.describe()}"
         height = self._calc_height(text + req_string) + 3
 
         def ask(title: str, text: str) -> str:
@@ -244,47 +272,9 @@ class Dialog:
 
         while 1:
             password = ask(title, text)
-            if not password:
-                self.error("Please enter non-empty password!")
-                continue
-
-            if isinstance(pass_req, int):
-                if len(password) < pass_req:
-                    self.error(
-                        f"Password must be at least {pass_req} characters."
-                    )
-                    continue
-            elif not re.match(pass_req, password):
-                # TODO "Type analysis indicates code is unreachable"?!
-                self.error("Password does not match complexity requirements.")
-                continue
-
-            if password_complexity(password) < min_complexity:
-                if min_complexity <= 3:
-                    self.error(
-                        "Insecure password! Mix uppercase, lowercase,"
-                        " and at least one number. Multiple words and"
-                        " punctuation are highly recommended but not"
-                        " strictly required."
-                    )
-                elif min_complexity == 4:
-                    self.error(
-                        "Insecure password! Mix uppercase, lowercase,"
-                        " numbers and at least one special/punctuation"
-                        " character. Multiple words are highly"
-                        " recommended but not strictly required."
-                    )
-                continue
-
-            found_items = []
-            for item in blacklist:
-                if item in password:
-                    found_items.append(item)
-            if found_items:
-                self.error(
-                    f"Password can NOT include these characters: {blacklist}."
-                    f" Found {found_items}"
-                )
+            errors = policy.check(password)
+            if errors:
+                self.error("\n\n".join(errors))
                 continue
 
             if password == ask(title, "Confirm password"):
@@ -372,6 +362,8 @@ def validate_domain(domain: str) -> tuple[str | None, str | None, str | None]:
     has_scheme = bool(_SCHEME_RE.match(domain))
     candidate = domain if has_scheme else '//' + domain
  
+    from urllib.parse import urlparse
+
     try:
         p = urlparse(candidate)
     except ValueError:
@@ -0,0 +1,385 @@
+#!/usr/bin/python3
+"""Grow the last (LVM) partition of a disk to fill it, then the LVM PV, LV
+and filesystem on it
+
+The partition table (MBR or GPT) is read and the growth planned in memory.
+The grown partition is passed to the running kernel (BLKPG), so the PV, LV
+and filesystem can be grown without a reboot in between.
+
+Arguments:
+
+    device              disk (or disk image with --dry-run), e.g. /dev/vda
+    partition           partition to grow, e.g. /dev/vda2 (or its number)
+
+Options:
+
+    --lv=PATH           logical volume to grow along with its filesystem
+                        (default: /dev/turnkey/root); 'SKIP' to grow the
+                        partition only
+    --pv-only           grow the partition and PV, but not the LV
+    --dry-run           only print what would be done
+    --state-dir=DIR     where to note the disk size already grown to
+                        (default: /var/tmp)
+
+Exit codes:
+
+    0                   grown, or nothing to grow
+    1                   not applicable (e.g. not the last partition or not an
+                        LVM partition) or failed
+    42                  reboot required (the kernel didn't accept the grown
+                        partition; the rest is grown after the reboot)
+"""
+
+import ctypes
+import fcntl
+import getopt
+import os
+import re
+import stat
+import struct
+import subprocess
+import sys
+import uuid
+from dataclasses import dataclass
+from typing import NoReturn
+
+REBOOT_EXITCODE = 42
+
+DEFAULT_LV = "/dev/turnkey/root"
+DEFAULT_STATE_DIR = "/var/tmp"
+
+# don't bother growing by less than this
+MIN_GROWTH = 32 * 1024 * 1024
+
+MBR_LVM = "8e"
+MBR_GPT_PROTECTIVE = 0xEE
+GPT_LVM = "e6d6d379-f507-44c2-a23c-238f2a3df928"
+LVM_TYPES = (MBR_LVM, GPT_LVM)
+
+# linux/fs.h & linux/blkpg.h
+BLKSSZGET = 0x1268
+BLKPG = 0x1269
+BLKPG_RESIZE_PARTITION = 3
+
+
+def fatal(e) -> NoReturn:
+    print(f"Error: {e}", file=sys.stderr)
+    sys.exit(1)
+
+
+def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
+    if msg:
+        print(f"Error: {msg}", file=sys.stderr)
+    print(
+        f"Syntax: {sys.argv[0]} [options] <device> <partition>",
+        file=sys.stderr,
+    )
+    print(__doc__, file=sys.stderr)
+    sys.exit(1)
+
+
+class AutogrowError(Exception):
+    pass
+
+
+@dataclass
+class Partition:
+    number: int
+    start: int  # sectors
+    size: int  # sectors
+    type: str  # MBR type ('8e') or GPT type GUID
+
+    @property
+    def end(self) -> int:
+        return self.start + self.size
+
+
+@dataclass
+class Disk:
+    path: str
+    label: str  # 'dos' or 'gpt'
+    sector_size: int
+    size: int  # bytes
+    partitions: list[Partition]
+    max_end: int  # end (exclusive) of usable sectors, once grown
+
+    def partition(self, number: int) -> Partition:
+        for part in self.partitions:
+            if part.number == number:
+                return part
+        raise AutogrowError(f"{self.path}: partition {number} not found")
+
+    def plan(self, part: Partition) -> int | None:
+        """Return size (in sectors) to grow part to, None if not worth it"""
+        if part.type not in LVM_TYPES:
+            raise AutogrowError(
+                f"{self.path}: partition {part.number} is not an LVM"
+                f" partition (type {part.type})"
+            )
+        if any(p.start > part.start for p in self.partitions):
+            raise AutogrowError(
+                f"{self.path}: partition {part.number} is not the last"
+                " partition"
+            )
+        size = self.max_end - part.start
+        if self.label == "dos":
+            size = min(size, 0xFFFFFFFF)
+        if (size - part.size) * self.sector_size < MIN_GROWTH:
+            return None
+        return size
+
+
+def _sector_size(fd: int) -> int:
+    if not stat.S_ISBLK(os.fstat(fd).st_mode):
+        # disk image
+        return 512
+    buf = fcntl.ioctl(fd, BLKSSZGET, struct.pack("i", 0))
+    return struct.unpack("i", buf)[0]
+
+
+def _read_mbr(sector: bytes) -> list[Partition]:
+    partitions = []
+    for i in range(4):
+        entry = sector[446 + 16 * i:446 + 16 * (i + 1)]
+        ptype = entry[4]
+        start, size = struct.unpack_from("<II", entry, 8)
+        if ptype and size:
+            partitions.append(Partition(i + 1, start, size, f"{ptype:02x}"))
+    return partitions
+
+
+def _read_gpt(fd: int, sector_size: int) -> tuple[list[Partition], int]:
+    """Return (partitions, sectors used by the partition entries)"""
+    header = os.pread(fd, 92, sector_size)
+    if header[:8] != b"EFI PART":
+        raise AutogrowError("invalid GPT header")
+    entries_lba, count, entry_size = struct.unpack_from("<QII", header, 72)
+    entries = os.pread(fd, count * entry_size, entries_lba * sector_size)
+    partitions = []
+    for i in range(count):
+        entry = entries[i * entry_size:(i + 1) * entry_size]
+        if entry[:16] == bytes(16):
+            continue
+        first, last = struct.unpack_from("<QQ", entry, 32)
+        ptype = str(uuid.UUID(bytes_le=entry[:16]))
+        partitions.append(Partition(i + 1, first, last - first + 1, ptype))
+    entry_sectors = -(-count * entry_size // sector_size)
+    return partitions, entry_sectors
+
+
+def read_disk(path: str) -> Disk:
+    """Read partition table and size of disk (or disk image) at path"""
+    fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+    try:
+        size = os.lseek(fd, 0, os.SEEK_END)
+        sector_size = _sector_size(fd)
+        mbr = os.pread(fd, 512, 0)
+        if len(mbr) < 512 or mbr[510:512] != b"\x55\xaa":
+            raise AutogrowError(f"{path}: no partition table found")
+        sectors = size // sector_size
+        partitions = _read_mbr(mbr)
+        if partitions and int(partitions[0].type, 16) == MBR_GPT_PROTECTIVE:
+            partitions, entry_sectors = _read_gpt(fd, sector_size)
+            # room for the backup entries and header at the end of the disk
+            return Disk(path, "gpt", sector_size, size, partitions,
+                        sectors - entry_sectors - 1)
+        return Disk(path, "dos", sector_size, size, partitions, sectors)
+    finally:
+        os.close(fd)
+
+
+def partition_number(partition: str) -> int:
+    """Return number of partition (a device path or number)"""
+    sysfs = f"/sys/class/block/{os.path.basename(partition)}/partition"
+    try:
+        with open(sysfs) as fob:
+            return int(fob.read())
+    except (OSError, ValueError):
+        pass
+    match = re.search(r"(\d+)$", partition)
+    if not match:
+        raise AutogrowError(f"can't tell number of partition '{partition}'")
+    return int(match.group(1))
+
+
+def grow_partition(disk: Disk, part: Partition) -> None:
+    """Grow part (in the partition table only) to fill disk"""
+    if disk.label == "gpt":
+        # move the backup GPT to the (new) end of the disk
+        subprocess.run(
+            ["sfdisk", "--relocate", "gpt-bak-std", disk.path],
+            check=True,
+        )
+    subprocess.run(
+        ["sfdisk", "--no-reread", "--no-tell-kernel", "--force",
+         "-N", str(part.number), disk.path],
+        input=b", +\n",
+        check=True,
+    )
+
+
+class _BlkpgPartition(ctypes.Structure):
+    _fields_ = [
+        ("start", ctypes.c_longlong),
+        ("length", ctypes.c_longlong),
+        ("pno", ctypes.c_int),
+        ("devname", ctypes.c_char * 64),
+        ("volname", ctypes.c_char * 64),
+    ]
+
+
+class _BlkpgIoctlArg(ctypes.Structure):
+    _fields_ = [
+        ("op", ctypes.c_int),
+        ("flags", ctypes.c_int),
+        ("datalen", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+    ]
+
+
+def resize_online(disk: Disk, part: Partition) -> bool:
+    """Tell the kernel part has been resized (like 'partx -u')
+
+    Returns False if the kernel refused (i.e. a reboot is needed).
+    """
+    blkpg_part = _BlkpgPartition(
+        start=part.start * disk.sector_size,
+        length=part.size * disk.sector_size,
+        pno=part.number,
+    )
+    arg = _BlkpgIoctlArg(
+        op=BLKPG_RESIZE_PARTITION,
+        datalen=ctypes.sizeof(blkpg_part),
+        data=ctypes.addressof(blkpg_part),
+    )
+    fd = os.open(disk.path, os.O_RDONLY | os.O_CLOEXEC)
+    try:
+        fcntl.ioctl(fd, BLKPG, arg)
+    except OSError as e:
+        print(f"Kernel didn't accept resized partition - {e}",
+              file=sys.stderr)
+        return False
+    finally:
+        os.close(fd)
+    return True
+
+
+def _read_state(path: str) -> int | None:
+    try:
+        with open(path) as fob:
+            return int(fob.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_state(path: str, size: int) -> None:
+    with open(path, "w") as fob:
+        fob.write(f"{size}\n")
+
+
+def _run(cmd: list[str], dry_run: bool) -> int:
+    print(" ".join(cmd))
+    if dry_run:
+        return 0
+    return subprocess.run(cmd).returncode
+
+
+def autogrow(
+    device: str,
+    partition: str,
+    lv: str = DEFAULT_LV,
+    pv_only: bool = False,
+    dry_run: bool = False,
+    state_dir: str = DEFAULT_STATE_DIR,
+) -> int:
+    """Grow partition, PV, LV & filesystem; returns exit code"""
+    disk = read_disk(device)
+    part = disk.partition(partition_number(partition))
+    # noted in 512 byte sectors (as by 'blockdev --getsize')
+    disk_size = disk.size // 512
+
+    new_size = disk.plan(part)
+    if new_size is not None:
+        print(
+            f"Growing {disk.label} partition {part.number} of {device} from"
+            f" {part.size} to {new_size} sectors"
+        )
+        if dry_run:
+            part.size = new_size
+        else:
+            state = os.path.join(state_dir, "autogrow.size")
+            if _read_state(state) == disk_size:
+                # already tried - kernel must still have old partition size
+                return 1
+            _write_state(state, disk_size)
+            grow_partition(disk, part)
+            part = read_disk(device).partition(part.number)
+            if not resize_online(disk, part):
+                return REBOOT_EXITCODE
+
+    if lv == "SKIP":
+        return 0
+
+    state = os.path.join(state_dir, "autogrow_fs.size")
+    if not dry_run:
+        if _read_state(state) == disk_size:
+            return 0
+        _write_state(state, disk_size)
+
+    if _run(["pvresize", partition], dry_run) != 0:
+        return 1
+    if pv_only:
+        return 0
+
+    print(f"lvextend -l+100%FREE {lv}")
+    if dry_run:
+        print(f"resize2fs {lv}")
+        return 0
+    exit_code = subprocess.run(
+        ["lvextend", "-l+100%FREE", lv], stderr=subprocess.DEVNULL
+    ).returncode
+    if exit_code == 3:
+        # nothing to extend
+        return 0
+    if exit_code != 0 or _run(["resize2fs", lv], dry_run) != 0:
+        return 1
+    # grown online; no reboot (or fsck) needed
+    return 0
+
+
+def main() -> None:
+    opts = []
+    args = []
+    try:
+        opts, args = getopt.gnu_getopt(
+            sys.argv[1:], "h", ["help", "lv=", "pv-only", "dry-run",
+                                "state-dir="]
+        )
+    except getopt.GetoptError as e:
+        usage(e)
+
+    kwargs: dict = {}
+    for opt, val in opts:
+        if opt in ("-h", "--help"):
+            usage()
+        elif opt == "--lv":
+            kwargs["lv"] = val
+        elif opt == "--pv-only":
+            kwargs["pv_only"] = True
+        elif opt == "--dry-run":
+            kwargs["dry_run"] = True
+        elif opt == "--state-dir":
+            kwargs["state_dir"] = val
+
+    if len(args) != 2:
+        usage()
+
+    try:
+        exit_code = autogrow(*args, **kwargs)
+    except (AutogrowError, OSError, subprocess.CalledProcessError) as e:
+        fatal(e)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,18 +7,36 @@ Arguments:
     value               if specified, will set as key value
                         if omitted, will return the value of key if set
 
+Options:
+
+    --export [key ...]  print keys (default: all) as shell KEY='value'
+                        lines, suitable for eval
+    --import            atomically set all KEY=value lines read from stdin
+
 Environment:
 
     INITHOOKS_CACHE     path to cache (default: /var/lib/inithooks/cache)
+                        values are stored in $INITHOOKS_CACHE.db; a legacy
+                        cache directory (one file per key) is migrated
+                        into it on first use
 """
 
 import os
+import re
 import sys
 import getopt
-from typing import NoReturn
+import shlex
+import sqlite3
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Mapping, NoReturn
 
 CACHE_DIR = os.environ.get("INITHOOKS_CACHE", "/var/lib/inithooks/cache")
 
+SHELL_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# SQLITE_MAX_VARIABLE_NUMBER of sqlite < 3.32
+MAX_PARAMS = 999
+
 
 def fatal(e) -> NoReturn:
     print(f"Error: {e}", file=sys.stderr)
@@ -28,55 +46,200 @@ def fatal(e) -> NoReturn:
 def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
     if msg:
         print(f"Error: {msg}", file=sys.stderr)
-    print(f"Syntax: {sys.argv[0]} <key> [value]", file=sys.stderr)
+    print(
+        f"Syntax: {sys.argv[0]} <key> [value] | --export [key ...]"
+        " | --import",
+        file=sys.stderr,
+    )
     print(__doc__, file=sys.stderr)
     sys.exit(1)
 
 
 class KeyStore:
+    """Key/value store kept in a single sqlite database
+
+    The database connection is opened on first use; all multi-key writes
+    are done in a single transaction.
+    """
+
     def __init__(self, cache_dir: str = CACHE_DIR) -> None:
         self.cache_dir = cache_dir
-        os.makedirs(self.cache_dir, mode=0o755, exist_ok=True)
+        self.path = cache_dir.rstrip("/") + ".db"
+        self._db: sqlite3.Connection | None = None
 
-    def read(self, key, fallback: str = "") -> str:
-        keypath = os.path.join(self.cache_dir, key)
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS cache"
+                " (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            self._db = db
+            self._migrate()
+        return self._db
 
-        if os.path.exists(keypath):
-            with open(keypath, "r") as fob:
-                data = fob.read()
-            return data
+    def _migrate(self) -> None:
+        """Import (then remove) a legacy one-file-per-key cache dir"""
+        if not os.path.isdir(self.cache_dir):
+            return
 
-        return fallback
+        legacy = {}
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file(follow_symlinks=False):
+                try:
+                    with open(entry.path, "r") as fob:
+                        legacy[entry.name] = fob.read()
+                except FileNotFoundError:
+                    # being migrated by another process
+                    continue
+
+        # keys set since migration started take precedence
+        with self._transaction() as db:
+            db.executemany(
+                "INSERT OR IGNORE INTO cache (key, value) VALUES (?, ?)",
+                legacy.items(),
+            )
+
+        for key in legacy:
+            try:
+                os.remove(os.path.join(self.cache_dir, key))
+            except FileNotFoundError:
+                pass
+        try:
+            os.rmdir(self.cache_dir)
+        except OSError:
+            pass
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        db = self.db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def read(self, key, fallback: str = "") -> str:
+        row = self.db.execute(
+            "SELECT value FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return fallback
+        return row[0]
 
     def write(self, key: str, val: str) -> None:
-        keypath = os.path.join(self.cache_dir, key)
+        self.set_many({key: val})
+
+    def get_many(self, keys: Iterable[str] | None = None) -> dict[str, str]:
+        """Return values of keys (default: all keys) that are set"""
+        if keys is None:
+            return dict(
+                self.db.execute("SELECT key, value FROM cache ORDER BY key")
+            )
+        wanted = sorted(set(keys))
+        values = {}
+        # in batches, within sqlite's limit on query parameters
+        for i in range(0, len(wanted), MAX_PARAMS):
+            batch = wanted[i:i + MAX_PARAMS]
+            values.update(self.db.execute(
+                "SELECT key, value FROM cache WHERE key IN"
+                f" ({', '.join('?' * len(batch))}) ORDER BY key",
+                batch,
+            ))
+        return values
 
-        with open(keypath, "w") as fob:
-            fob.write(val)
+    def set_many(self, values: Mapping[str, str]) -> None:
+        """Set all values atomically"""
+        with self._transaction() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)",
+                values.items(),
+            )
 
 
 # convenience functions
 
+_keystore: KeyStore | None = None
+
+
+def _default() -> KeyStore:
+    global _keystore
+    if _keystore is None:
+        _keystore = KeyStore(CACHE_DIR)
+    return _keystore
+
 
 def read(key, fallback: str = ""):
-    return KeyStore(CACHE_DIR).read(key, fallback)
+    return _default().read(key, fallback)
 
 
 def write(key: str, value: str) -> None:
-    return KeyStore(CACHE_DIR).write(key, value)
+    return _default().write(key, value)
+
+
+def get_many(keys: Iterable[str] | None = None) -> dict[str, str]:
+    return _default().get_many(keys)
+
+
+def set_many(values: Mapping[str, str]) -> None:
+    return _default().set_many(values)
+
+
+def export(keys: Iterable[str] | None = None) -> str:
+    """Return values as shell 'KEY=value' lines"""
+    lines = []
+    for key, val in get_many(keys).items():
+        if not SHELL_NAME_RE.match(key):
+            print(f"Warning: skipping key '{key}'", file=sys.stderr)
+            continue
+        lines.append(f"{key}={shlex.quote(val)}")
+    return "".join(f"{line}\n" for line in lines)
 
 
 if __name__ == "__main__":
     opts = []
     args = []
     try:
-        opts, args = getopt.gnu_getopt(sys.argv[1:], "h", ["help"])
+        opts, args = getopt.gnu_getopt(
+            sys.argv[1:], "h", ["help", "export", "import"]
+        )
     except getopt.GetoptError as e:
         usage(e)
 
+    do_export = False
+    do_import = False
     for opt, val in opts:
         if opt in ("-h", "--help"):
             usage()
+        elif opt == "--export":
+            do_export = True
+        elif opt == "--import":
+            do_import = True
+
+    if do_export and do_import:
+        usage("--export and --import are mutually exclusive")
+
+    if do_export:
+        sys.stdout.write(export(args or None))
+        sys.exit(0)
+
+    if do_import:
+        if args:
+            fatal("--import takes no arguments")
+        values = {}
+        for line in sys.stdin.read().splitlines():
+            if not line.strip():
+                continue
+            key, sep, val = line.partition("=")
+            if not sep:
+                fatal(f"expected KEY=value, got '{line}'")
+            values[key] = val
+        set_many(values)
+        sys.exit(0)
 
     if len(args) == 0:
         usage()
@@ -0,0 +1,181 @@
+#!/usr/bin/python3
+"""Wait for a TLS cert & key to be complete and a matching pair
+
+Arguments:
+
+    certfile            path to (PEM) cert
+    keyfile             path to (PEM) key (default: key is in certfile)
+
+Options:
+
+    --timeout=SECS      give up after SECS (default: 30)
+
+Exit codes:
+
+    0                   cert & key are ready to use
+    2                   timed out
+"""
+
+import ctypes
+import getopt
+import os
+import select
+import ssl
+import sys
+import time
+from typing import NoReturn
+
+DEFAULT_TIMEOUT = 30
+TIMEOUT_EXITCODE = 2
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_CLOEXEC = 0o2000000
+
+# used when inotify is unavailable
+POLL_INTERVAL = 0.5
+
+
+def fatal(e) -> NoReturn:
+    print(f"Error: {e}", file=sys.stderr)
+    sys.exit(1)
+
+
+def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
+    if msg:
+        print(f"Error: {msg}", file=sys.stderr)
+    print(
+        f"Syntax: {sys.argv[0]} [--timeout=SECS] <certfile> [keyfile]",
+        file=sys.stderr,
+    )
+    print(__doc__, file=sys.stderr)
+    sys.exit(1)
+
+
+def cert_ready(certfile: str, keyfile: str | None = None) -> bool:
+    """Return True if cert (and key) can be loaded and match
+
+    Works for any key type OpenSSL supports (RSA, EC, Ed25519).
+    """
+    try:
+        if not all(
+            os.path.getsize(path) > 0 for path in (certfile, keyfile) if path
+        ):
+            return False
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        # also checks that the key matches the cert
+        context.load_cert_chain(certfile=certfile, keyfile=keyfile)
+    except (ssl.SSLError, OSError):
+        return False
+    return True
+
+
+class DirWatch:
+    """inotify watch for files being written, moved or created in dirs
+
+    Falls back to waking every POLL_INTERVAL secs if inotify isn't
+    available.
+    """
+
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+    def __init__(self, dirs: list[str]) -> None:
+        self.fd = -1
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return
+        if fd < 0:
+            return
+        for path in set(dirs):
+            if libc.inotify_add_watch(fd, path.encode(), self.MASK) < 0:
+                os.close(fd)
+                return
+        self.fd = fd
+
+    def wait(self, timeout: float) -> None:
+        """Wait up to timeout secs for (any) event"""
+        if self.fd < 0:
+            time.sleep(min(timeout, POLL_INTERVAL))
+            return
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if readable:
+            os.read(self.fd, 65536)
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def __enter__(self) -> "DirWatch":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def wait_for_cert(
+    certfile: str,
+    keyfile: str | None = None,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> None:
+    """Wait until certfile and keyfile exist and are a matching pair
+
+    If keyfile is None, certfile is expected to contain both cert and key.
+    Rechecks whenever a file is written, moved or created alongside them.
+    Raises TimeoutError if they aren't ready within timeout secs.
+    """
+    deadline = time.monotonic() + timeout
+    dirs = [
+        os.path.dirname(os.path.abspath(path))
+        for path in (certfile, keyfile)
+        if path
+    ]
+    # watch before checking, so a write in between isn't missed
+    with DirWatch(dirs) as watch:
+        while not cert_ready(certfile, keyfile):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(
+                    f"Timed out after {timeout}s waiting for a valid"
+                    f" cert/key pair: {certfile}, {keyfile}"
+                )
+            watch.wait(remaining)
+
+
+def main() -> None:
+    opts = []
+    args = []
+    try:
+        opts, args = getopt.gnu_getopt(
+            sys.argv[1:], "h", ["help", "timeout="]
+        )
+    except getopt.GetoptError as e:
+        usage(e)
+
+    timeout: float = DEFAULT_TIMEOUT
+    for opt, val in opts:
+        if opt in ("-h", "--help"):
+            usage()
+        elif opt == "--timeout":
+            try:
+                timeout = float(val)
+                assert timeout >= 0
+            except (ValueError, AssertionError):
+                fatal(f"invalid timeout: '{val}'")
+
+    if len(args) not in (1, 2):
+        usage()
+
+    try:
+        wait_for_cert(*args, timeout=timeout)
+    except TimeoutError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(TIMEOUT_EXITCODE)
+
+
+if __name__ == "__main__":
+    main()
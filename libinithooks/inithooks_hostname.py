@@ -0,0 +1,190 @@
+#!/usr/bin/python3
+"""Replace the (old) hostname in config files with a new one
+
+Only whole hostnames are replaced (e.g. 'core' in 'core.localdomain' but not
+in 'tkl-core'), only files containing it are rewritten (atomically) and
+running services using a changed file are reloaded (queued with systemd,
+not waited for). Changed files are printed, one per line.
+
+Arguments:
+
+    old                 hostname to replace
+    new                 hostname to replace it with
+
+Options:
+
+    --dry-run           only print files which would change
+    --no-reload         don't reload services using changed files
+
+Files:
+
+    /etc/inithooks/hostname.d/*.conf
+                        extra files to rewrite; one per line, optionally
+                        followed by the units to reload if it changes, e.g.:
+
+                        /etc/myapp/myapp.conf myapp.service
+"""
+
+import getopt
+import glob
+import os
+import re
+import sys
+import tempfile
+from typing import NoReturn
+
+from libinithooks import inithooks_services
+
+DROPIN_GLOB = "/etc/inithooks/hostname.d/*.conf"
+
+# file: units to reload (if running) when it changes
+FILES: dict[str, list[str]] = {
+    "/etc/exim4/update-exim4.conf.conf": ["exim4.service"],
+    "/etc/printcap": [],
+    "/etc/hostname": [],
+    "/etc/hosts": [],
+    "/etc/network/interfaces": [],
+    "/etc/mailname": ["exim4.service", "postfix.service"],
+    "/etc/postfix/main.cf": ["postfix.service"],
+    "/etc/motd": [],
+    "/etc/ssmtp/ssmtp.conf": [],
+}
+
+# characters which may be part of a hostname label (other than '.')
+_LABEL_CHARS = rb"[A-Za-z0-9_-]"
+
+
+def fatal(e) -> NoReturn:
+    print(f"Error: {e}", file=sys.stderr)
+    sys.exit(1)
+
+
+def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
+    if msg:
+        print(f"Error: {msg}", file=sys.stderr)
+    print(
+        f"Syntax: {sys.argv[0]} [--dry-run] [--no-reload] <old> <new>",
+        file=sys.stderr,
+    )
+    print(__doc__, file=sys.stderr)
+    sys.exit(1)
+
+
+def hostname_re(hostname: str) -> re.Pattern[bytes]:
+    """Return regex matching hostname, but not as part of a longer label"""
+    return re.compile(
+        rb"(?<!" + _LABEL_CHARS + rb")"
+        + re.escape(hostname.encode())
+        + rb"(?!" + _LABEL_CHARS + rb")"
+    )
+
+
+def read_dropins(pattern: str = DROPIN_GLOB) -> dict[str, list[str]]:
+    files: dict[str, list[str]] = {}
+    for path in sorted(glob.glob(pattern)):
+        with open(path) as fob:
+            for line in fob:
+                line = line.split("#", 1)[0].strip()
+                if line:
+                    file, *units = line.split()
+                    files.setdefault(file, []).extend(units)
+    return files
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """Replace contents of path (keeping its mode and ownership)"""
+    st = os.stat(path)
+    fd, tmp = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=f".{os.path.basename(path)}."
+    )
+    try:
+        with os.fdopen(fd, "wb") as fob:
+            fob.write(data)
+            fob.flush()
+            os.fsync(fob.fileno())
+        os.chmod(tmp, st.st_mode & 0o7777)
+        os.chown(tmp, st.st_uid, st.st_gid)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def rewrite(
+    old: str, new: str, files: list[str], dry_run: bool = False
+) -> list[str]:
+    """Replace old hostname with new in files; return files changed"""
+    regex = hostname_re(old)
+    replacement = new.encode()
+    changed = []
+    for path in files:
+        try:
+            with open(path, "rb") as fob:
+                data = fob.read()
+        except (FileNotFoundError, IsADirectoryError):
+            continue
+        data, count = regex.subn(lambda _: replacement, data)
+        if not count:
+            continue
+        if not dry_run:
+            write_atomic(path, data)
+        changed.append(path)
+    return changed
+
+
+def main() -> None:
+    opts = []
+    args = []
+    try:
+        opts, args = getopt.gnu_getopt(
+            sys.argv[1:], "h", ["help", "dry-run", "no-reload"]
+        )
+    except getopt.GetoptError as e:
+        usage(e)
+
+    dry_run = False
+    reload = True
+    for opt, _ in opts:
+        if opt in ("-h", "--help"):
+            usage()
+        elif opt == "--dry-run":
+            dry_run = True
+        elif opt == "--no-reload":
+            reload = False
+
+    if len(args) != 2:
+        usage()
+
+    old, new = args
+    if not old:
+        fatal("old hostname is empty")
+    if old == new:
+        return
+
+    files = {path: list(units) for path, units in FILES.items()}
+    try:
+        for path, units in read_dropins().items():
+            files.setdefault(path, []).extend(units)
+    except OSError as e:
+        fatal(e)
+
+    try:
+        changed = rewrite(old, new, list(files), dry_run)
+    except OSError as e:
+        fatal(e)
+
+    for path in changed:
+        print(path)
+
+    units = list(dict.fromkeys(
+        unit for path in changed for unit in files[path]
+    ))
+    if reload and not dry_run and units:
+        # the new hostname is in place; the services needn't hold up boot
+        if not inithooks_services.restart_active(units, no_block=True):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,201 @@
+import atexit
 import os
-import subprocess
-from dataclasses import dataclass
+import socket
+import struct
+import threading
 
 INITHOOK_LOG = os.getenv("INITHOOKS_LOGFILE", "/var/log/inithooks.log")
 LOG_LEVELS = ["err", "warn", "info", "debug"]
 
+# syslog severities
+PRIORITIES = {"err": 3, "warn": 4, "info": 6, "debug": 7}
+FACILITY_USER = 1
+
+SYSLOG_IDENTIFIER = "inithooks"
+JOURNAL_SOCKET = os.getenv(
+    "INITHOOKS_JOURNAL_SOCKET", "/run/systemd/journal/socket"
+)
+SYSLOG_SOCKET = os.getenv("INITHOOKS_SYSLOG_SOCKET", "/dev/log")
+
 
 class InitLogError(Exception):
     pass
 
 
-@dataclass
+def _journal_field(key: str, val: str) -> bytes:
+    data = val.encode("utf-8", "replace")
+    if b"\n" not in data:
+        return key.encode() + b"=" + data + b"\n"
+    # multi-line values use the binary form of the native protocol
+    return key.encode() + b"\n" + struct.pack("<Q", len(data)) + data + b"\n"
+
+
+class JournalSink:
+    """Single kept-open datagram connection to the journal
+
+    Uses journald's native protocol (so structured fields are kept) and
+    falls back to the syslog socket, then to forking logger(1).
+    """
+
+    def __init__(
+        self,
+        journal_socket: str = JOURNAL_SOCKET,
+        syslog_socket: str = SYSLOG_SOCKET,
+        identifier: str = SYSLOG_IDENTIFIER,
+    ) -> None:
+        self.journal_socket = journal_socket
+        self.syslog_socket = syslog_socket
+        self.identifier = identifier
+        self._sock: socket.socket | None = None
+        self._native = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> socket.socket | None:
+        for path, native in (
+            (self.journal_socket, True),
+            (self.syslog_socket, False),
+        ):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            try:
+                sock.connect(path)
+            except OSError:
+                sock.close()
+                continue
+            self._native = native
+            return sock
+        return None
+
+    def _format(self, msg: str, level: str, fields: dict[str, str]) -> bytes:
+        if self._native:
+            record = [
+                _journal_field("MESSAGE", msg),
+                _journal_field("PRIORITY", str(PRIORITIES[level])),
+                _journal_field("SYSLOG_IDENTIFIER", self.identifier),
+            ]
+            for key, val in fields.items():
+                record.append(_journal_field(key.upper(), val))
+            return b"".join(record)
+
+        pri = FACILITY_USER * 8 + PRIORITIES[level]
+        return f"<{pri}>{self.identifier}: {msg}".encode("utf-8", "replace")
+
+    def send(self, msg: str, level: str = "info", **fields: str) -> None:
+        with self._lock:
+            if self._sock is None:
+                self._sock = self._connect()
+            if self._sock is not None:
+                try:
+                    self._sock.send(self._format(msg, level, fields))
+                    return
+                except OSError:
+                    # journald restarted or message too large; reconnect
+                    # next time and don't lose this one
+                    self._sock.close()
+                    self._sock = None
+        # last resort only; not imported up front to keep imports light
+        import subprocess
+
+        subprocess.run(
+            ["/usr/bin/logger", "-t", self.identifier, "-p", level, msg]
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+
+
+class FileSink:
+    """Log file kept open for the life of the process
+
+    Lines are written as they are logged (so 'tail -f' followers still see
+    them) but the file is only fsync'd on flush() and at exit.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._fob = open(path, "a", buffering=1)
+        self._lock = threading.Lock()
+
+    def write(self, line: str) -> None:
+        with self._lock:
+            self._fob.write(f"{line}\n")
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._fob.closed:
+                return
+            self._fob.flush()
+            os.fsync(self._fob.fileno())
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._fob.close()
+
+
+_journal = JournalSink()
+_files: dict[str, FileSink] = {}
+_files_lock = threading.Lock()
+
+
+def journal() -> JournalSink:
+    return _journal
+
+
+def file_sink(path: str) -> FileSink:
+    with _files_lock:
+        if path not in _files:
+            _files[path] = FileSink(path)
+        return _files[path]
+
+
+def flush() -> None:
+    """fsync all open log files"""
+    with _files_lock:
+        sinks = list(_files.values())
+    for sink in sinks:
+        sink.flush()
+
+
+@atexit.register
+def _close() -> None:
+    with _files_lock:
+        sinks = list(_files.values())
+        _files.clear()
+    for sink in sinks:
+        sink.close()
+    _journal.close()
+
+
+def structured_fields(
+    hook: str | None = None, duration: float | None = None
+) -> dict[str, str]:
+    fields = {}
+    if hook:
+        fields["INITHOOKS_HOOK"] = hook
+    if duration is not None:
+        fields["INITHOOKS_DURATION"] = f"{duration:.3f}"
+    return fields
+
+
 class InitLog:
-    inithook_name: str
-    log_file: str = INITHOOK_LOG
+    # not a dataclass; importing dataclasses costs more than the rest of
+    # libinithooks (and is imported by every bin/ helper)
+    def __init__(self, inithook_name: str, log_file: str = INITHOOK_LOG):
+        self.inithook_name = inithook_name
+        self.log_file = log_file
 
-    def write(self, msg: str, level: str = "info") -> None:
+    def write(
+        self, msg: str, level: str = "info", duration: float | None = None
+    ) -> None:
         """Write to log & journal
         valid levels: err|warn|info|debug
         """
         if level not in LOG_LEVELS:
             raise InitLogError(f"invalid log level '{level}'")
         msg = f"[{self.inithook_name}] {msg}".rstrip()
-        subprocess.run(
-            [
-                "/usr/bin/logger",
-                "-t",
-                "inithooks",
-                "-p",
-                level,
-                msg,
-            ]
-        )
-        with open(self.log_file, "a") as fob:
-            fob.write(f"{msg}\n")
+        fields = structured_fields(self.inithook_name, duration)
+        journal().send(msg, level, **fields)
+        file_sink(self.log_file).write(msg)
@@ -0,0 +1,269 @@
+#!/usr/bin/python3
+"""Compile (and cache) the manifest of an inithooks directory and check
+preseed values
+
+The manifest lists the hooks in a directory with their headers. It is cached
+(keyed by the mtimes of the directory and its hooks) so hook headers are only
+parsed again when hooks change.
+
+Arguments:
+
+    script_dir          directory of hook scripts (e.g. firstboot.d)
+
+Options:
+
+    --conf=PATH         also check the preseed values in PATH
+    --json              print the manifest as JSON
+
+Environment:
+
+    INITHOOKS_MANIFEST_DIR  where manifests are cached
+                            (default: /var/lib/inithooks/manifest)
+
+Exit codes:
+
+    0                   manifest printed (and preseed values are valid)
+    1                   invalid preseed values (or other error)
+"""
+
+import getopt
+import json
+import os
+import re
+import subprocess
+import sys
+from dataclasses import asdict, dataclass
+from typing import NoReturn
+
+MANIFEST_DIR = os.environ.get(
+    "INITHOOKS_MANIFEST_DIR", "/var/lib/inithooks/manifest"
+)
+
+HEADER_RE = re.compile(r"^#\s*inithooks-(?P<key>[a-z-]+):(?P<val>.*)$")
+HEADER_MAX_LINES = 32
+
+# set by bash itself when sourcing the preseed conf; not part of it
+_BASH_VARS = ("_", "PWD", "OLDPWD", "SHLVL")
+
+_EMAIL = r"[^@\s]+@[^@\s]+\.[^@\s]+"
+
+# preseed: (valid values, description); values not matching are reported
+PRESEEDS = {
+    "APP_EMAIL": (_EMAIL, "an email address"),
+    "DH_BITS": (r"1024|2048|4096", "1024, 2048 or 4096"),
+    "HUB_APIKEY": (r"SKIP|[A-Za-z0-9]+", "SKIP or a Hub API key"),
+    "INITFENCE": (r"SKIP", "SKIP"),
+    "REBOOT": (r"SKIP", "SKIP"),
+    "SEC_ALERTS": (rf"SKIP|{_EMAIL}", "SKIP or an email address"),
+    "SEC_UPDATES": (r"(?i:skip|force)", "SKIP or FORCE"),
+    "SEC_UPDATES_INDEX_MAX_AGE": (r"\d+", "a number of minutes"),
+    "SSH_KEY_TYPES": (
+        r"(?i:\s*(rsa|ecdsa|ed25519)(\s+(rsa|ecdsa|ed25519))*\s*)",
+        "a list of rsa, ecdsa and/or ed25519",
+    ),
+    "SSH_RSA_BITS": (r"[1-9]\d{3,4}", "a number of bits (e.g. 3072)"),
+}
+
+
+def fatal(e) -> NoReturn:
+    print(f"Error: {e}", file=sys.stderr)
+    sys.exit(1)
+
+
+def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
+    if msg:
+        print(f"Error: {msg}", file=sys.stderr)
+    print(
+        f"Syntax: {sys.argv[0]} [--conf=PATH] [--json] <script_dir>",
+        file=sys.stderr,
+    )
+    print(__doc__, file=sys.stderr)
+    sys.exit(1)
+
+
+def parse_headers(path: str) -> dict[str, str]:
+    """Return 'inithooks-' headers from the leading comment block of path"""
+    headers = {}
+    try:
+        with open(path, "rb") as fob:
+            for i, raw in enumerate(fob):
+                if i >= HEADER_MAX_LINES:
+                    break
+                line = raw.decode("utf-8", "replace").strip()
+                if not line:
+                    continue
+                if not line.startswith("#"):
+                    break
+                m = HEADER_RE.match(line)
+                if m:
+                    headers[m.group("key")] = m.group("val").strip()
+    except OSError:
+        pass
+    return headers
+
+
+@dataclass
+class Hook:
+    path: str
+    name: str
+    after: list[str] | None = None
+    defer: list[str] | None = None
+    # when the manifest was compiled; hooks may chmod others (e.g. 99reboot)
+    executable: bool = True
+
+    @classmethod
+    def load(cls, path: str) -> "Hook":
+        headers = parse_headers(path)
+        after = None
+        if "after" in headers:
+            after = headers["after"].split()
+        defer = None
+        if "defer" in headers:
+            defer = headers["defer"].split()
+        executable = os.access(path, os.X_OK)
+        return cls(path, os.path.basename(path), after, defer, executable)
+
+    @property
+    def prefix(self) -> int | None:
+        prefix = self.name[:2]
+        if len(prefix) == 2 and prefix.isdigit():
+            return int(prefix)
+        return None
+
+
+def _scan(script_dir: str) -> tuple[list[str], list]:
+    """Return (sorted hook paths, cache key)"""
+    key: list = [os.stat(script_dir).st_mtime_ns]
+    paths = []
+    with os.scandir(script_dir) as entries:
+        for entry in sorted(entries, key=lambda entry: entry.name):
+            if entry.is_file() or entry.is_symlink():
+                paths.append(entry.path)
+                try:
+                    st = entry.stat()
+                except OSError:
+                    # dangling symlink
+                    key.append([entry.name])
+                    continue
+                key.append([entry.name, st.st_mtime_ns, st.st_size])
+    return paths, key
+
+
+def discover(script_dir: str) -> list[Hook]:
+    """Return hooks in script_dir, in execution (alphanumeric) order"""
+    paths, _ = _scan(script_dir)
+    return [Hook.load(path) for path in paths]
+
+
+def manifest_path(script_dir: str, cache_dir: str = MANIFEST_DIR) -> str:
+    name = os.path.abspath(script_dir).strip("/").replace("/", "_")
+    return os.path.join(cache_dir, f"{name}.json")
+
+
+def load(script_dir: str, cache_dir: str = MANIFEST_DIR) -> list[Hook]:
+    """Return hooks in script_dir, from the cached manifest if current"""
+    paths, key = _scan(script_dir)
+    path = manifest_path(script_dir, cache_dir)
+    try:
+        with open(path) as fob:
+            manifest = json.load(fob)
+        if manifest["key"] == key:
+            return [Hook(**hook) for hook in manifest["hooks"]]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    hooks = [Hook.load(path) for path in paths]
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as fob:
+            json.dump(
+                {"key": key, "hooks": [asdict(hook) for hook in hooks]}, fob
+            )
+        os.replace(tmp, path)
+    except OSError:
+        # e.g. read-only; just not cached
+        pass
+    return hooks
+
+
+def read_conf(conf: str, env: dict[str, str]) -> dict[str, str]:
+    """Return env with the values set in (bash) preseed conf added
+
+    Values are included whether or not the conf exports them.
+    """
+    proc = subprocess.run(
+        ["bash", "-c", 'set -a; source "$1" >/dev/null 2>&1; env -0',
+         "bash", conf],
+        env=env,
+        capture_output=True,
+    )
+    new_env = dict(env)
+    for item in proc.stdout.split(b"\0"):
+        name, sep, val = item.decode("utf-8", "replace").partition("=")
+        if sep and name not in _BASH_VARS:
+            new_env[name] = val
+    return new_env
+
+
+def validate(env: dict[str, str]) -> dict[str, str]:
+    """Return {name: error} of preseed values in env which aren't valid"""
+    errors = {}
+    for name, (regex, description) in PRESEEDS.items():
+        val = env.get(name)
+        if val and not re.fullmatch(regex, val):
+            errors[name] = f"invalid {name} - must be {description}"
+    return errors
+
+
+def main() -> None:
+    opts = []
+    args = []
+    try:
+        opts, args = getopt.gnu_getopt(
+            sys.argv[1:], "h", ["help", "conf=", "json"]
+        )
+    except getopt.GetoptError as e:
+        usage(e)
+
+    conf = None
+    as_json = False
+    for opt, val in opts:
+        if opt in ("-h", "--help"):
+            usage()
+        elif opt == "--conf":
+            conf = val
+        elif opt == "--json":
+            as_json = True
+
+    if len(args) != 1:
+        usage()
+
+    try:
+        hooks = load(args[0])
+    except OSError as e:
+        fatal(e)
+
+    if as_json:
+        print(json.dumps([asdict(hook) for hook in hooks], indent=2))
+    else:
+        for hook in hooks:
+            attrs = []
+            if not hook.executable:
+                attrs.append("not executable")
+            if hook.after is not None:
+                attrs.append(f"after: {' '.join(hook.after) or '-'}")
+            if hook.defer is not None:
+                attrs.append(f"defer: {' '.join(hook.defer)}")
+            print(f"{hook.name:24} {', '.join(attrs)}".rstrip())
+
+    if conf:
+        errors = validate(read_conf(conf, dict(os.environ)))
+        for error in errors.values():
+            print(f"Error: {error}", file=sys.stderr)
+        if errors:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
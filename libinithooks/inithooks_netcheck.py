@@ -0,0 +1,313 @@
+#!/usr/bin/python3
+"""Check (and cache) whether network endpoints can be reached
+
+Endpoints are probed concurrently - a DNS lookup and a TCP connection, all
+within a single timeout - and the results are kept in the inithooks cache,
+so hooks needing the network can find out whether it works without each
+waiting for their own timeouts.
+
+Arguments:
+
+    endpoint            endpoint name (default: all) or name=host:port
+
+Options:
+
+    --timeout=SECS      give up on probing after SECS (default: 5)
+    --max-age=SECS      use cached results up to SECS old (default:
+                        $INITHOOKS_NETCHECK_MAX_AGE, or 600 - 120 for
+                        unreachable endpoints; 0 always probes)
+    --json              print the results as JSON
+    --quiet             don't print the results, just set the exit code
+
+Environment:
+
+    INITHOOKS_NETCHECK_ENDPOINTS
+                        space separated name=host:port endpoints, added to
+                        (or replacing) the defaults: hub, archive, security
+    INITHOOKS_NETCHECK_MAX_AGE
+                        default --max-age (e.g. 0 to ignore cached results)
+
+Exit codes:
+
+    0                   all endpoints are reachable
+    1                   at least one isn't (or other error)
+"""
+
+import getopt
+import json
+import os
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Mapping, NamedTuple, NoReturn
+
+from libinithooks import inithooks_cache
+
+ENDPOINTS = {
+    "hub": "hub.turnkeylinux.org:443",
+    "archive": "archive.turnkeylinux.org:80",
+    "security": "security.debian.org:80",
+}
+
+PROBE_TIMEOUT = 5.0
+# secs cached results are used for (failures are rechecked sooner)
+TTL = 600
+FAILED_TTL = 120
+
+
+def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
+    if msg:
+        print(f"Error: {msg}", file=sys.stderr)
+    print(f"Syntax: {sys.argv[0]} [options] [endpoint ...]", file=sys.stderr)
+    print(__doc__, file=sys.stderr)
+    sys.exit(1)
+
+
+class Status(NamedTuple):
+    endpoint: str
+    address: str
+    ok: bool
+    message: str
+    # time.time() when probed
+    checked: float
+    duration: float
+    cached: bool = False
+
+
+def endpoints() -> dict[str, str]:
+    """Return {name: address} of the known endpoints"""
+    known = dict(ENDPOINTS)
+    for item in os.environ.get("INITHOOKS_NETCHECK_ENDPOINTS", "").split():
+        name, sep, address = item.partition("=")
+        if sep:
+            known[name] = address
+    return known
+
+
+def cache_key(name: str) -> str:
+    return "NETCHECK_" + name.upper().replace("-", "_")
+
+
+def split_address(address: str) -> tuple[str, int]:
+    host, sep, port = address.rpartition(":")
+    if not sep or not port.isdigit():
+        return address, 443
+    return host.strip("[]"), int(port)
+
+
+async def probe(address: str) -> tuple[bool, str]:
+    """Look up address and connect to it (each of its IPs at once; the first
+    to connect wins); the caller sets the timeout"""
+    import asyncio
+    import socket
+
+    host, port = split_address(address)
+
+    async def connect(ip: str) -> None:
+        _, writer = await asyncio.open_connection(ip, port)
+        writer.close()
+
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            host, port, type=socket.SOCK_STREAM
+        )
+    except OSError as e:
+        return False, f"DNS lookup failed - {e}"
+
+    tasks = {
+        asyncio.create_task(connect(ip))
+        for ip in dict.fromkeys(info[4][0] for info in infos)
+    }
+    error: BaseException | None = None
+    try:
+        while tasks:
+            done, tasks = await asyncio.wait(
+                tasks, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                error = task.exception()
+                if error is None:
+                    return True, "reachable"
+    finally:
+        for task in tasks:
+            task.cancel()
+    return False, f"connection failed - {error}"
+
+
+async def _probe_all(
+    todo: Mapping[str, str], timeout: float
+) -> list[Status]:
+    import asyncio
+
+    async def timed(name: str, address: str) -> Status:
+        start = time.monotonic()
+        try:
+            ok, message = await asyncio.wait_for(probe(address), timeout)
+        except TimeoutError:
+            ok, message = False, f"timed out after {timeout}s"
+        return Status(name, address, ok, message, time.time(),
+                      time.monotonic() - start)
+
+    return await asyncio.gather(
+        *(timed(name, address) for name, address in todo.items())
+    )
+
+
+def _dump(status: Status) -> str:
+    values = status._asdict()
+    del values["cached"]
+    return json.dumps(values)
+
+
+@contextmanager
+def _locked() -> Iterator[None]:
+    """Serialize checks, so concurrent ones wait for (and use) the results
+    of the first rather than probing again"""
+    import fcntl
+
+    path = inithooks_cache.CACHE_DIR.rstrip("/") + ".netcheck.lock"
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    except OSError:
+        # e.g. not root; check regardless
+        yield
+        return
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def check(
+    names: Iterable[str] | Mapping[str, str] | None = None,
+    timeout: float = PROBE_TIMEOUT,
+    max_age: float | None = None,
+) -> dict[str, Status]:
+    """Return {name: Status} of endpoints (names, or {name: address}),
+    probing those without recent enough cached results"""
+    known = endpoints()
+    if names is None:
+        names = known
+    if isinstance(names, Mapping):
+        wanted = dict(names)
+    else:
+        wanted = {}
+        for name in names:
+            if name not in known:
+                raise ValueError(f"unknown endpoint: {name}")
+            wanted[name] = known[name]
+
+    with _locked():
+        try:
+            cached = inithooks_cache.get_many(cache_key(n) for n in wanted)
+        except (OSError, sqlite3.Error):
+            cached = {}
+
+        now = time.time()
+        results = {}
+        for name, address in wanted.items():
+            try:
+                status = Status(**json.loads(cached[cache_key(name)]),
+                                cached=True)
+            except (KeyError, TypeError, ValueError):
+                continue
+            ttl = max_age
+            if ttl is None and os.environ.get("INITHOOKS_NETCHECK_MAX_AGE"):
+                ttl = float(os.environ["INITHOOKS_NETCHECK_MAX_AGE"])
+            if ttl is None:
+                ttl = TTL if status.ok else FAILED_TTL
+            if status.address == address and 0 <= now - status.checked < ttl:
+                results[name] = status
+
+        todo = {n: a for n, a in wanted.items() if n not in results}
+        if todo:
+            import asyncio
+
+            probed = asyncio.run(_probe_all(todo, timeout))
+            try:
+                inithooks_cache.set_many({
+                    cache_key(status.endpoint): _dump(status)
+                    for status in probed
+                })
+            except (OSError, sqlite3.Error):
+                pass
+            results.update((status.endpoint, status) for status in probed)
+
+    return {name: results[name] for name in wanted}
+
+
+def reachable(*names: str, **kwargs) -> bool:
+    """Return True if all the named endpoints can be reached (see check)"""
+    return all(status.ok for status in check(names, **kwargs).values())
+
+
+def main() -> None:
+    opts = []
+    args = []
+    try:
+        opts, args = getopt.gnu_getopt(
+            sys.argv[1:], "hq",
+            ["help", "timeout=", "max-age=", "json", "quiet"],
+        )
+    except getopt.GetoptError as e:
+        usage(e)
+
+    timeout = PROBE_TIMEOUT
+    max_age = None
+    as_json = False
+    quiet = False
+    for opt, val in opts:
+        if opt in ("-h", "--help"):
+            usage()
+        elif opt in ("--timeout", "--max-age"):
+            try:
+                if opt == "--timeout":
+                    timeout = float(val)
+                else:
+                    max_age = float(val)
+            except ValueError:
+                usage(f"invalid {opt}: '{val}'")
+        elif opt == "--json":
+            as_json = True
+        elif opt in ("-q", "--quiet"):
+            quiet = True
+
+    names = None
+    if args:
+        known = endpoints()
+        names = {}
+        for arg in args:
+            name, sep, address = arg.partition("=")
+            if not sep:
+                if name not in known:
+                    usage(f"unknown endpoint: {name}")
+                address = known[name]
+            names[name] = address
+
+    results = check(names, timeout, max_age)
+
+    if as_json:
+        print(json.dumps([status._asdict() for status in results.values()],
+                         indent=2))
+    elif not quiet:
+        now = time.time()
+        for status in results.values():
+            state = "ok" if status.ok else "FAILED"
+            line = f"{status.endpoint:10} {state:6} {status.address}"
+            if not status.ok:
+                line += f" - {status.message}"
+            if status.cached:
+                line += f" (cached, {now - status.checked:.0f}s ago)"
+            else:
+                line += f" ({status.duration:.2f}s)"
+            print(line)
+
+    if not all(status.ok for status in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+#!/usr/bin/python3
+"""Outbox of Hub API calls and mails, sent in the background
+
+Queued items are kept in a spool directory (a file each) until sent; those
+which can't be sent yet (e.g. offline) are retried with exponential backoff
+by inithooks-outbox.timer. Queuing an item with the same key as a queued one
+replaces it, and mails due for the same recipient are sent as one.
+
+Commands:
+
+    hub URL [NAME=VALUE ...]    queue a (form encoded) POST to URL
+    mail RECIPIENT SUBJECT      queue a mail; the body is read from stdin
+    send                        send the queued items which are due
+    list                        list the queued items
+
+Options:
+
+    --key=KEY           (hub, mail) replace the queued item with KEY, if any
+                        (default for hub: URL)
+    --all               (send) send all items, including those backing off
+
+Environment:
+
+    INITHOOKS_OUTBOX    spool directory
+                        (default: /var/spool/inithooks/outbox)
+
+Exit codes:
+
+    0                   success (send: no item failed)
+    1                   error (send: at least one item failed)
+"""
+
+import getopt
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Iterator, NoReturn
+
+from libinithooks import error, info, warn
+
+OUTBOX_DIR = os.environ.get(
+    "INITHOOKS_OUTBOX", "/var/spool/inithooks/outbox"
+)
+
+HTTP_TIMEOUT = 30
+# secs before the first retry; doubled after each failure up to the max
+RETRY_DELAY = 300
+MAX_RETRY_DELAY = 6 * 60 * 60
+# items still not sent after this many secs are dropped
+EXPIRE = 7 * 24 * 60 * 60
+
+
+def fatal(e) -> NoReturn:
+    print(f"Error: {e}", file=sys.stderr)
+    sys.exit(1)
+
+
+def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
+    if msg:
+        print(f"Error: {msg}", file=sys.stderr)
+    print(
+        f"Syntax: {sys.argv[0]} hub <url> [name=value ...]"
+        " | mail <recipient> <subject> | send | list",
+        file=sys.stderr,
+    )
+    print(__doc__, file=sys.stderr)
+    sys.exit(1)
+
+
+class PermanentError(Exception):
+    """Sending failed in a way retrying won't fix (e.g. HTTP 400)"""
+
+
+@dataclass
+class Item:
+    kind: str
+    key: str
+    # hub: url, data; mail: recipient, subject, body
+    payload: dict
+    created: float
+    attempts: int = 0
+    next_attempt: float = 0.0
+    last_error: str = ""
+    # spool file (not saved)
+    path: str = field(default="", compare=False)
+
+    def describe(self) -> str:
+        if self.kind == "hub":
+            return f"hub {self.payload['url']}"
+        return f"mail to {self.payload['recipient']}"
+
+
+class Outbox:
+    """Spool directory of Items, one JSON file each (named so that they sort
+    in the order queued)"""
+
+    def __init__(self, path: str = OUTBOX_DIR) -> None:
+        self.path = path
+
+    def items(self) -> list[Item]:
+        try:
+            names = sorted(
+                name for name in os.listdir(self.path)
+                if name.endswith(".json")
+            )
+        except FileNotFoundError:
+            return []
+        items = []
+        for name in names:
+            path = os.path.join(self.path, name)
+            try:
+                with open(path) as fob:
+                    items.append(Item(**json.load(fob), path=path))
+            except FileNotFoundError:
+                # sent meanwhile
+                continue
+            except (TypeError, ValueError) as e:
+                warn(f"outbox: ignoring invalid item {path}: {e}")
+        return items
+
+    def _save(self, item: Item) -> None:
+        """Write item durably - replaced atomically, synced to disk"""
+        values = asdict(item)
+        del values["path"]
+        tmp = f"{item.path}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, "w") as fob:
+            json.dump(values, fob)
+            fob.flush()
+            os.fsync(fob.fileno())
+        os.replace(tmp, item.path)
+        dir_fd = os.open(self.path, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    def remove(self, item: Item) -> None:
+        try:
+            os.remove(item.path)
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def locked(self, blocking: bool = True) -> Iterator[bool]:
+        """Lock the outbox (lock file beside it, so the spool directory is
+        empty when there's nothing queued); yields False if not blocking and
+        already locked"""
+        import fcntl
+
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        fd = os.open(f"{self.path.rstrip('/')}.lock",
+                     os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            try:
+                flags = fcntl.LOCK_EX if blocking else (
+                    fcntl.LOCK_EX | fcntl.LOCK_NB
+                )
+                fcntl.flock(fd, flags)
+            except BlockingIOError:
+                yield False
+                return
+            yield True
+        finally:
+            os.close(fd)
+
+    def put(self, kind: str, payload: dict, key: str = "") -> Item:
+        """Queue an item, replacing any queued item with the same key"""
+        with self.locked():
+            replaced = [item for item in self.items() if key and
+                        item.key == key]
+            name = f"{time.time_ns():020d}-{kind}.json"
+            item = Item(kind, key, payload, time.time(),
+                        path=os.path.join(self.path, name))
+            self._save(item)
+            for old in replaced:
+                self.remove(old)
+        return item
+
+    def send(self, send_all: bool = False) -> list[tuple[Item, str]]:
+        """Send the items which are due; returns [(item, error)] of those
+        which failed (and will be retried, unless dropped)"""
+        with self.locked(blocking=False) as acquired:
+            if not acquired:
+                # already being sent
+                return []
+            now = time.time()
+            due = [item for item in self.items()
+                   if send_all or item.next_attempt <= now]
+            failed = []
+            mails: dict[str, list[Item]] = {}
+            for item in due:
+                if item.kind == "mail":
+                    mails.setdefault(item.payload["recipient"], []).append(
+                        item
+                    )
+                    continue
+                failed += self._attempt([item], post)
+            for group in mails.values():
+                failed += self._attempt(group, mail)
+            return failed
+
+    def _attempt(self, items: list[Item], func) -> list[tuple[Item, str]]:
+        """Send items (as one) with func; on failure, back off or drop"""
+        try:
+            func(items)
+        except PermanentError as e:
+            for item in items:
+                error(f"outbox: {item.describe()} failed (dropped) - {e}")
+                self.remove(item)
+            return [(item, str(e)) for item in items]
+        except Exception as e:
+            failed = []
+            for item in items:
+                item.attempts += 1
+                item.last_error = str(e)
+                if time.time() - item.created > EXPIRE:
+                    error(f"outbox: {item.describe()} failed {item.attempts}"
+                          f" times (dropped) - {e}")
+                    self.remove(item)
+                else:
+                    delay = min(RETRY_DELAY * 2 ** (item.attempts - 1),
+                                MAX_RETRY_DELAY)
+                    # so many servers offline together don't retry together
+                    item.next_attempt = time.time() + delay * (
+                        random.uniform(1, 1.25)
+                    )
+                    warn(f"outbox: {item.describe()} failed (retrying in"
+                         f" {delay}s) - {e}")
+                    self._save(item)
+                failed.append((item, str(e)))
+            return failed
+
+        for item in items:
+            info(f"outbox: sent {item.describe()}")
+            self.remove(item)
+        return []
+
+
+def post(items: list[Item]) -> None:
+    """POST the (single) hub item"""
+    import urllib.error
+    import urllib.parse
+    import urllib.request
+
+    [item] = items
+    request = urllib.request.Request(
+        item.payload["url"],
+        data=urllib.parse.urlencode(item.payload["data"]).encode(),
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=HTTP_TIMEOUT) as resp:
+            resp.read()
+    except urllib.error.HTTPError as e:
+        if e.code < 500 and e.code not in (408, 429):
+            raise PermanentError(f"HTTP {e.code} {e.reason}") from e
+        raise
+
+
+def mail(items: list[Item]) -> None:
+    """Send mail items (all for the same recipient) as one mail"""
+    if len(items) == 1:
+        subject = items[0].payload["subject"]
+        body = items[0].payload["body"]
+    else:
+        subject = f"{items[0].payload['subject']} (+{len(items) - 1} more)"
+        body = "\n\n".join(
+            f"{item.payload['subject']}\n{'=' * len(item.payload['subject'])}"
+            f"\n\n{item.payload['body']}"
+            for item in items
+        )
+    proc = subprocess.run(
+        ["mail", "-s", subject, items[0].payload["recipient"]],
+        input=body,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(
+            proc.stderr.strip() or f"mail exit code {proc.returncode}"
+        )
+
+
+def main() -> None:
+    opts = []
+    args = []
+    try:
+        opts, args = getopt.gnu_getopt(
+            sys.argv[1:], "h", ["help", "key=", "all"]
+        )
+    except getopt.GetoptError as e:
+        usage(e)
+
+    key = ""
+    send_all = False
+    for opt, val in opts:
+        if opt in ("-h", "--help"):
+            usage()
+        elif opt == "--key":
+            key = val
+        elif opt == "--all":
+            send_all = True
+
+    if not args:
+        usage()
+    command, args = args[0], args[1:]
+    outbox = Outbox()
+    try:
+        if command == "hub":
+            if not args:
+                usage("hub requires a URL")
+            data = {}
+            for arg in args[1:]:
+                name, sep, val = arg.partition("=")
+                if not sep:
+                    usage(f"expected name=value, got '{arg}'")
+                data[name] = val
+            outbox.put("hub", {"url": args[0], "data": data},
+                       key or args[0])
+        elif command == "mail":
+            if len(args) != 2:
+                usage("mail requires a recipient and a subject")
+            outbox.put("mail", {"recipient": args[0], "subject": args[1],
+                                "body": sys.stdin.read()}, key)
+        elif command == "send":
+            if args:
+                usage("send takes no arguments")
+            if outbox.send(send_all):
+                sys.exit(1)
+        elif command == "list":
+            now = time.time()
+            for item in outbox.items():
+                line = f"{os.path.basename(item.path)} {item.describe()}"
+                if item.attempts:
+                    line += (f" - {item.attempts} attempts, next in"
+                             f" {max(item.next_attempt - now, 0):.0f}s:"
+                             f" {item.last_error}")
+                print(line)
+        else:
+            usage(f"unknown command: {command}")
+    except OSError as e:
+        fatal(e)
+
+
+if __name__ == "__main__":
+    main()
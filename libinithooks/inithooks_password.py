@@ -0,0 +1,330 @@
+#!/usr/bin/python3
+"""Check passwords against a password policy
+
+Passwords are read from stdin (one per line); those which don't meet the
+policy are printed with the reasons why.
+
+Options:
+
+    --min-length=N      minimum length (default: 8)
+    --min-categories=N  minimum number of character categories - lowercase,
+                        uppercase, numbers, symbols (default: 3)
+    --forbidden=CHARS   characters passwords must not contain
+    --dict=PATH         sorted list of common passwords to reject
+                        (default: $INITHOOKS_PASSWORD_DICT or
+                        /usr/share/inithooks/common-passwords, if present)
+    --build-dict=PATH   instead, write the words read from stdin to PATH as
+                        a dictionary (lowercased, sorted and deduplicated)
+    --quiet             don't print invalid passwords, just exit 1
+
+Exit codes:
+
+    0                   all passwords meet the policy
+    1                   at least one doesn't (or other error)
+"""
+
+import getopt
+import mmap
+import os
+import re
+import sys
+from typing import NoReturn
+
+DEFAULT_DICT = os.environ.get(
+    "INITHOOKS_PASSWORD_DICT", "/usr/share/inithooks/common-passwords"
+)
+
+# character categories (bits)
+LOWER = 1
+UPPER = 2
+DIGIT = 4
+SYMBOL = 8
+# not a category; passwords can't contain control characters
+CONTROL = 16
+# (per policy) a forbidden character
+FORBIDDEN = 32
+
+# number of categories in each combination of category bits
+_COUNT = bytes(bin(bits).count("1") for bits in range(16))
+
+
+def fatal(e) -> NoReturn:
+    print(f"Error: {e}", file=sys.stderr)
+    sys.exit(1)
+
+
+def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
+    if msg:
+        print(f"Error: {msg}", file=sys.stderr)
+    print(f"Syntax: {sys.argv[0]} [options] < passwords", file=sys.stderr)
+    print(__doc__, file=sys.stderr)
+    sys.exit(1)
+
+
+def _category(ch: str) -> int:
+    if ch.isdigit():
+        return DIGIT
+    if ch.islower():
+        return LOWER
+    if ch.isupper():
+        return UPPER
+    if not ch.isprintable():
+        return CONTROL
+    if ch.isalpha():
+        # e.g. CJK - neither upper nor lower case
+        return LOWER
+    return SYMBOL
+
+
+# category of each ASCII character
+_ASCII = bytes(_category(chr(code)) for code in range(128))
+
+
+def classify(password: str) -> int:
+    """Return the category bits of the characters in password"""
+    bits = 0
+    for ch in password:
+        code = ord(ch)
+        bits |= _ASCII[code] if code < 128 else _category(ch)
+    return bits
+
+
+def complexity(password: str) -> int:
+    """Return the number of character categories in password (0 to 4)"""
+    return _COUNT[classify(password) & 15]
+
+
+class Dictionary:
+    """Sorted list of (lowercase) words, one per line, searched in place"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as fob:
+            size = os.fstat(fob.fileno()).st_size
+            self.map = None
+            if size:
+                self.map = mmap.mmap(
+                    fob.fileno(), 0, access=mmap.ACCESS_READ
+                )
+
+    def __contains__(self, word: str) -> bool:
+        data = self.map
+        if data is None:
+            return False
+        key = word.lower().encode()
+        # binary search; lo is always the start of a line
+        lo, hi = 0, len(data)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = data.rfind(b"\n", 0, mid) + 1
+            end = data.find(b"\n", start)
+            if end == -1:
+                end = len(data)
+            line = data[start:end]
+            if line == key:
+                return True
+            if line < key:
+                lo = end + 1
+            else:
+                hi = start
+        return False
+
+    @staticmethod
+    def build(words, path: str) -> int:
+        """Write words to path as a dictionary; returns number written"""
+        entries = sorted({
+            word.strip().lower().encode() for word in words
+        } - {b""})
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as fob:
+            fob.write(b"\n".join(entries) + b"\n")
+        os.replace(tmp, path)
+        return len(entries)
+
+
+class PasswordPolicy:
+    """Password requirements, compiled once to check many passwords
+
+    forbidden: characters (or strings) passwords must not contain
+    pattern: regex passwords must (fully) match
+    dictionary: path of a Dictionary of common passwords to reject; ignored
+                if it doesn't exist
+    """
+
+    def __init__(
+        self,
+        min_length: int = 8,
+        min_categories: int = 3,
+        forbidden: str | list[str] = "",
+        pattern: str | None = None,
+        dictionary: str | None = DEFAULT_DICT,
+    ) -> None:
+        self.min_length = min_length
+        self.min_categories = min_categories
+        self.forbidden = list(dict.fromkeys(forbidden))
+        self.pattern = re.compile(pattern) if pattern else None
+        self.dictionary_path = dictionary
+        self._dictionary: Dictionary | None = None
+
+        # per character: category | FORBIDDEN, for the single pass
+        table = bytearray(_ASCII)
+        self._forbidden_other = set()
+        self._forbidden_strings = []
+        for item in self.forbidden:
+            if len(item) != 1:
+                self._forbidden_strings.append(item)
+            elif ord(item) < 128:
+                table[ord(item)] |= FORBIDDEN
+            else:
+                self._forbidden_other.add(item)
+        self._table = bytes(table)
+
+    @property
+    def dictionary(self) -> Dictionary | None:
+        if self._dictionary is None and self.dictionary_path:
+            try:
+                self._dictionary = Dictionary(self.dictionary_path)
+            except FileNotFoundError:
+                self.dictionary_path = None
+        return self._dictionary
+
+    def _scan(self, password: str) -> int:
+        table = self._table
+        other = self._forbidden_other
+        bits = 0
+        for ch in password:
+            code = ord(ch)
+            if code < 128:
+                bits |= table[code]
+            else:
+                bits |= _category(ch)
+                if ch in other:
+                    bits |= FORBIDDEN
+        return bits
+
+    def check(self, password: str) -> list[str]:
+        """Return why password doesn't meet the policy (empty if it does)"""
+        if not password:
+            return ["Please enter non-empty password!"]
+        errors = []
+        bits = self._scan(password)
+        if len(password) < self.min_length:
+            errors.append(
+                f"Password must be at least {self.min_length} characters."
+            )
+        if self.pattern and not self.pattern.fullmatch(password):
+            errors.append("Password does not match complexity requirements.")
+        if _COUNT[bits & 15] < self.min_categories:
+            if self.min_categories <= 3:
+                errors.append(
+                    "Insecure password! Mix uppercase, lowercase, and at"
+                    " least one number. Multiple words and punctuation are"
+                    " highly recommended but not strictly required."
+                )
+            else:
+                errors.append(
+                    "Insecure password! Mix uppercase, lowercase, numbers"
+                    " and at least one special/punctuation character."
+                    " Multiple words are highly recommended but not"
+                    " strictly required."
+                )
+        if bits & CONTROL:
+            errors.append("Password can NOT include control characters.")
+        if bits & FORBIDDEN or self._forbidden_strings:
+            found = [item for item in self.forbidden if item in password]
+            if found:
+                errors.append(
+                    "Password can NOT include these characters:"
+                    f" {' '.join(self.forbidden)}. Found {' '.join(found)}"
+                )
+        dictionary = self.dictionary
+        if dictionary is not None and password in dictionary:
+            errors.append(
+                "Password is too common (it is in the list of common"
+                " passwords)."
+            )
+        return errors
+
+    def describe(self) -> str:
+        """Return the requirements, as shown when asking for a password"""
+        lines = ["Password Requirements"]
+        if self.min_length:
+            lines.append(
+                f" - must be at least {self.min_length} characters long"
+            )
+        if self.pattern:
+            lines.append(" - must be in the required format")
+        if self.min_categories:
+            lines.append(
+                " - must contain characters from at least"
+                f" {self.min_categories} of the following categories:"
+                " uppercase, lowercase, numbers, symbols"
+            )
+        if self.forbidden:
+            lines.append(
+                " - must NOT contain these characters:"
+                f" {' '.join(self.forbidden)}"
+            )
+        if self.dictionary is not None:
+            lines.append(" - must not be a commonly used password")
+        return "\n".join(lines)
+
+
+def main() -> None:
+    opts = []
+    try:
+        opts, _ = getopt.gnu_getopt(
+            sys.argv[1:], "hq",
+            ["help", "min-length=", "min-categories=", "forbidden=",
+             "dict=", "build-dict=", "quiet"],
+        )
+    except getopt.GetoptError as e:
+        usage(e)
+
+    kwargs: dict = {}
+    build = None
+    quiet = False
+    try:
+        for opt, val in opts:
+            if opt in ("-h", "--help"):
+                usage()
+            elif opt == "--min-length":
+                kwargs["min_length"] = int(val)
+            elif opt == "--min-categories":
+                kwargs["min_categories"] = int(val)
+            elif opt == "--forbidden":
+                kwargs["forbidden"] = val
+            elif opt == "--dict":
+                kwargs["dictionary"] = val
+            elif opt == "--build-dict":
+                build = val
+            elif opt in ("-q", "--quiet"):
+                quiet = True
+    except ValueError as e:
+        usage(e)
+
+    if build:
+        try:
+            count = Dictionary.build(sys.stdin, build)
+        except OSError as e:
+            fatal(e)
+        print(f"{build}: {count} words")
+        return
+
+    if "dictionary" in kwargs and not os.path.exists(kwargs["dictionary"]):
+        fatal(f"no such dictionary: {kwargs['dictionary']}")
+    policy = PasswordPolicy(**kwargs)
+    invalid = 0
+    for line in sys.stdin:
+        password = line.rstrip("\n")
+        errors = policy.check(password)
+        if errors:
+            invalid += 1
+            if not quiet:
+                print(f"{password}: {' '.join(errors)}")
+    if invalid:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,455 @@
+#!/usr/bin/python3
+"""Execute inithooks scripts, running independent hooks concurrently
+
+Arguments:
+
+    script_dir          directory of hook scripts (e.g. firstboot.d)
+
+Options:
+
+    --firstboot         wait for boot to finish before running hooks with a
+                        prefix >= 30 (these may be interactive)
+    --conf=PATH         preseed file to (re)load before each hook
+    -j --jobs=N         maximum number of hooks to run at once
+                        (default: number of CPUs)
+    --defer=PATH        don't run deferrable hooks; record them (and the
+                        preseed values they need) in PATH instead
+    --run-deferred=PATH only run the hooks recorded in PATH (then remove it)
+    --status=PATH       keep a one line progress message (e.g. for the motd)
+                        in PATH while running
+
+Environment:
+
+    INITHOOKS_DEFAULT   inithooks defaults, (re)loaded into the hooks'
+                        environment along with the preseed conf
+                        (default: /etc/default/inithooks)
+
+Hook headers:
+
+    # inithooks-after: [hook ...]
+
+    Hooks are run in alphanumeric order. A hook without this header is a
+    barrier: it waits for every hook before it to finish, and hooks after it
+    wait for it. A hook with this header only waits for the listed hooks
+    (which must sort before it) and the preceding barrier, so it can run
+    concurrently with other hooks declaring the header. Firstboot hooks with a
+    prefix >= 30 are always barriers.
+
+    # inithooks-defer: [VAR ...]
+
+    With --defer, the hook is deferred (to be run in the background, with
+    --run-deferred) if all of the listed preseed variables are set - i.e.
+    when the hook won't need to interact with the user. The listed values
+    (and a few others deferred hooks use, e.g. FQDN) are recorded for the
+    deferred run; hooks listing a password (*PASS*) aren't deferred.
+
+Exit codes:
+
+    0                   hooks were run (hook failures are logged)
+    42                  a hook requires a reboot
+"""
+
+import getopt
+import json
+import os
+import sys
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from dataclasses import dataclass, field
+from typing import NoReturn
+
+from libinithooks import error, info, inithooks_manifest, inithooks_wait, warn
+from libinithooks.inithooks_manifest import Hook
+from libinithooks.inithooks_timing import (
+    TimingLog,
+    close_inherited_fds,
+    run_timed,
+)
+
+INTERACTIVE_PREFIX = 30
+BOOT_TIMEOUT = 10
+REBOOT_EXITCODE = 42
+# hooks which exit with REBOOT_EXITCODE when a reboot is required
+REBOOT_HOOKS = ("05autogrow-fs", "95secupdates", "99reboot")
+
+# other (non-secret) preseed values deferred hooks use, besides those in
+# their inithooks-defer header
+DEFERRED_PRESEEDS = (
+    "FQDN",
+    "REBOOT",
+    "SEC_ALERTS",
+    "SEC_UPDATES_INDEX_MAX_AGE",
+    "SEC_UPDATES_SOURCES",
+)
+
+DEFAULTS = os.environ.get("INITHOOKS_DEFAULT", "/etc/default/inithooks")
+
+
+def fatal(e) -> NoReturn:
+    print(f"Error: {e}", file=sys.stderr)
+    sys.exit(1)
+
+
+def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
+    if msg:
+        print(f"Error: {msg}", file=sys.stderr)
+    print(f"Syntax: {sys.argv[0]} [options] <script_dir>", file=sys.stderr)
+    print(__doc__, file=sys.stderr)
+    sys.exit(1)
+
+
+def is_barrier(hook: Hook, firstboot: bool) -> bool:
+    if hook.after is None:
+        return True
+    prefix = hook.prefix
+    return firstboot and prefix is not None and prefix >= INTERACTIVE_PREFIX
+
+
+def plan(hooks: list[Hook], firstboot: bool) -> dict[str, set[str]]:
+    """Return the names of the hooks each hook has to wait for"""
+    names = {hook.name for hook in hooks}
+    deps: dict[str, set[str]] = {}
+    seen: list[str] = []
+    barrier = None
+    for hook in hooks:
+        if is_barrier(hook, firstboot):
+            deps[hook.name] = set(seen)
+            barrier = hook.name
+        else:
+            assert hook.after is not None
+            wants = set()
+            for name in hook.after:
+                if name in seen:
+                    wants.add(name)
+                elif name in names:
+                    warn(f"[{hook.name}] ignoring dependency on later {name}")
+                # else: not installed; nothing to wait for
+            if barrier:
+                wants.add(barrier)
+            deps[hook.name] = wants
+        seen.append(hook.name)
+    return deps
+
+
+def is_secret(name: str) -> bool:
+    """Return True if preseed name is (or may be) a password"""
+    return "PASS" in name.upper()
+
+
+def read_deferred(path: str) -> tuple[list[str], dict[str, str]]:
+    """Return (hook names, preseed values) recorded by Runner.defer_to"""
+    with open(path) as fob:
+        state = json.load(fob)
+    return state["hooks"], state["env"]
+
+
+def write_deferred(path: str, hooks: list[str], env: dict[str, str]) -> None:
+    # preseed values may be secrets (e.g. HUB_APIKEY)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as fob:
+        json.dump({"hooks": hooks, "env": env}, fob)
+    os.replace(tmp, path)
+
+
+def wait_for_boot() -> None:
+    """Wait up to 10 secs for system to be running; minimizes chance of
+    journal overwriting inithook dialog/confconsole
+    """
+
+    start = time.monotonic()
+    if inithooks_wait.wait_for_boot(BOOT_TIMEOUT):
+        info(f"Boot finished (waited {time.monotonic() - start:.1f} seconds)")
+    else:
+        warn(f"Boot not finished after {BOOT_TIMEOUT} seconds - continuing")
+
+
+@dataclass
+class Runner:
+    conf: str | None = None
+    jobs: int = 0
+    env: dict[str, str] = field(default_factory=lambda: dict(os.environ))
+    reboot_required: bool = False
+    timings: TimingLog | None = field(default_factory=TimingLog)
+    # hooks not to run (e.g. turnkey-init's blacklist)
+    skip: list[str] = field(default_factory=list)
+    # name to record timings under (default: name of the script_dir)
+    run_name: str | None = None
+    defer_to: str | None = None
+    status: str | None = None
+    # defaults file, loaded (like conf) into the hooks' environment
+    defaults: str | None = DEFAULTS
+    deferred: list[str] = field(default_factory=list)
+    deferred_env: dict[str, str] = field(default_factory=dict)
+    # values set by the preseed conf (as loaded so far)
+    preseeds: dict[str, str] = field(default_factory=dict)
+    invalid: dict[str, str] = field(default_factory=dict)
+    _stats: dict[str, tuple[int, int, int]] = field(default_factory=dict)
+
+    def _defer(self, hook: Hook) -> bool:
+        """Defer hook if it's deferrable and its preseed values are set"""
+        if self.defer_to is None or hook.defer is None:
+            return False
+        if not all(self.env.get(var) for var in hook.defer):
+            return False
+        if any(var in self.invalid for var in hook.defer):
+            # run now, so the hook reports it
+            return False
+        if any(is_secret(var) for var in hook.defer):
+            # passwords aren't recorded for deferred hooks
+            return False
+        self.deferred.append(hook.name)
+        # the conf is emptied (by 98finalize) before deferred hooks are run,
+        # so the values they use are recorded - but never passwords, as the
+        # record is kept on disk until they have run
+        for var in hook.defer:
+            self.deferred_env[var] = self.env[var]
+        self.deferred_env.update(
+            (name, val) for name, val in self.preseeds.items()
+            if name in DEFERRED_PRESEEDS and name not in self.invalid
+        )
+        info(f"[{hook.name}] deferred to background", hook.name)
+        return True
+
+    def _update_status(
+        self, running: list[str], done: int, total: int
+    ) -> None:
+        if not self.status or not running:
+            return
+        tmp = f"{self.status}.tmp"
+        try:
+            with open(tmp, "w") as fob:
+                fob.write(
+                    f"inithooks: running {', '.join(running)} in the"
+                    f" background ({done} of {total} done)"
+                )
+                if "INITHOOKS_LOGFILE" in self.env:
+                    fob.write(f" - see {self.env['INITHOOKS_LOGFILE']}")
+                fob.write("\n")
+            os.replace(tmp, self.status)
+        except OSError as e:
+            warn(f"progress not written to {self.status} - {e}")
+
+    def _changed(self, path: str | None) -> bool:
+        """Return True if path exists and has changed since last checked"""
+        if not path:
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        key = (st.st_ino, st.st_size, st.st_mtime_ns)
+        if self._stats.get(path) == key:
+            return False
+        self._stats[path] = key
+        return True
+
+    def _reload_conf(self) -> None:
+        """Re-source the defaults and preseed conf when they have changed
+        since last load - earlier hooks (e.g. 29preseed) may create or
+        rewrite them
+        """
+        # hooks get all these values in their environment (exported or
+        # not); they only source the files when INITHOOKS_DEFAULT isn't set
+        if self._changed(self.defaults):
+            assert self.defaults is not None
+            self.env = inithooks_manifest.read_conf(self.defaults, self.env)
+            self.env["INITHOOKS_DEFAULT"] = self.defaults
+        if not self._changed(self.conf):
+            return
+        assert self.conf is not None
+        self.env = inithooks_manifest.read_conf(self.conf, self.env)
+        # which of those are preseed values (rather than inherited), for
+        # deferred hooks; kept once the conf is emptied
+        names = inithooks_manifest.read_conf(self.conf, {})
+        self.preseeds.update(
+            (name, self.env[name]) for name in names if name in self.env
+        )
+        invalid = inithooks_manifest.validate(self.env)
+        for name, msg in invalid.items():
+            if self.invalid.get(name) != msg:
+                error(f"preseed {msg}")
+        self.invalid = invalid
+
+    def _run_hook(
+        self, hook: Hook, env: dict[str, str], run: str, after: set[str]
+    ) -> None:
+        name = hook.name
+        if name in self.skip:
+            info(f"[{name}] skipping (blacklisted)", name)
+            return
+        if not os.access(hook.path, os.X_OK):
+            warn(f"[{name}] skipping", name)
+            return
+
+        info(f"[{name}] running", name)
+        exit_code, timing = run_timed([hook.path], name, run, env=env)
+        timing.after = sorted(after)
+        if self.timings is not None:
+            try:
+                self.timings.write(timing)
+            except OSError as e:
+                warn(f"[{name}] timing not recorded - {e}", name)
+        duration = timing.wall
+        if exit_code == 0:
+            info(f"[{name}] successfully completed", name, duration)
+        elif name == "95secupdates" and exit_code == 2:
+            info(f"[{name}] detected live system - skipping", name, duration)
+        elif name in REBOOT_HOOKS and exit_code == REBOOT_EXITCODE:
+            self.reboot_required = True
+            warn(f"[{name}] reboot is required", name, duration)
+        else:
+            error(f"[{name}] failed - exit code {exit_code}", name, duration)
+
+    def execute(
+        self,
+        script_dir: str,
+        firstboot: bool = False,
+        only: list[str] | None = None,
+    ) -> None:
+        """Run hooks in script_dir (only those named in only, if given)"""
+        if not os.path.isdir(script_dir):
+            return
+
+        # check preseed values before running any hooks
+        self._reload_conf()
+        hooks = {
+            hook.name: hook
+            for hook in inithooks_manifest.load(script_dir)
+            if only is None or hook.name in only
+        }
+        deps = plan(list(hooks.values()), firstboot)
+        run = self.run_name or os.path.basename(os.path.normpath(script_dir))
+        if self.timings is not None:
+            try:
+                self.timings.prune()
+            except OSError as e:
+                warn(f"old timing records not pruned - {e}")
+        pending = list(hooks)
+        done: set[str] = set()
+        running: dict[Future, str] = {}
+        booted = not firstboot
+
+        jobs = self.jobs or os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            while pending or running:
+                for name in list(pending):
+                    if len(running) >= jobs:
+                        break
+                    if not deps[name] <= done:
+                        continue
+                    hook = hooks[name]
+                    prefix = hook.prefix
+                    if (
+                        not booted
+                        and prefix is not None
+                        and prefix >= INTERACTIVE_PREFIX
+                    ):
+                        # barrier; nothing else is running
+                        wait_for_boot()
+                        booted = True
+                    pending.remove(name)
+                    self._reload_conf()
+                    if self._defer(hook):
+                        done.add(name)
+                        continue
+                    future = pool.submit(
+                        self._run_hook, hook, dict(self.env), run, deps[name]
+                    )
+                    running[future] = name
+
+                self._update_status(
+                    list(running.values()), len(done), len(hooks)
+                )
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        future.result()
+                    except OSError as e:
+                        error(f"[{name}] failed - {e}")
+                    done.add(name)
+
+        if self.status:
+            try:
+                os.unlink(self.status)
+            except FileNotFoundError:
+                pass
+        if self.deferred and self.defer_to:
+            write_deferred(self.defer_to, self.deferred, self.deferred_env)
+
+
+def main() -> None:
+    opts = []
+    args = []
+    try:
+        opts, args = getopt.gnu_getopt(
+            sys.argv[1:],
+            "hj:",
+            ["help", "firstboot", "conf=", "jobs=", "defer=",
+             "run-deferred=", "status="],
+        )
+    except getopt.GetoptError as e:
+        usage(e)
+
+    firstboot = False
+    conf = None
+    jobs = 0
+    defer_to = None
+    run_deferred = None
+    status = None
+    for opt, val in opts:
+        if opt in ("-h", "--help"):
+            usage()
+        elif opt == "--firstboot":
+            firstboot = True
+        elif opt == "--conf":
+            conf = val
+        elif opt in ("-j", "--jobs"):
+            try:
+                jobs = int(val)
+                assert jobs >= 0
+            except (ValueError, AssertionError):
+                fatal(f"invalid number of jobs: '{val}'")
+        elif opt == "--defer":
+            defer_to = val
+        elif opt == "--run-deferred":
+            run_deferred = val
+        elif opt == "--status":
+            status = val
+
+    if len(args) != 1:
+        usage()
+    if defer_to and run_deferred:
+        usage("--defer and --run-deferred are mutually exclusive")
+
+    close_inherited_fds()
+    runner = Runner(conf, jobs, defer_to=defer_to, status=status)
+    if run_deferred:
+        try:
+            hooks, env = read_deferred(run_deferred)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError) as e:
+            fatal(f"reading deferred hooks failed - {e}")
+        runner.env.update(env)
+        try:
+            # already booted; deferred hooks are non-interactive
+            runner.execute(args[0], only=hooks)
+        finally:
+            # failed hooks are logged, not retried
+            os.unlink(run_deferred)
+    else:
+        runner.execute(args[0], firstboot)
+    if runner.reboot_required:
+        sys.exit(REBOOT_EXITCODE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/python3
+"""Restart active services concurrently - reloaded instead where the unit
+supports it
+
+Arguments:
+
+    unit ...            units to restart (if active); '.service' is assumed
+                        if no unit type is given
+
+Options:
+
+    --hook=NAME         hook name to log as
+    --no-block          only queue the restarts/reloads (don't wait for them
+                        to finish)
+
+Exit codes:
+
+    0                   all active units were restarted/reloaded (queued)
+    1                   at least one unit failed
+"""
+
+import getopt
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import NoReturn
+
+from libinithooks import error, info
+
+
+def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
+    if msg:
+        print(f"Error: {msg}", file=sys.stderr)
+    print(
+        f"Syntax: {sys.argv[0]} [--hook=NAME] [--no-block] <unit> ...",
+        file=sys.stderr,
+    )
+    print(__doc__, file=sys.stderr)
+    sys.exit(1)
+
+
+@dataclass
+class Unit:
+    name: str
+    active: bool = False
+    can_reload: bool = False
+
+
+def unit_name(name: str) -> str:
+    if "." in name:
+        return name
+    return f"{name}.service"
+
+
+def query(names: list[str]) -> list[Unit]:
+    """Return state of units, with a single systemctl call"""
+    proc = subprocess.run(
+        ["systemctl", "show", "--property=Id,Names,ActiveState,CanReload",
+         "--"] + names,
+        capture_output=True,
+        text=True,
+    )
+    # one block of properties per unit - matched up by the unit's Id (or
+    # other Names, for aliases) rather than relying on the order
+    by_name: dict[str, dict[str, str]] = {}
+    for block in proc.stdout.strip().split("\n\n"):
+        props = dict(
+            line.split("=", 1) for line in block.splitlines() if "=" in line
+        )
+        for name in [props.get("Id", "")] + props.get("Names", "").split():
+            by_name.setdefault(name, props)
+    units = []
+    for name in names:
+        props = by_name.get(name, {})
+        units.append(Unit(
+            name,
+            active=props.get("ActiveState") in ("active", "reloading"),
+            can_reload=props.get("CanReload") == "yes",
+        ))
+    return units
+
+
+def restart(unit: Unit, no_block: bool = False) -> tuple[Unit, int, float]:
+    """reload-or-restart unit; returns (unit, exit code, duration)"""
+    start = time.monotonic()
+    exit_code = subprocess.run(
+        ["systemctl", "reload-or-restart", "--quiet"]
+        + (["--no-block"] if no_block else [])
+        + [unit.name]
+    ).returncode
+    return unit, exit_code, time.monotonic() - start
+
+
+def restart_active(
+    names: list[str], hook: str | None = None, no_block: bool = False
+) -> bool:
+    """Restart (or reload) the active units among names concurrently - or,
+    if no_block, only queue the jobs with systemd
+
+    Returns False if any of them failed (to be queued).
+    """
+    # same format as the bash hooks' info/fatal helpers
+    prefix = f"[{hook}] " if hook else ""
+
+    def log(func, msg: str, duration: float | None = None) -> None:
+        level = "INFO" if func is info else "ERROR"
+        print(f"{level}: {prefix}{msg}",
+              file=sys.stdout if func is info else sys.stderr)
+        func(f"{prefix}{msg}", hook, duration)
+
+    units = [unit for unit in query(names) if unit.active]
+    if not units:
+        log(info, "No relevant services running")
+        return True
+
+    ok = True
+    with ThreadPoolExecutor(max_workers=len(units)) as pool:
+        futures = [pool.submit(restart, unit, no_block) for unit in units]
+        # logged as each completes, so a slow unit doesn't hide the others
+        for future in as_completed(futures):
+            unit, exit_code, duration = future.result()
+            action = "reload" if unit.can_reload else "restart"
+            if exit_code == 0:
+                done = f"{action} queued" if no_block else f"{action}ed"
+                log(info, f"{unit.name} {done} ({duration:.2f}s)", duration)
+            else:
+                ok = False
+                log(
+                    error,
+                    f"{unit.name} failed to be {action}ed - exit code"
+                    f" {exit_code} ({duration:.2f}s)",
+                    duration,
+                )
+    return ok
+
+
+def main() -> None:
+    opts = []
+    args = []
+    try:
+        opts, args = getopt.gnu_getopt(
+            sys.argv[1:], "h", ["help", "hook=", "no-block"]
+        )
+    except getopt.GetoptError as e:
+        usage(e)
+
+    hook = None
+    no_block = False
+    for opt, val in opts:
+        if opt in ("-h", "--help"):
+            usage()
+        elif opt == "--hook":
+            hook = val
+        elif opt == "--no-block":
+            no_block = True
+
+    if not args:
+        usage()
+
+    if not restart_active([unit_name(arg) for arg in args], hook, no_block):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
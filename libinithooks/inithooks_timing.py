@@ -0,0 +1,355 @@
+#!/usr/bin/python3
+"""Report how long inithooks took (per hook and critical path)
+
+Options:
+
+    --boot=ID           report on boot ID (default: latest); 'all' for every
+                        recorded boot
+    --list              list recorded boots
+    --json              print the raw records (one JSON object per line)
+    --chrome-trace=PATH write a Chrome trace (chrome://tracing, Perfetto)
+                        to PATH ('-' for stdout)
+
+Environment:
+
+    INITHOOKS_TIMINGS   path to timing records
+                        (default: /var/lib/inithooks/timings.jsonl)
+"""
+
+import getopt
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import NoReturn
+
+TIMINGS = os.environ.get(
+    "INITHOOKS_TIMINGS", "/var/lib/inithooks/timings.jsonl"
+)
+BOOT_ID_PATH = "/proc/sys/kernel/random/boot_id"
+
+# records from older boots are dropped
+KEEP_BOOTS = 10
+
+
+def fatal(e) -> NoReturn:
+    print(f"Error: {e}", file=sys.stderr)
+    sys.exit(1)
+
+
+def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
+    if msg:
+        print(f"Error: {msg}", file=sys.stderr)
+    print(f"Syntax: {sys.argv[0]} [options]", file=sys.stderr)
+    print(__doc__, file=sys.stderr)
+    sys.exit(1)
+
+
+def boot_id() -> str:
+    try:
+        with open(BOOT_ID_PATH) as fob:
+            return fob.read().strip()
+    except OSError:
+        return "unknown"
+
+
+@dataclass
+class Timing:
+    """Resource usage of a single hook run"""
+
+    hook: str
+    run: str
+    start: float
+    wall: float
+    user: float
+    sys: float
+    maxrss: int  # KiB
+    exit_code: int
+    after: list[str] = field(default_factory=list)
+    boot_id: str = field(default_factory=boot_id)
+
+    @property
+    def end(self) -> float:
+        return self.start + self.wall
+
+
+def run_timed(
+    cmd: list[str], hook: str, run: str, env: dict[str, str] | None = None
+) -> tuple[int, Timing]:
+    """Run cmd and return (exit code, Timing)
+
+    cmd is started with posix_spawn, with env as its environment, and
+    inherits stdio. CPU time and max RSS come from wait4(), so they cover
+    the hook and any children it waited for.
+    """
+    start = time.time()
+    t0 = time.monotonic()
+    pid = os.posix_spawn(
+        cmd[0],
+        cmd,
+        os.environ if env is None else env,
+        # like subprocess' restore_signals; Python ignores these
+        setsigdef=(signal.SIGPIPE, signal.SIGXFSZ),
+    )
+    _, status, usage = os.wait4(pid, 0)
+    wall = time.monotonic() - t0
+    exit_code = os.waitstatus_to_exitcode(status)
+    return exit_code, Timing(
+        hook=hook,
+        run=run,
+        start=start,
+        wall=wall,
+        user=usage.ru_utime,
+        sys=usage.ru_stime,
+        maxrss=usage.ru_maxrss,
+        exit_code=exit_code,
+    )
+
+
+def close_inherited_fds() -> None:
+    """Don't pass on fds inherited from our parent (other than stdio)
+
+    subprocess closes them; posix_spawn doesn't. E.g. run's logger pipe
+    would otherwise be held open by daemons that hooks start.
+    """
+    try:
+        fds = [int(fd) for fd in os.listdir("/proc/self/fd")]
+    except OSError:
+        return
+    for fd in fds:
+        if fd > 2:
+            try:
+                os.set_inheritable(fd, False)
+            except OSError:
+                # e.g. the fd of the listed directory, since closed
+                pass
+
+
+def _dump(timing: Timing) -> str:
+    return json.dumps(asdict(timing), separators=(",", ":")) + "\n"
+
+
+class TimingLog:
+    """Timing records, appended one JSON object per line"""
+
+    def __init__(self, path: str = TIMINGS) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, timing: Timing) -> None:
+        line = _dump(timing)
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a") as fob:
+                fob.write(line)
+
+    def read(self) -> list[Timing]:
+        timings = []
+        try:
+            with open(self.path) as fob:
+                for line in fob:
+                    try:
+                        timings.append(Timing(**json.loads(line)))
+                    except (ValueError, TypeError):
+                        # truncated by a power cut, or an unknown format
+                        continue
+        except FileNotFoundError:
+            pass
+        return timings
+
+    def prune(self, keep_boots: int = KEEP_BOOTS) -> None:
+        """Drop records of all but the last keep_boots boots"""
+        with self._lock:
+            timings = self.read()
+            boots = list(dict.fromkeys(t.boot_id for t in timings))
+            if len(boots) <= keep_boots:
+                return
+            keep = set(boots[-keep_boots:])
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as fob:
+                for timing in timings:
+                    if timing.boot_id in keep:
+                        fob.write(_dump(timing))
+            os.replace(tmp, self.path)
+
+
+def critical_path(timings: list[Timing]) -> list[Timing]:
+    """Return the chain of hooks that determined when the last one ended
+
+    Walks back from the last hook to finish through whichever of the hooks
+    it waited for finished last (like 'systemd-analyze critical-chain').
+    """
+    if not timings:
+        return []
+    by_name = {t.hook: t for t in timings}
+    chain = [max(timings, key=lambda t: t.end)]
+    while True:
+        deps = [by_name[name] for name in chain[-1].after if name in by_name]
+        if not deps:
+            break
+        chain.append(max(deps, key=lambda t: t.end))
+    chain.reverse()
+    return chain
+
+
+def _fmt_secs(secs: float) -> str:
+    if secs >= 60:
+        return f"{int(secs // 60)}min {secs % 60:.3f}s"
+    return f"{secs:.3f}s"
+
+
+def report(timings: list[Timing]) -> str:
+    """Return a per-run 'blame' and critical path breakdown"""
+    out = []
+    runs: dict[tuple[str, str], list[Timing]] = {}
+    for timing in timings:
+        runs.setdefault((timing.boot_id, timing.run), []).append(timing)
+
+    for (boot, run), run_timings in runs.items():
+        first = min(t.start for t in run_timings)
+        last = max(t.end for t in run_timings)
+        cpu = sum(t.user + t.sys for t in run_timings)
+        out.append(
+            f"boot {boot} - {run}: {_fmt_secs(last - first)} elapsed,"
+            f" {_fmt_secs(cpu)} CPU, {len(run_timings)} hooks"
+        )
+        out.append("")
+        out.append(
+            f"    {'wall':>12} {'user':>8} {'sys':>8} {'maxrss':>8}  hook"
+        )
+        for t in sorted(run_timings, key=lambda t: t.wall, reverse=True):
+            status = "" if t.exit_code == 0 else f" (exit {t.exit_code})"
+            out.append(
+                f"    {_fmt_secs(t.wall):>12} {t.user:7.2f}s {t.sys:7.2f}s"
+                f" {t.maxrss / 1024:6.1f}M  {t.hook}{status}"
+            )
+        out.append("")
+        out.append("    critical path:")
+        for t in critical_path(run_timings):
+            out.append(
+                f"    {t.hook} @{_fmt_secs(t.start - first)}"
+                f" +{_fmt_secs(t.wall)}"
+            )
+        out.append("")
+    return "\n".join(out)
+
+
+def chrome_trace(timings: list[Timing]) -> dict:
+    """Return timings in Chrome's trace event format
+
+    Each run is a process; hooks that overlap are put on separate threads
+    so they are drawn side by side.
+    """
+    events: list[dict] = []
+    pids: dict[tuple[str, str], int] = {}
+    lanes: dict[int, list[float]] = {}
+    for t in sorted(timings, key=lambda t: t.start):
+        key = (t.boot_id, t.run)
+        if key not in pids:
+            pids[key] = len(pids) + 1
+            lanes[pids[key]] = []
+            events.append({
+                "name": "process_name",
+                "ph": "M",
+                "pid": pids[key],
+                "args": {"name": f"{t.run} ({t.boot_id[:8]})"},
+            })
+        pid = pids[key]
+        ends = lanes[pid]
+        for tid, end in enumerate(ends):
+            if end <= t.start:
+                ends[tid] = t.end
+                break
+        else:
+            tid = len(ends)
+            ends.append(t.end)
+        events.append({
+            "name": t.hook,
+            "cat": t.run,
+            "ph": "X",
+            "ts": int(t.start * 1e6),
+            "dur": int(t.wall * 1e6),
+            "pid": pid,
+            "tid": tid,
+            "args": {
+                "user": t.user,
+                "sys": t.sys,
+                "maxrss_kib": t.maxrss,
+                "exit_code": t.exit_code,
+                "after": t.after,
+            },
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def main() -> None:
+    opts = []
+    args = []
+    try:
+        opts, args = getopt.gnu_getopt(
+            sys.argv[1:], "h", ["help", "boot=", "list", "json",
+                                "chrome-trace="]
+        )
+    except getopt.GetoptError as e:
+        usage(e)
+
+    if args:
+        usage("unexpected arguments")
+
+    boot = None
+    do_list = False
+    do_json = False
+    trace_path = None
+    for opt, val in opts:
+        if opt in ("-h", "--help"):
+            usage()
+        elif opt == "--boot":
+            boot = val
+        elif opt == "--list":
+            do_list = True
+        elif opt == "--json":
+            do_json = True
+        elif opt == "--chrome-trace":
+            trace_path = val
+
+    timings = TimingLog().read()
+    if not timings:
+        fatal(f"no timing records found in {TIMINGS}")
+
+    if do_list:
+        for boot_id in dict.fromkeys(t.boot_id for t in timings):
+            first = min(t.start for t in timings if t.boot_id == boot_id)
+            started = time.strftime("%Y-%m-%d %H:%M:%S",
+                                    time.localtime(first))
+            print(f"{boot_id}  {started}")
+        return
+
+    if boot is None:
+        boot = timings[-1].boot_id
+    if boot != "all":
+        timings = [t for t in timings if t.boot_id.startswith(boot)]
+        if not timings:
+            fatal(f"no timing records for boot '{boot}'")
+
+    if trace_path:
+        trace = json.dumps(chrome_trace(timings))
+        if trace_path == "-":
+            print(trace)
+        else:
+            with open(trace_path, "w") as fob:
+                fob.write(trace)
+        return
+
+    if do_json:
+        for timing in timings:
+            print(_dump(timing), end="")
+        return
+
+    print(report(timings), end="")
+
+
+if __name__ == "__main__":
+    main()
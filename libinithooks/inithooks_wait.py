@@ -0,0 +1,262 @@
+#!/usr/bin/python3
+"""Wait for a systemd state change - woken by systemd's D-Bus signals
+rather than polling
+
+Arguments:
+
+    boot                wait for the system to finish booting (i.e. for
+                        SystemState to leave 'initializing'/'starting')
+    inactive <unit>     wait for unit to be inactive (or failed)
+
+Options:
+
+    --timeout=SECS      give up after SECS (default: 10)
+
+Environment:
+
+    DBUS_SYSTEM_BUS_ADDRESS     system bus to use (e.g. a test bus)
+
+Exit codes:
+
+    0                   done waiting
+    2                   timed out
+"""
+
+import getopt
+import subprocess
+import sys
+import time
+from typing import NoReturn
+
+try:
+    from jeepney import (
+        DBusAddress,
+        DBusErrorResponse,
+        MatchRule,
+        Properties,
+        message_bus,
+        new_method_call,
+    )
+    from jeepney.io.blocking import DBusConnection, open_dbus_connection
+    from jeepney.wrappers import unwrap_msg
+except ImportError:
+    # fall back to systemctl
+    DBusConnection = None
+
+DEFAULT_TIMEOUT = 10
+TIMEOUT_EXITCODE = 2
+
+BOOTING_STATES = ("initializing", "starting")
+ACTIVE_STATES = (
+    "active",
+    "activating",
+    "deactivating",
+    "reloading",
+    "refreshing",
+)
+
+SYSTEMD_BUS_NAME = "org.freedesktop.systemd1"
+SYSTEMD_PATH = "/org/freedesktop/systemd1"
+MANAGER_IFACE = "org.freedesktop.systemd1.Manager"
+UNIT_IFACE = "org.freedesktop.systemd1.Unit"
+
+
+def fatal(e) -> NoReturn:
+    print(f"Error: {e}", file=sys.stderr)
+    sys.exit(1)
+
+
+def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
+    if msg:
+        print(f"Error: {msg}", file=sys.stderr)
+    print(
+        f"Syntax: {sys.argv[0]} [--timeout=SECS] boot | inactive <unit>",
+        file=sys.stderr,
+    )
+    print(__doc__, file=sys.stderr)
+    sys.exit(1)
+
+
+class SystemdBus:
+    """Blocking connection to systemd on the system bus
+
+    Signals are subscribed to before state is read, so a transition between
+    the two can't be missed.
+    """
+
+    def __init__(self) -> None:
+        self.conn = open_dbus_connection(bus="SYSTEM")
+        self.manager = DBusAddress(
+            SYSTEMD_PATH, bus_name=SYSTEMD_BUS_NAME, interface=MANAGER_IFACE
+        )
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def call(self, msg, timeout: float | None = None) -> tuple:
+        return unwrap_msg(self.conn.send_and_get_reply(msg, timeout=timeout))
+
+    def get(self, address: "DBusAddress", prop: str) -> str:
+        return self.call(Properties(address).get(prop))[0][1]
+
+    def wait(self, rule: "MatchRule", done, deadline: float) -> bool:
+        """Wait until done() (checked initially and after every signal
+        matching rule) or deadline
+        """
+        self.call(message_bus.AddMatch(rule))
+        with self.conn.filter(rule) as queue:
+            # systemd only emits signals while someone is subscribed
+            self.call(new_method_call(self.manager, "Subscribe"))
+            while not done():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                try:
+                    self.conn.recv_until_filtered(queue, timeout=remaining)
+                except TimeoutError:
+                    return done()
+        return True
+
+    def wait_for_boot(self, deadline: float) -> bool:
+        rule = MatchRule(
+            type="signal",
+            interface=MANAGER_IFACE,
+            member="StartupFinished",
+            path=SYSTEMD_PATH,
+        )
+
+        def booted() -> bool:
+            return self.get(self.manager, "SystemState") not in BOOTING_STATES
+
+        return self.wait(rule, booted, deadline)
+
+    def wait_for_inactive(self, unit: str, deadline: float) -> bool:
+        try:
+            path = self.call(
+                new_method_call(self.manager, "GetUnit", "s", (unit,))
+            )[0]
+        except DBusErrorResponse:
+            # not loaded, so not active
+            return True
+        address = DBusAddress(
+            path, bus_name=SYSTEMD_BUS_NAME, interface=UNIT_IFACE
+        )
+        rule = MatchRule(
+            type="signal",
+            interface="org.freedesktop.DBus.Properties",
+            member="PropertiesChanged",
+            path=path,
+        )
+
+        def inactive() -> bool:
+            try:
+                state = self.get(address, "ActiveState")
+            except DBusErrorResponse:
+                # unloaded
+                return True
+            return state not in ACTIVE_STATES
+
+        return self.wait(rule, inactive, deadline)
+
+
+def _connect() -> SystemdBus | None:
+    if DBusConnection is None:
+        return None
+    try:
+        return SystemdBus()
+    except (OSError, KeyError, ValueError):
+        # no system bus (e.g. minimal container)
+        return None
+
+
+def wait_for_boot(timeout: float = DEFAULT_TIMEOUT) -> bool:
+    """Wait up to timeout secs for the system to finish booting
+
+    Returns False if it timed out.
+    """
+    deadline = time.monotonic() + timeout
+    bus = _connect()
+    if bus is not None:
+        try:
+            return bus.wait_for_boot(deadline)
+        except (OSError, DBusErrorResponse):
+            pass
+        finally:
+            bus.close()
+
+    try:
+        subprocess.run(
+            ["systemctl", "is-system-running", "--wait"],
+            capture_output=True,
+            timeout=max(deadline - time.monotonic(), 0),
+        )
+    except subprocess.TimeoutExpired:
+        return False
+    return True
+
+
+def wait_for_inactive(unit: str, timeout: float = DEFAULT_TIMEOUT) -> bool:
+    """Wait up to timeout secs for unit to stop
+
+    Returns False if it timed out.
+    """
+    deadline = time.monotonic() + timeout
+    bus = _connect()
+    if bus is not None:
+        try:
+            return bus.wait_for_inactive(unit, deadline)
+        except (OSError, DBusErrorResponse):
+            pass
+        finally:
+            bus.close()
+
+    while True:
+        state = subprocess.run(
+            ["systemctl", "show", "--property=ActiveState", "--value", unit],
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+        if state not in ACTIVE_STATES:
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.2)
+
+
+def main() -> None:
+    opts = []
+    args = []
+    try:
+        opts, args = getopt.gnu_getopt(
+            sys.argv[1:], "h", ["help", "timeout="]
+        )
+    except getopt.GetoptError as e:
+        usage(e)
+
+    timeout: float = DEFAULT_TIMEOUT
+    for opt, val in opts:
+        if opt in ("-h", "--help"):
+            usage()
+        elif opt == "--timeout":
+            try:
+                timeout = float(val)
+                assert timeout >= 0
+            except (ValueError, AssertionError):
+                fatal(f"invalid timeout: '{val}'")
+
+    if not args:
+        usage()
+
+    if args[0] == "boot" and len(args) == 1:
+        done = wait_for_boot(timeout)
+    elif args[0] == "inactive" and len(args) == 2:
+        done = wait_for_inactive(args[1], timeout)
+    else:
+        usage()
+
+    if not done:
+        sys.exit(TIMEOUT_EXITCODE)
+
+
+if __name__ == "__main__":
+    main()
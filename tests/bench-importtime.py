@@ -0,0 +1,131 @@
+#!/usr/bin/python3
+"""Benchmark import time of the bin/*.py hook helpers (python -X importtime)
+and check it against a budget
+
+Each helper is loaded (but not run) in a fresh interpreter. Fails if a
+helper takes longer than the budget to import, or if it imports dialog
+before it is actually needed.
+
+Arguments:
+
+    helper ...              helpers to benchmark (default: all bin/*.py
+                            hook helpers, i.e. those which may prompt)
+
+Options:
+
+    --budget=MS             max import time in ms (default: 100)
+    --runs=N                runs per helper; the fastest counts (default: 5)
+    --verbose               print the slowest imports of each helper
+"""
+
+import getopt
+import glob
+import os
+import subprocess
+import sys
+from typing import NoReturn
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# modules which should only be imported once a prompt is needed
+LAZY = ["dialog"]
+
+LOADER = """
+import importlib.util, sys
+spec = importlib.util.spec_from_file_location("helper", sys.argv[1])
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+print(" ".join(name for name in sys.argv[2:] if name in sys.modules))
+"""
+
+
+def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
+    if msg:
+        print(f"Error: {msg}", file=sys.stderr)
+    print(f"Syntax: {sys.argv[0]} [options] [helper ...]", file=sys.stderr)
+    print(__doc__, file=sys.stderr)
+    sys.exit(1)
+
+
+def helpers() -> list[str]:
+    names = []
+    for path in sorted(glob.glob(os.path.join(SRC, "bin", "*.py"))):
+        with open(path) as fob:
+            if "dialog_wrapper" in fob.read():
+                names.append(os.path.basename(path)[:-3])
+    return names
+
+
+def importtime(helper: str) -> tuple[float, list[tuple[float, str]], str]:
+    """Return (total ms, [(cumulative ms, module)], lazy modules imported)"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [SRC, env.get("PYTHONPATH")])
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", LOADER,
+         os.path.join(SRC, "bin", f"{helper}.py")] + LAZY,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total = 0.0
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        ms = int(cumulative) / 1000
+        # only top level imports add up (nested ones are included in them)
+        if not name.startswith("  "):
+            total += ms
+        modules.append((ms, name.strip()))
+    return total, modules, proc.stdout.strip()
+
+
+def main() -> None:
+    opts = []
+    args = []
+    try:
+        opts, args = getopt.gnu_getopt(
+            sys.argv[1:], "hv", ["help", "budget=", "runs=", "verbose"]
+        )
+    except getopt.GetoptError as e:
+        usage(e)
+
+    budget = 100.0
+    runs = 5
+    verbose = False
+    for opt, val in opts:
+        if opt in ("-h", "--help"):
+            usage()
+        elif opt == "--budget":
+            budget = float(val)
+        elif opt == "--runs":
+            runs = int(val)
+        elif opt in ("-v", "--verbose"):
+            verbose = True
+
+    ok = True
+    print(f"{'helper':20} {'import (ms)':>12}  budget: {budget:.0f} ms")
+    for helper in args or helpers():
+        results = [importtime(helper) for _ in range(runs)]
+        total, modules, lazy = min(results)
+        status = ""
+        if total > budget:
+            ok = False
+            status = "OVER BUDGET"
+        if lazy:
+            ok = False
+            status = f"{status} imports {lazy}".strip()
+        print(f"{helper:20} {total:12.1f}  {status}".rstrip())
+        if verbose:
+            for ms, name in sorted(modules, reverse=True)[:10]:
+                print(f"    {ms:8.1f}  {name}")
+
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
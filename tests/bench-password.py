@@ -0,0 +1,151 @@
+#!/usr/bin/python3
+"""Benchmark password policy checks - PasswordPolicy.check() against the
+regex/substring checks it replaced, and common password lookups in an
+mmap'd Dictionary against a set loaded into memory
+
+Options:
+
+    --count=N           passwords to check (default: 100000)
+    --dict-size=N       words in the generated dictionary (default: 1000000)
+    --length=N          length of generated passwords (default: 12)
+"""
+
+import getopt
+import os
+import re
+import secrets
+import string
+import sys
+import tempfile
+import time
+from typing import NoReturn
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                ".."))
+
+from libinithooks.inithooks_password import (  # noqa: E402
+    Dictionary,
+    PasswordPolicy,
+    complexity,
+)
+
+ALPHABET = string.ascii_letters + string.digits + string.punctuation
+BLACKLIST = ["\\", '"', "'"]
+
+
+def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
+    if msg:
+        print(f"Error: {msg}", file=sys.stderr)
+    print(f"Syntax: {sys.argv[0]} [options]", file=sys.stderr)
+    print(__doc__, file=sys.stderr)
+    sys.exit(1)
+
+
+def old_complexity(password: str) -> int:
+    lowercase = re.search("[a-z]", password) is not None
+    uppercase = re.search("[A-Z]", password) is not None
+    number = re.search(r"\d", password) is not None
+    nonalpha = re.search(r"\W", password) is not None
+    return sum([lowercase, uppercase, number, nonalpha])
+
+
+def old_check(password: str) -> bool:
+    """The checks get_password used to do (without the dialogs)"""
+    if not password or len(password) < 8:
+        return False
+    if old_complexity(password) < 3:
+        return False
+    found_items = []
+    for item in BLACKLIST:
+        if item in password:
+            found_items.append(item)
+    return not found_items
+
+
+def rss() -> int:
+    """Return RSS (KiB) of this process"""
+    with open("/proc/self/status") as fob:
+        for line in fob:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def bench(name: str, func, items: list, baseline: float | None = None
+          ) -> float:
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    per_item = (time.perf_counter() - start) / len(items) * 1e6
+    speedup = f"{baseline / per_item:6.2f}x" if baseline else ""
+    print(f"{name:40} {per_item:8.2f} us {speedup}")
+    return per_item
+
+
+def main() -> None:
+    opts = []
+    try:
+        opts, _ = getopt.gnu_getopt(
+            sys.argv[1:], "h", ["help", "count=", "dict-size=", "length="]
+        )
+    except getopt.GetoptError as e:
+        usage(e)
+
+    count = 100000
+    dict_size = 1000000
+    length = 12
+    for opt, val in opts:
+        if opt in ("-h", "--help"):
+            usage()
+        elif opt == "--count":
+            count = int(val)
+        elif opt == "--dict-size":
+            dict_size = int(val)
+        elif opt == "--length":
+            length = int(val)
+
+    passwords = [
+        "".join(secrets.choice(ALPHABET) for _ in range(length))
+        for _ in range(count)
+    ]
+    words = [secrets.token_hex(5) for _ in range(dict_size)]
+
+    print(f"{count} passwords of {length} characters:")
+    base = bench("complexity (4 x re.search)", old_complexity, passwords)
+    bench("complexity (single pass)", complexity, passwords, base)
+    base = bench("get_password checks (before)", old_check, passwords)
+    policy = PasswordPolicy(forbidden=BLACKLIST, dictionary=None)
+    bench("PasswordPolicy.check", policy.check, passwords, base)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "common-passwords")
+        Dictionary.build(words, path)
+        size = os.path.getsize(path) // 1024
+        # half of the lookups are hits
+        lookups = words[:count // 2] + passwords[:count // 2]
+
+        print(f"\n{dict_size} word dictionary ({size} KiB on disk):")
+        before = rss()
+        start = time.perf_counter()
+        wordset = {line.rstrip("\n") for line in open(path)}
+        load = (time.perf_counter() - start) * 1000
+        print(f"{'set: load':40} {load:8.2f} ms {rss() - before} KiB RSS")
+        base = bench("set: lookup", lambda w: w.lower() in wordset,
+                     lookups)
+        del wordset
+
+        before = rss()
+        start = time.perf_counter()
+        dictionary = Dictionary(path)
+        load = (time.perf_counter() - start) * 1000
+        bench("Dictionary: lookup", dictionary.__contains__, lookups, base)
+        print(f"{'Dictionary: open':40} {load:8.2f} ms {rss() - before} KiB"
+              " RSS (after lookups)")
+
+        policy = PasswordPolicy(forbidden=BLACKLIST, dictionary=path)
+        bench("PasswordPolicy.check (with dictionary)", policy.check,
+              passwords)
+
+
+if __name__ == "__main__":
+    main()
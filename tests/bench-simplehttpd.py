@@ -0,0 +1,289 @@
+#!/usr/bin/python3
+"""Benchmark simplehttpd.py engines - requests/sec and peak RSS, or (with
+--reload) reload latency and failed requests while reloading
+
+Options:
+
+    --engines=fork,thread   engines to benchmark (default: all)
+    --clients=N             concurrent client connections (default: 8)
+    --requests=N            requests per client (default: 200)
+    --tls                   benchmark HTTPS (default: HTTP)
+    --no-keepalive          open a new connection per request
+    --reload=METHOD         reload the server (hup|takeover|restart) while
+                            the clients run
+    --reloads=N             number of reloads (default: 10)
+"""
+
+import getopt
+import http.client
+import os
+import shutil
+import signal
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import NoReturn
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SIMPLEHTTPD = os.path.join(SRC, "bin", "simplehttpd.py")
+HTDOCS = os.path.join(SRC, "turnkey-init-fence", "htdocs")
+CERT = os.path.join(SRC, "tests", "cert.pem")
+KEY = os.path.join(SRC, "tests", "cert.key")
+
+HTTP_PORT = 28080
+HTTPS_PORT = 28443
+PATHS = ["/", "/style.css", "/turnkey-init-root.png"]
+
+
+def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
+    if msg:
+        print(f"Error: {msg}", file=sys.stderr)
+    print(f"Syntax: {sys.argv[0]} [options]", file=sys.stderr)
+    print(__doc__, file=sys.stderr)
+    sys.exit(1)
+
+
+def tree_rss(pid: int) -> int:
+    """Return total RSS (KiB) of pid and its descendants"""
+    children: dict[int, list[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as fob:
+                ppid = int(fob.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total = 0
+    todo = [pid]
+    while todo:
+        p = todo.pop()
+        todo.extend(children.get(p, []))
+        try:
+            with open(f"/proc/{p}/status") as fob:
+                for line in fob:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+        except OSError:
+            continue
+    return total
+
+
+def connect(tls: bool) -> http.client.HTTPConnection:
+    if tls:
+        ctx = ssl.create_default_context()
+        ctx.check_hostname = False
+        ctx.verify_mode = ssl.CERT_NONE
+        return http.client.HTTPSConnection(
+            "localhost", HTTPS_PORT, context=ctx, timeout=30
+        )
+    return http.client.HTTPConnection("localhost", HTTP_PORT, timeout=30)
+
+
+def client(tls: bool, keepalive: bool, requests: int, errors: list,
+           stop: threading.Event | None = None) -> None:
+    conn = connect(tls)
+    for i in range(requests):
+        if stop is not None and stop.is_set():
+            break
+        try:
+            conn.request("GET", PATHS[i % len(PATHS)])
+            conn.getresponse().read()
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(e)
+            conn.close()
+            conn = connect(tls)
+            continue
+        if not keepalive:
+            conn.close()
+            conn = connect(tls)
+    conn.close()
+
+
+def start_server(engine: str, clients: int, htdocs: str = HTDOCS,
+                 *options: str) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, SIMPLEHTTPD, f"--engine={engine}",
+         f"--max-connections={max(clients, 1)}", *options,
+         htdocs, str(HTTP_PORT), str(HTTPS_PORT), CERT, KEY],
+        stderr=subprocess.DEVNULL,
+        env={**os.environ, "PYTHONPATH": SRC},
+        # simplehttpd signals its process group on SIGTERM
+        start_new_session=True,
+    )
+
+
+def bench(engine: str, clients: int, requests: int, tls: bool,
+          keepalive: bool) -> None:
+    proc = start_server(engine, clients)
+    try:
+        time.sleep(1)
+        idle_rss = tree_rss(proc.pid)
+        errors: list = []
+        threads = [
+            threading.Thread(
+                target=client, args=(tls, keepalive, requests, errors)
+            )
+            for _ in range(clients)
+        ]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+
+        peak_rss = idle_rss
+        while any(thread.is_alive() for thread in threads):
+            peak_rss = max(peak_rss, tree_rss(proc.pid))
+            time.sleep(0.05)
+        elapsed = time.monotonic() - start
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    total = clients * requests
+    print(
+        f"{engine:8} {total / elapsed:10.1f} req/s"
+        f" {idle_rss / 1024:8.1f} MiB idle {peak_rss / 1024:8.1f} MiB peak"
+        f" {len(errors):6} errors"
+    )
+
+
+def fetch_generation(tls: bool) -> str | None:
+    conn = connect(tls)
+    try:
+        conn.request("GET", "/generation.txt")
+        return conn.getresponse().read().decode()
+    except (OSError, http.client.HTTPException):
+        return None
+    finally:
+        conn.close()
+
+
+def bench_reload(engine: str, method: str, clients: int, reloads: int,
+                 tls: bool, keepalive: bool) -> None:
+    """Reload while clients run; latency is the time until a new
+    generation.txt is served
+    """
+    tmpdir = tempfile.mkdtemp()
+    htdocs = os.path.join(tmpdir, "htdocs")
+    shutil.copytree(HTDOCS, htdocs)
+    control = os.path.join(tmpdir, "control.sock")
+    generation_txt = os.path.join(htdocs, "generation.txt")
+    with open(generation_txt, "w") as fob:
+        fob.write("0")
+
+    # one more connection for fetch_generation()
+    procs = [
+        start_server(engine, clients + 1, htdocs, f"--control={control}")
+    ]
+    errors: list = []
+    stop = threading.Event()
+    latencies = []
+    try:
+        time.sleep(1)
+        threads = [
+            threading.Thread(
+                target=client, args=(tls, keepalive, 10**9, errors, stop)
+            )
+            for _ in range(clients)
+        ]
+        for thread in threads:
+            thread.start()
+
+        for generation in range(1, reloads + 1):
+            time.sleep(0.5)
+            with open(generation_txt, "w") as fob:
+                fob.write(str(generation))
+            start = time.monotonic()
+            if method == "hup":
+                procs[-1].send_signal(signal.SIGHUP)
+            elif method == "takeover":
+                procs.append(start_server(
+                    engine, clients + 1, htdocs, f"--control={control}",
+                    "--takeover",
+                ))
+            elif method == "restart":
+                procs[-1].terminate()
+                procs[-1].wait()
+                procs.append(start_server(
+                    engine, clients + 1, htdocs, f"--control={control}"
+                ))
+            while fetch_generation(tls) != str(generation):
+                time.sleep(0.005)
+            latencies.append(time.monotonic() - start)
+
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        stop.set()
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+        shutil.rmtree(tmpdir)
+
+    latencies.sort()
+    print(
+        f"{engine:8} {method:9}"
+        f" {latencies[len(latencies) // 2] * 1000:8.1f} ms median"
+        f" {latencies[-1] * 1000:8.1f} ms max reload"
+        f" {len(errors):6} failed requests"
+    )
+
+
+def main():
+    try:
+        opts, _ = getopt.gnu_getopt(
+            sys.argv[1:],
+            "h",
+            ["help", "engines=", "clients=", "requests=", "tls",
+             "no-keepalive", "reload=", "reloads="],
+        )
+    except getopt.GetoptError as e:
+        usage(e)
+
+    engines = ["fork", "thread"]
+    clients = 8
+    requests = 200
+    tls = False
+    keepalive = True
+    reload = None
+    reloads = 10
+    for opt, val in opts:
+        if opt in ("-h", "--help"):
+            usage()
+        elif opt == "--engines":
+            engines = val.split(",")
+        elif opt == "--clients":
+            clients = int(val)
+        elif opt == "--requests":
+            requests = int(val)
+        elif opt == "--tls":
+            tls = True
+        elif opt == "--no-keepalive":
+            keepalive = False
+        elif opt == "--reload":
+            if val not in ("hup", "takeover", "restart"):
+                usage(f"unknown reload method '{val}'")
+            reload = val
+        elif opt == "--reloads":
+            reloads = int(val)
+
+    print(
+        f"{clients} clients x {requests} requests,"
+        f" {'HTTPS' if tls else 'HTTP'},"
+        f" keep-alive {'on' if keepalive else 'off'}"
+    )
+    for engine in engines:
+        if reload:
+            bench_reload(engine, reload, clients, reloads, tls, keepalive)
+        else:
+            bench(engine, clients, requests, tls, keepalive)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/python3
+"""Dry run inithooks_autogrow against disk images (MBR and GPT) - attached
+read-only to a loop device when run as root, so the block device code path
+is used too
+
+Options:
+
+    --verbose           print autogrow's output
+"""
+
+import getopt
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import uuid
+from typing import NoReturn
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+MIB = 1024 * 1024
+SECTOR = 512
+GPT_LINUX = "0fc63daf-8483-4772-8e79-3d69d8477de4"
+GPT_LVM = "e6d6d379-f507-44c2-a23c-238f2a3df928"
+
+
+def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
+    if msg:
+        print(f"Error: {msg}", file=sys.stderr)
+    print(f"Syntax: {sys.argv[0]} [options]", file=sys.stderr)
+    print(__doc__, file=sys.stderr)
+    sys.exit(1)
+
+
+def mbr(partitions: list[tuple[int, int, int]]) -> bytes:
+    """Return MBR with partitions [(type, start, size)] (in sectors)"""
+    sector = bytearray(SECTOR)
+    for i, (ptype, start, size) in enumerate(partitions):
+        entry = struct.pack("<B3sB3sII", 0, bytes(3), ptype, bytes(3),
+                            start, size)
+        sector[446 + 16 * i:446 + 16 * (i + 1)] = entry
+    sector[510:512] = b"\x55\xaa"
+    return bytes(sector)
+
+
+def write_image(
+    path: str, size: int, label: str, partitions: list[tuple[str, int, int]]
+) -> None:
+    """Write a sparse disk image of size bytes, with partitions
+    [(type, start, size)] - MBR type (e.g. '8e') or GPT type GUID"""
+    with open(path, "wb") as fob:
+        fob.truncate(size)
+        if label == "dos":
+            fob.write(mbr([(int(t, 16), start, length)
+                           for t, start, length in partitions]))
+            return
+        # protective MBR, then (primary) header and entries; autogrow
+        # doesn't check the CRCs
+        fob.write(mbr([(0xEE, 1, min(size // SECTOR - 1, 0xFFFFFFFF))]))
+        entries = bytearray(128 * 128)
+        for i, (ptype, start, length) in enumerate(partitions):
+            struct.pack_into("<16s16sQQ", entries, i * 128,
+                             uuid.UUID(ptype).bytes_le, uuid.uuid4().bytes_le,
+                             start, start + length - 1)
+        header = struct.pack(
+            "<8sIIIIQQQQ16sQII", b"EFI PART", 0x10000, 92, 0, 0, 1,
+            size // SECTOR - 1, 34, size // SECTOR - 34,
+            uuid.uuid4().bytes_le, 2, 128, 128,
+        )
+        fob.seek(SECTOR)
+        fob.write(header)
+        fob.seek(2 * SECTOR)
+        fob.write(entries)
+
+
+def attach(image: str) -> str | None:
+    """Attach image read-only to a loop device, return its path (None if
+    that isn't possible here)"""
+    if os.geteuid() != 0 or not shutil.which("losetup"):
+        return None
+    proc = subprocess.run(
+        ["losetup", "--find", "--show", "--read-only", image],
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return None
+    return proc.stdout.strip()
+
+
+def main() -> None:
+    opts = []
+    try:
+        opts, _ = getopt.gnu_getopt(sys.argv[1:], "hv", ["help", "verbose"])
+    except getopt.GetoptError as e:
+        usage(e)
+
+    verbose = False
+    for opt, _ in opts:
+        if opt in ("-h", "--help"):
+            usage()
+        elif opt in ("-v", "--verbose"):
+            verbose = True
+
+    tmpdir = tempfile.mkdtemp()
+    env = dict(os.environ, PYTHONPATH=SRC)
+    loops = []
+
+    def autogrow(device: str, *args: str) -> tuple[int, str]:
+        proc = subprocess.run(
+            [sys.executable, "-m", "libinithooks.inithooks_autogrow",
+             "--dry-run", f"--state-dir={tmpdir}", device, *args],
+            capture_output=True, text=True, env=env,
+        )
+        if verbose:
+            print(f"$ autogrow {device} {' '.join(args)} -> {proc.returncode}")
+            print(proc.stdout + proc.stderr, end="")
+        return proc.returncode, proc.stdout
+
+    failures = []
+
+    def check(what: str, ok: bool) -> None:
+        print(f"{'ok' if ok else 'FAIL':4} {what}")
+        if not ok:
+            failures.append(what)
+
+    def image(name: str, label: str, partitions: list) -> list[str]:
+        """Return the devices to test image name on"""
+        path = os.path.join(tmpdir, name)
+        write_image(path, 256 * MIB, label, partitions)
+        devices = [path]
+        loop = attach(path)
+        if loop:
+            loops.append(loop)
+            devices.append(loop)
+        return devices
+
+    try:
+        # boot partition, then a 64 MiB LVM partition
+        for device in image("mbr.img", "dos",
+                            [("83", 2048, 2048), ("8e", 4096, 131072)]):
+            exit_code, out = autogrow(device, "2")
+            check(f"MBR grown to fill {os.path.basename(device)}",
+                  exit_code == 0
+                  and f"partition 2 of {device} from 131072 to"
+                      f" {256 * MIB // SECTOR - 4096} sectors" in out
+                  and "pvresize 2\n" in out
+                  and "resize2fs /dev/turnkey/root" in out)
+
+            exit_code, out = autogrow(device, "2", "--pv-only")
+            check("--pv-only stops after the PV",
+                  exit_code == 0 and "pvresize" in out
+                  and "lvextend" not in out)
+
+            exit_code, _ = autogrow(device, "1")
+            check("non-LVM partition refused", exit_code == 1)
+
+        for device in image("gpt.img", "gpt",
+                            [(GPT_LINUX, 2048, 2048),
+                             (GPT_LVM, 4096, 131072)]):
+            exit_code, out = autogrow(device, "2", "--lv=SKIP")
+            # leaves room for the backup entries and header
+            check(f"GPT grown to fill {os.path.basename(device)}",
+                  exit_code == 0
+                  and f"from 131072 to {256 * MIB // SECTOR - 33 - 4096}"
+                      " sectors" in out
+                  and "pvresize" not in out)
+
+        for device in image("notlast.img", "dos",
+                            [("8e", 2048, 131072), ("83", 133120, 2048)]):
+            exit_code, _ = autogrow(device, "1")
+            check("not the last partition refused", exit_code == 1)
+
+        for device in image("full.img", "dos",
+                            [("8e", 2048, 256 * MIB // SECTOR - 2048)]):
+            exit_code, out = autogrow(device, "1")
+            check("full partition not grown",
+                  exit_code == 0 and "Growing" not in out
+                  and "pvresize" in out)
+
+        if not loops:
+            print("(loop devices not tested - needs root and losetup)")
+    finally:
+        for loop in loops:
+            subprocess.run(["losetup", "--detach", loop])
+        shutil.rmtree(tmpdir)
+
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
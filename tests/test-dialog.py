@@ -0,0 +1,218 @@
+#!/usr/bin/python3
+"""Run a scripted Dialog session (as firstboot prompts would) in a pseudo
+terminal - checks the answers Dialog returns and reports how much was
+written to the terminal, i.e. how long it takes to draw over a serial line
+
+Options:
+
+    --backend=NAME      curses or dialog (default: both, if dialog(1) is
+                        installed)
+    --term=TERM         terminal type (default: vt220)
+    --size=COLSxLINES   terminal size (default: 80x24)
+    --baud=N            serial line speed to report for (default: 9600)
+    --verbose           print the output of each step
+"""
+
+import fcntl
+import getopt
+import json
+import os
+import pty
+import select
+import shutil
+import signal
+import struct
+import sys
+import termios
+import time
+from typing import NoReturn
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+UP = "\x1b[A"
+DOWN = "\x1b[B"
+ENTER = "\r"
+TAB = "\t"
+BACKSPACE = "\x7f"
+
+PASSWORD = "Turnkey-1x"
+
+# (step, keys to send once the screen has settled)
+SCRIPT = [
+    ("password", PASSWORD + ENTER),
+    ("password confirm (mismatch)", "Turnkey-2x" + ENTER),
+    ("mismatch error", ENTER),
+    ("password again", PASSWORD + ENTER),
+    ("password confirm", PASSWORD + ENTER),
+    ("email (edit prefilled)", BACKSPACE * 3 + "org" + ENTER),
+    ("yesno (skip)", TAB + ENTER),
+    ("yesno (hotkey)", "i"),
+    ("menu", DOWN + DOWN + UP + ENTER),
+    ("inputbox", "0123456789" * 8 + ENTER),
+    ("msgbox", ENTER),
+]
+
+EXPECTED = {
+    "password": PASSWORD,
+    "email": "admin@example.org",
+    "skip": False,
+    "install": True,
+    "menu": "b",
+    "inputbox": ["ok", "0123456789" * 8],
+}
+
+SESSION = """
+import json, os, sys
+from libinithooks.dialog_wrapper import Dialog
+
+d = Dialog("TurnKey GNU/Linux - First boot configuration")
+result = {}
+result["password"] = d.get_password(
+    "Root Password", "Please enter new password for the root account.")
+result["email"] = d.get_email(
+    "System Notifications and Critical Security Alerts",
+    "Enable local system notifications.", "admin@example.com")
+text = "Install security updates now?\\n\\n(recommended)"
+result["skip"] = d.yesno("Security updates", text, "Install", "Skip")
+result["install"] = d.yesno("Security updates", text, "Install", "Skip")
+result["menu"] = d.menu("Menu", "Choose one", [
+    ("a", "first choice"), ("b", "second choice"), ("c", "third")])
+result["inputbox"] = d.inputbox("Hub services", "API key", "", "Apply",
+                                "Skip")
+d.msgbox("Done", "All done!")
+os.write(int(sys.argv[1]), json.dumps(result).encode())
+"""
+
+
+def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
+    if msg:
+        print(f"Error: {msg}", file=sys.stderr)
+    print(f"Syntax: {sys.argv[0]} [options]", file=sys.stderr)
+    print(__doc__, file=sys.stderr)
+    sys.exit(1)
+
+
+def read_until_quiet(fd: int, quiet: float = 0.3, timeout: float = 10
+                     ) -> bytes:
+    """Read output until there's none for quiet secs"""
+    output = b""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        readable, _, _ = select.select([fd], [], [], quiet)
+        if not readable:
+            if output:
+                break
+            continue
+        try:
+            data = os.read(fd, 65536)
+        except OSError:
+            # child closed the terminal
+            break
+        if not data:
+            break
+        output += data
+    return output
+
+
+def run(backend: str, term: str, cols: int, lines: int, verbose: bool
+        ) -> tuple[dict, list[tuple[str, int]]]:
+    """Run the session; returns (answers, [(step, bytes written)])"""
+    rfd, wfd = os.pipe()
+    pid, fd = pty.fork()
+    if pid == 0:
+        os.close(rfd)
+        os.set_inheritable(wfd, True)
+        os.environ.update(
+            TERM=term,
+            INITHOOKS_DIALOG=backend,
+            PYTHONPATH=SRC,
+            LANG="C.UTF-8",
+        )
+        os.execv(sys.executable,
+                 [sys.executable, "-c", SESSION, str(wfd)])
+    os.close(wfd)
+    fcntl.ioctl(fd, termios.TIOCSWINSZ,
+                struct.pack("HHHH", lines, cols, 0, 0))
+
+    steps = []
+    try:
+        for step, keys in SCRIPT:
+            output = read_until_quiet(fd)
+            steps.append((step, len(output)))
+            if verbose:
+                print(f"--- {step}: {len(output)} bytes")
+                print(repr(output))
+            os.write(fd, keys.encode())
+        output = read_until_quiet(fd)
+        steps.append(("exit", len(output)))
+        if verbose:
+            print(f"--- exit: {len(output)} bytes")
+            print(repr(output))
+    finally:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        _, status = os.waitpid(pid, 0)
+        os.close(fd)
+
+    with os.fdopen(rfd) as fob:
+        data = fob.read()
+    if not data:
+        raise RuntimeError(f"{backend}: session failed (status {status})")
+    return json.loads(data), steps
+
+
+def main() -> None:
+    opts = []
+    try:
+        opts, _ = getopt.gnu_getopt(
+            sys.argv[1:], "hv",
+            ["help", "backend=", "term=", "size=", "baud=", "verbose"],
+        )
+    except getopt.GetoptError as e:
+        usage(e)
+
+    backends = ["curses"]
+    if shutil.which("dialog"):
+        backends.append("dialog")
+    term = "vt220"
+    cols, lines = 80, 24
+    baud = 9600
+    verbose = False
+    for opt, val in opts:
+        if opt in ("-h", "--help"):
+            usage()
+        elif opt == "--backend":
+            backends = [val]
+        elif opt == "--term":
+            term = val
+        elif opt == "--size":
+            cols, lines = (int(n) for n in val.split("x"))
+        elif opt == "--baud":
+            baud = int(val)
+        elif opt in ("-v", "--verbose"):
+            verbose = True
+
+    ok = True
+    for backend in backends:
+        answers, steps = run(backend, term, cols, lines, verbose)
+        total = sum(n for _, n in steps)
+        print(f"{backend} ({term} {cols}x{lines}):")
+        for step, n in steps:
+            # 10 bits per byte (8N1)
+            print(f"    {step:32} {n:7} bytes {n * 10 / baud:6.2f}s")
+        print(f"    {'total':32} {total:7} bytes {total * 10 / baud:6.2f}s"
+              f" @ {baud} baud")
+        for key, expected in EXPECTED.items():
+            if answers.get(key) != expected:
+                ok = False
+                print(f"    FAIL: {key}: got {answers.get(key)!r},"
+                      f" expected {expected!r}")
+    if not ok:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
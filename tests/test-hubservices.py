@@ -0,0 +1,182 @@
+#!/usr/bin/python3
+"""Run bin/hubservices.py (with --apikey) against stub tklbam-init,
+hubdns-init and hubdns-update commands on PATH and a local listener as the
+Hub - checks the steps run (concurrently), failures, timeouts and missing
+commands
+
+Options:
+
+    --verbose           print hubservices.py's output
+"""
+
+import getopt
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import NoReturn
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+COMMANDS = ("tklbam-init", "hubdns-init", "hubdns-update")
+
+# logs how it was run, then runs $STUB_<NAME> (default: succeed)
+STUB = """#!/bin/sh
+echo "{name} $*" >> "$STUB_LOG"
+eval "${{{var}:-true}}"
+"""
+
+
+def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
+    if msg:
+        print(f"Error: {msg}", file=sys.stderr)
+    print(f"Syntax: {sys.argv[0]} [options]", file=sys.stderr)
+    print(__doc__, file=sys.stderr)
+    sys.exit(1)
+
+
+def stub_var(name: str) -> str:
+    return "STUB_" + name.upper().replace("-", "_")
+
+
+def main() -> None:
+    opts = []
+    try:
+        opts, _ = getopt.gnu_getopt(sys.argv[1:], "hv", ["help", "verbose"])
+    except getopt.GetoptError as e:
+        usage(e)
+
+    verbose = False
+    for opt, _ in opts:
+        if opt in ("-h", "--help"):
+            usage()
+        elif opt in ("-v", "--verbose"):
+            verbose = True
+
+    # the Hub only has to accept connections
+    hub = socket.create_server(("127.0.0.1", 0))
+    hub_address = f"127.0.0.1:{hub.getsockname()[1]}"
+    closed = socket.create_server(("127.0.0.1", 0))
+    closed_address = f"127.0.0.1:{closed.getsockname()[1]}"
+    closed.close()
+
+    tmpdir = tempfile.mkdtemp()
+    bindir = os.path.join(tmpdir, "bin")
+    os.makedirs(bindir)
+    for name in COMMANDS:
+        path = os.path.join(bindir, name)
+        with open(path, "w") as fob:
+            fob.write(STUB.format(name=name, var=stub_var(name)))
+        os.chmod(path, 0o755)
+    stub_log = os.path.join(tmpdir, "stub.log")
+    base_env = dict(
+        os.environ,
+        PATH=f"{bindir}:{os.environ['PATH']}",
+        PYTHONPATH=SRC,
+        INITHOOKS_CACHE=os.path.join(tmpdir, "cache"),
+        INITHOOKS_NETCHECK_MAX_AGE="0",
+        STUB_LOG=stub_log,
+    )
+
+    def hubservices(
+        *args: str, hub: str = hub_address, **stubs: str
+    ) -> tuple[int, dict, list[str], float]:
+        """Return (exit code, {step: result}, commands run, duration)"""
+        env = dict(base_env)
+        env.update((stub_var(name), val) for name, val in stubs.items())
+        if os.path.exists(stub_log):
+            os.remove(stub_log)
+        start = time.monotonic()
+        proc = subprocess.run(
+            [sys.executable, os.path.join(SRC, "bin", "hubservices.py"),
+             "--apikey=APIKEY", f"--hub={hub}", "--json", *args],
+            capture_output=True, text=True, env=env,
+        )
+        duration = time.monotonic() - start
+        if verbose:
+            print(f"$ hubservices {' '.join(args)} -> {proc.returncode}"
+                  f" ({duration:.2f}s)")
+            print(proc.stdout + proc.stderr, end="")
+        try:
+            results = {r["step"]: r for r in json.loads(proc.stdout)}
+        except ValueError:
+            results = {}
+        run = []
+        if os.path.exists(stub_log):
+            with open(stub_log) as fob:
+                run = [line.rstrip() for line in fob]
+        return proc.returncode, results, run, duration
+
+    failures = []
+
+    def check(what: str, ok: bool) -> None:
+        print(f"{'ok' if ok else 'FAIL':4} {what}")
+        if not ok:
+            failures.append(what)
+
+    try:
+        exit_code, results, run, _ = hubservices("--fqdn=www.example.com")
+        check("all steps run and succeed",
+              exit_code == 0
+              and list(results) == ["probe", *COMMANDS]
+              and all(r["ok"] for r in results.values())
+              and sorted(run) == ["hubdns-init APIKEY www.example.com",
+                                  "hubdns-update", "tklbam-init APIKEY"])
+
+        exit_code, results, run, duration = hubservices(
+            "--fqdn=www.example.com", tklbam_init="sleep 1",
+            hubdns_init="sleep 1",
+        )
+        check("TKLBAM and HubDNS initialized concurrently",
+              exit_code == 0 and duration < 1.8)
+
+        exit_code, results, run, _ = hubservices(
+            "--fqdn=www.example.com",
+            hubdns_init="echo 'hostname taken' >&2; exit 3",
+        )
+        check("hubdns-init failure reported, hubdns-update skipped",
+              exit_code == 1
+              and results["hubdns-init"]["returncode"] == 3
+              and results["hubdns-init"]["output"] == "hostname taken"
+              and results["tklbam-init"]["ok"]
+              and "hubdns-update" not in results
+              and "hubdns-update" not in run)
+
+        exit_code, results, run, _ = hubservices()
+        check("HubDNS skipped without an FQDN",
+              exit_code == 0 and list(results) == ["probe", "tklbam-init"])
+
+        exit_code, results, run, duration = hubservices(
+            "--timeout=0.5", tklbam_init="sleep 30 & wait"
+        )
+        check("step timed out (and killed)",
+              exit_code == 1
+              and results["tklbam-init"]["returncode"] is None
+              and duration < 5)
+
+        os.remove(os.path.join(bindir, "tklbam-init"))
+        exit_code, results, run, _ = hubservices()
+        check("missing command reported",
+              exit_code == 1 and results["tklbam-init"]["returncode"] == 127)
+
+        exit_code, results, run, _ = hubservices(
+            "--fqdn=www.example.com", hub=closed_address
+        )
+        check("nothing run when the Hub is unreachable",
+              exit_code == 1 and list(results) == ["probe"]
+              and not results["probe"]["ok"] and not run)
+    finally:
+        hub.close()
+        shutil.rmtree(tmpdir)
+
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/python3
+"""Log through libinithooks to stand-ins for the journal and syslog sockets
+- checks the native journal records (structured and multi-line fields), the
+fallback to syslog and reconnecting once the journal is restarted
+
+Options:
+
+    --verbose           print the datagrams received
+"""
+
+import getopt
+import os
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+from typing import NoReturn
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# logs each line of stdin ("LEVEL MESSAGE", \n for newlines) as hook 01test
+LOGGER = r"""
+import sys
+from libinithooks import error, info, warn
+
+log = {"info": info, "warn": warn, "err": error}
+for line in sys.stdin:
+    level, _, msg = line.rstrip("\n").partition(" ")
+    log[level](msg.replace("\\n", "\n"), "01test", 1.5)
+    print("sent", flush=True)
+"""
+
+
+def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
+    if msg:
+        print(f"Error: {msg}", file=sys.stderr)
+    print(f"Syntax: {sys.argv[0]} [options]", file=sys.stderr)
+    print(__doc__, file=sys.stderr)
+    sys.exit(1)
+
+
+def parse_record(data: bytes) -> dict[str, str]:
+    """Parse a datagram of journald's native protocol"""
+    fields = {}
+    while data:
+        line, _, rest = data.partition(b"\n")
+        if b"=" in line:
+            key, _, val = line.partition(b"=")
+            data = rest
+        else:
+            # binary form: KEY\n<64 bit LE length><value>\n
+            key = line
+            (length,) = struct.unpack_from("<Q", rest)
+            val = rest[8:8 + length]
+            data = rest[8 + length + 1:]
+        fields[key.decode()] = val.decode()
+    return fields
+
+
+def listen(path: str) -> socket.socket:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(path)
+    return sock
+
+
+def main() -> None:
+    opts = []
+    try:
+        opts, _ = getopt.gnu_getopt(sys.argv[1:], "hv", ["help", "verbose"])
+    except getopt.GetoptError as e:
+        usage(e)
+
+    verbose = False
+    for opt, _ in opts:
+        if opt in ("-h", "--help"):
+            usage()
+        elif opt in ("-v", "--verbose"):
+            verbose = True
+
+    tmpdir = tempfile.mkdtemp()
+    journal_path = os.path.join(tmpdir, "journal.socket")
+    syslog_path = os.path.join(tmpdir, "syslog.socket")
+    env = dict(
+        os.environ,
+        PYTHONPATH=SRC,
+        INITHOOKS_JOURNAL_SOCKET=journal_path,
+        INITHOOKS_SYSLOG_SOCKET=syslog_path,
+    )
+    env.pop("INITHOOKS_LOGFILE", None)
+
+    def start() -> subprocess.Popen:
+        return subprocess.Popen(
+            [sys.executable, "-c", LOGGER], env=env, text=True,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        )
+
+    def log(proc: subprocess.Popen, line: str) -> None:
+        assert proc.stdin is not None and proc.stdout is not None
+        proc.stdin.write(f"{line}\n")
+        proc.stdin.flush()
+        proc.stdout.readline()
+
+    def receive(sock: socket.socket, timeout: float = 5) -> bytes:
+        sock.settimeout(timeout)
+        try:
+            data = sock.recv(65536)
+        except TimeoutError:
+            return b""
+        if verbose:
+            print(repr(data))
+        return data
+
+    failures = []
+
+    def check(what: str, ok: bool) -> None:
+        print(f"{'ok' if ok else 'FAIL':4} {what}")
+        if not ok:
+            failures.append(what)
+
+    journal = listen(journal_path)
+    syslog = listen(syslog_path)
+    proc = start()
+    try:
+        log(proc, "warn hello")
+        record = parse_record(receive(journal))
+        check("native journal record with structured fields", record == {
+            "MESSAGE": "hello",
+            "PRIORITY": "4",
+            "SYSLOG_IDENTIFIER": "inithooks",
+            "INITHOOKS_HOOK": "01test",
+            "INITHOOKS_DURATION": "1.500",
+        })
+
+        log(proc, "info first line\\nsecond line")
+        record = parse_record(receive(journal))
+        check("multi-line message kept whole",
+              record.get("MESSAGE") == "first line\nsecond line"
+              and record.get("PRIORITY") == "6")
+
+        # journald restarted: the kept-open connection fails (that message
+        # falls back to logger(1)), the next one reconnects
+        journal.close()
+        os.unlink(journal_path)
+        journal = listen(journal_path)
+        log(proc, "info lost connection")
+        log(proc, "err reconnected")
+        record = parse_record(receive(journal))
+        check("reconnects once the journal is back",
+              record.get("MESSAGE") == "reconnected"
+              and record.get("PRIORITY") == "3")
+        check("syslog not used while the journal is up",
+              receive(syslog, timeout=0.1) == b"")
+    finally:
+        assert proc.stdin is not None
+        proc.stdin.close()
+        proc.wait()
+
+    # no journal: syslog format, user facility
+    journal.close()
+    os.unlink(journal_path)
+    proc = start()
+    try:
+        log(proc, "err no journal")
+        check("falls back to the syslog socket",
+              receive(syslog) == b"<11>inithooks: no journal")
+    finally:
+        assert proc.stdin is not None
+        proc.stdin.close()
+        proc.wait()
+
+    syslog.close()
+    shutil.rmtree(tmpdir)
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
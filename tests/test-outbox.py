@@ -0,0 +1,168 @@
+#!/usr/bin/python3
+"""Run inithooks_outbox against a local HTTP stand-in for the Hub (and a
+stub mail command) - queues, coalesces, backs off while the Hub is
+failing and sends once it isn't
+
+Options:
+
+    --verbose           print the outbox's output
+"""
+
+import getopt
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NoReturn
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+MAIL_STUB = """#!/bin/sh
+# mail -s SUBJECT RECIPIENT
+{ echo "$2 -> $3"; cat; echo; } >> "$MAIL_LOG"
+"""
+
+
+class Hub(BaseHTTPRequestHandler):
+    """POSTs get status (set by the test); bodies are recorded"""
+
+    status = 200
+    posts: list[tuple[str, dict]] = []
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        body = urllib.parse.parse_qs(self.rfile.read(length).decode())
+        self.posts.append((self.path, {k: v[0] for k, v in body.items()}))
+        self.send_response(self.status)
+        self.end_headers()
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
+    if msg:
+        print(f"Error: {msg}", file=sys.stderr)
+    print(f"Syntax: {sys.argv[0]} [options]", file=sys.stderr)
+    print(__doc__, file=sys.stderr)
+    sys.exit(1)
+
+
+def main() -> None:
+    opts = []
+    try:
+        opts, _ = getopt.gnu_getopt(sys.argv[1:], "hv", ["help", "verbose"])
+    except getopt.GetoptError as e:
+        usage(e)
+
+    verbose = False
+    for opt, _ in opts:
+        if opt in ("-h", "--help"):
+            usage()
+        elif opt in ("-v", "--verbose"):
+            verbose = True
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Hub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/api/server/secalerts/"
+
+    tmpdir = tempfile.mkdtemp()
+    stub = os.path.join(tmpdir, "bin", "mail")
+    os.makedirs(os.path.dirname(stub))
+    with open(stub, "w") as fob:
+        fob.write(MAIL_STUB)
+    os.chmod(stub, 0o755)
+    mail_log = os.path.join(tmpdir, "mail.log")
+    outbox_dir = os.path.join(tmpdir, "outbox")
+    env = dict(
+        os.environ,
+        PATH=f"{os.path.dirname(stub)}:{os.environ['PATH']}",
+        PYTHONPATH=SRC,
+        INITHOOKS_OUTBOX=outbox_dir,
+        INITHOOKS_LOGFILE=os.path.join(tmpdir, "inithooks.log"),
+        MAIL_LOG=mail_log,
+    )
+
+    def outbox(*args: str, stdin: str = "") -> int:
+        proc = subprocess.run(
+            [sys.executable, "-m", "libinithooks.inithooks_outbox", *args],
+            input=stdin, capture_output=True, text=True, env=env,
+        )
+        if verbose:
+            print(f"$ outbox {' '.join(args)} -> {proc.returncode}")
+            print(proc.stdout + proc.stderr, end="")
+        return proc.returncode
+
+    def queued() -> list[dict]:
+        items = []
+        for name in sorted(os.listdir(outbox_dir)):
+            with open(os.path.join(outbox_dir, name)) as fob:
+                items.append(json.load(fob))
+        return items
+
+    failures = []
+
+    def check(what: str, ok: bool) -> None:
+        print(f"{'ok' if ok else 'FAIL':4} {what}")
+        if not ok:
+            failures.append(what)
+
+    # queuing only writes the spool
+    outbox("hub", "--key=secalerts", url, "email=old@example.com")
+    outbox("hub", "--key=secalerts", url, "email=new@example.com",
+           "turnkey_version=turnkey-core-18.0")
+    outbox("mail", "root", "alerts enabled", stdin="first\n")
+    outbox("mail", "root", "another notification", stdin="second\n")
+    items = queued()
+    check("same key replaces queued item",
+          [i["kind"] for i in items] == ["hub", "mail", "mail"]
+          and items[0]["payload"]["data"]["email"] == "new@example.com")
+    check("nothing sent when queued", not Hub.posts)
+
+    # Hub failing: mails still sent (as one); hub call backs off
+    Hub.status = 503
+    check("send fails while Hub is down", outbox("send") == 1)
+    items = queued()
+    check("hub call kept, backing off",
+          len(items) == 1 and items[0]["attempts"] == 1
+          and items[0]["next_attempt"] > items[0]["created"] + 60)
+    with open(mail_log) as fob:
+        log = fob.read()
+    check("mails to the same recipient sent as one",
+          log.count(" -> root") == 1 and "first" in log
+          and "second" in log)
+
+    # not due yet - no request made
+    posts = len(Hub.posts)
+    check("send skips items backing off",
+          outbox("send") == 0 and len(Hub.posts) == posts)
+
+    # Hub back
+    Hub.status = 200
+    check("send --all sends them", outbox("send", "--all") == 0)
+    check("Hub got the latest subscription only",
+          Hub.posts[-1] == ("/api/server/secalerts/",
+                            {"email": "new@example.com",
+                             "turnkey_version": "turnkey-core-18.0"})
+          and all(p[1]["email"] == "new@example.com" for p in Hub.posts))
+    check("outbox empty once sent", queued() == [])
+
+    # client errors aren't retried
+    Hub.status = 400
+    outbox("hub", url, "email=bad")
+    check("HTTP 400 dropped", outbox("send") == 1 and queued() == [])
+
+    server.shutdown()
+    shutil.rmtree(tmpdir)
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
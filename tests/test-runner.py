@@ -0,0 +1,186 @@
+#!/usr/bin/python3
+"""Run inithooks_runner on a script dir of stub hooks which log when they
+start and end - checks barriers (including firstboot's from prefix 30), that
+hooks declaring inithooks-after: wait only for the listed hooks and the
+preceding barrier, and that dependencies on later hooks are ignored
+
+Options:
+
+    --verbose           print the runner's log and the hooks' start and end
+                        times
+"""
+
+import getopt
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import NoReturn
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# logs when it starts and ends
+HOOK = """#!/bin/sh
+{header}
+echo "$(basename "$0") start $(date +%s.%N)" >> "$HOOK_LOG"
+sleep {secs}
+echo "$(basename "$0") end $(date +%s.%N)" >> "$HOOK_LOG"
+"""
+
+# stands in for 'systemctl is-system-running --wait' (no system bus)
+SYSTEMCTL = """#!/bin/sh
+echo "systemctl start $(date +%s.%N)" >> "$HOOK_LOG"
+echo "systemctl end $(date +%s.%N)" >> "$HOOK_LOG"
+"""
+
+# (name, inithooks-after: header or None, secs)
+HOOKS = [
+    ("10barrier", None, 0.3),
+    ("20b", "", 0.5),
+    ("20c", "", 1.0),
+    ("20d", "20b", 0.3),
+    ("20e", "40z", 0.3),
+    ("30f", "", 0.3),
+    ("40barrier", None, 0.2),
+    ("40z", "", 0.2),
+]
+
+
+def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
+    if msg:
+        print(f"Error: {msg}", file=sys.stderr)
+    print(f"Syntax: {sys.argv[0]} [options]", file=sys.stderr)
+    print(__doc__, file=sys.stderr)
+    sys.exit(1)
+
+
+def write_script(path: str, content: str) -> None:
+    with open(path, "w") as fob:
+        fob.write(content)
+    os.chmod(path, 0o755)
+
+
+def main() -> None:
+    opts = []
+    try:
+        opts, _ = getopt.gnu_getopt(sys.argv[1:], "hv", ["help", "verbose"])
+    except getopt.GetoptError as e:
+        usage(e)
+
+    verbose = False
+    for opt, _ in opts:
+        if opt in ("-h", "--help"):
+            usage()
+        elif opt in ("-v", "--verbose"):
+            verbose = True
+
+    tmpdir = tempfile.mkdtemp()
+    script_dir = os.path.join(tmpdir, "firstboot.d")
+    bindir = os.path.join(tmpdir, "bin")
+    os.makedirs(script_dir)
+    os.makedirs(bindir)
+    for name, after, secs in HOOKS:
+        header = "" if after is None else f"# inithooks-after: {after}"
+        write_script(os.path.join(script_dir, name),
+                     HOOK.format(header=header, secs=secs))
+    write_script(os.path.join(bindir, "systemctl"), SYSTEMCTL)
+    hook_log = os.path.join(tmpdir, "hooks.log")
+    logfile = os.path.join(tmpdir, "inithooks.log")
+    env = dict(
+        os.environ,
+        PATH=f"{bindir}:{os.environ['PATH']}",
+        PYTHONPATH=SRC,
+        DBUS_SYSTEM_BUS_ADDRESS=f"unix:path={tmpdir}/nobus",
+        INITHOOKS_DEFAULT=os.path.join(tmpdir, "nodefaults"),
+        INITHOOKS_LOGFILE=logfile,
+        INITHOOKS_MANIFEST_DIR=os.path.join(tmpdir, "manifest"),
+        INITHOOKS_TIMINGS=os.path.join(tmpdir, "timings.jsonl"),
+        HOOK_LOG=hook_log,
+    )
+
+    def runner(*args: str) -> tuple[int, dict[str, dict[str, float]], str]:
+        """Return (exit code, {name: {event: time}}, runner's log)"""
+        for path in (hook_log, logfile):
+            if os.path.exists(path):
+                os.remove(path)
+        start = time.monotonic()
+        proc = subprocess.run(
+            [sys.executable, "-m", "libinithooks.inithooks_runner", "-j8",
+             *args, script_dir],
+            capture_output=True, text=True, env=env,
+        )
+        times: dict[str, dict[str, float]] = {}
+        with open(hook_log) as fob:
+            for line in fob:
+                name, event, when = line.split()
+                times.setdefault(name, {})[event] = float(when)
+        log = ""
+        if os.path.exists(logfile):
+            with open(logfile) as fob:
+                log = fob.read()
+        if verbose:
+            print(f"$ runner {' '.join(args)} -> {proc.returncode}"
+                  f" ({time.monotonic() - start:.2f}s)")
+            print(log + proc.stderr, end="")
+            first = min(t["start"] for t in times.values())
+            for name, t in sorted(times.items(), key=lambda i: i[1]["start"]):
+                print(f"    {name:12} {t['start'] - first:5.2f}"
+                      f" - {t['end'] - first:5.2f}")
+        return proc.returncode, times, log
+
+    failures = []
+
+    def check(what: str, ok: bool) -> None:
+        print(f"{'ok' if ok else 'FAIL':4} {what}")
+        if not ok:
+            failures.append(what)
+
+    def after(times: dict, name: str, *deps: str) -> bool:
+        """Return True if name started once all of deps had ended"""
+        return all(times[name]["start"] >= times[dep]["end"] for dep in deps)
+
+    def overlap(times: dict, *names: str) -> bool:
+        """Return True if names were all running at the same time"""
+        return (max(times[name]["start"] for name in names)
+                < min(times[name]["end"] for name in names))
+
+    try:
+        exit_code, times, log = runner()
+        check("all hooks run",
+              exit_code == 0 and sorted(times) == sorted(h[0] for h in HOOKS))
+        check("barrier waits for (and is waited for by) every hook",
+              all(after(times, name, "10barrier")
+                  for name in ("20b", "20c", "20d", "20e", "30f"))
+              and after(times, "40barrier",
+                        "20b", "20c", "20d", "20e", "30f")
+              and after(times, "40z", "40barrier"))
+        check("hooks declaring inithooks-after: run concurrently",
+              overlap(times, "20b", "20c", "20e", "30f"))
+        check("inithooks-after: waits only for the listed hooks",
+              after(times, "20d", "20b") and overlap(times, "20c", "20d"))
+        check("dependency on a later hook ignored",
+              times["20e"]["start"] < times["20b"]["end"]
+              and "[20e] ignoring dependency on later 40z" in log)
+        check("boot not waited for", "systemctl" not in times)
+
+        exit_code, times, log = runner("--firstboot")
+        check("firstboot hooks with a prefix >= 30 are barriers",
+              exit_code == 0
+              and after(times, "30f", "20b", "20c", "20d", "20e")
+              and after(times, "40barrier", "30f")
+              and overlap(times, "20b", "20c", "20e"))
+        check("boot waited for before the first of them",
+              after(times, "30f", "systemctl")
+              and after(times, "systemctl", "20c"))
+    finally:
+        shutil.rmtree(tmpdir)
+
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/python3
+"""Run firstboot.d/95secupdates (SEC_UPDATES=FORCE) against a local file://
+repo of a dummy package - installs the update (even if configuring pending
+packages fails), and fails rather than reporting success when installing it
+fails
+
+Needs root: the dummy package is installed on (and then purged from) this
+system.
+
+Options:
+
+    --verbose           print the hook's output
+"""
+
+import getopt
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import NoReturn
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PACKAGE = "inithooks-test-secupdates"
+
+CONTROL = f"""Package: {PACKAGE}
+Version: {{version}}
+Architecture: all
+Maintainer: TurnKey Linux <admin@turnkeylinux.org>
+Description: dummy package for testing 95secupdates
+"""
+
+
+def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
+    if msg:
+        print(f"Error: {msg}", file=sys.stderr)
+    print(f"Syntax: {sys.argv[0]} [options]", file=sys.stderr)
+    print(__doc__, file=sys.stderr)
+    sys.exit(1)
+
+
+def build(repo: str, version: str, postinst: str = "") -> str:
+    """Build the dummy package (version) in repo, return its path"""
+    root = tempfile.mkdtemp()
+    os.makedirs(os.path.join(root, "DEBIAN"))
+    with open(os.path.join(root, "DEBIAN", "control"), "w") as fob:
+        fob.write(CONTROL.format(version=version))
+    if postinst:
+        path = os.path.join(root, "DEBIAN", "postinst")
+        with open(path, "w") as fob:
+            fob.write(f"#!/bin/sh\n{postinst}\n")
+        os.chmod(path, 0o755)
+    deb = os.path.join(repo, f"{PACKAGE}_{version}_all.deb")
+    subprocess.run(["dpkg-deb", "--build", "--root-owner-group", root, deb],
+                   check=True, capture_output=True)
+    shutil.rmtree(root)
+    return deb
+
+
+def publish(repo: str) -> None:
+    """(Re)write the repo's index"""
+    packages = subprocess.run(["dpkg-scanpackages", "."], cwd=repo,
+                              check=True, capture_output=True, text=True)
+    with open(os.path.join(repo, "Packages"), "w") as fob:
+        fob.write(packages.stdout)
+
+
+def installed() -> str:
+    proc = subprocess.run(
+        ["dpkg-query", "-W", "-f=${Version} ${db:Status-Status}", PACKAGE],
+        capture_output=True, text=True,
+    )
+    return proc.stdout
+
+
+def main() -> None:
+    opts = []
+    try:
+        opts, _ = getopt.gnu_getopt(sys.argv[1:], "hv", ["help", "verbose"])
+    except getopt.GetoptError as e:
+        usage(e)
+
+    verbose = False
+    for opt, _ in opts:
+        if opt in ("-h", "--help"):
+            usage()
+        elif opt in ("-v", "--verbose"):
+            verbose = True
+
+    if os.geteuid() != 0:
+        print("skipped - must be run as root")
+        return
+    for command in ("dpkg-deb", "dpkg-scanpackages", "apt-get"):
+        if not shutil.which(command):
+            print(f"skipped - {command} not found")
+            return
+
+    tmpdir = tempfile.mkdtemp()
+    # apt fetches as the (unprivileged) _apt user
+    os.chmod(tmpdir, 0o755)
+    repo = os.path.join(tmpdir, "repo")
+    os.makedirs(repo)
+    sources = os.path.join(tmpdir, "security.list")
+    with open(sources, "w") as fob:
+        fob.write(f"deb [trusted=yes] file:{repo} ./\n")
+    # as run by the runner, with the defaults in its environment (so the
+    # hook doesn't source /etc/default/inithooks)
+    env = dict(
+        os.environ,
+        PYTHONPATH=SRC,
+        INITHOOKS_DEFAULT=os.path.join(tmpdir, "inithooks"),
+        INITHOOKS_PATH=SRC,
+        SEC_UPDATES="FORCE",
+        SEC_UPDATES_SOURCES=sources,
+    )
+
+    def secupdates() -> int:
+        proc = subprocess.run(
+            [os.path.join(SRC, "firstboot.d", "95secupdates")],
+            capture_output=True, text=True, env=env,
+        )
+        if verbose:
+            print(f"$ 95secupdates -> {proc.returncode}")
+            print(proc.stdout + proc.stderr, end="")
+        return proc.returncode
+
+    failures = []
+
+    def check(what: str, ok: bool) -> None:
+        print(f"{'ok' if ok else 'FAIL':4} {what}")
+        if not ok:
+            failures.append(what)
+
+    try:
+        subprocess.run(["dpkg", "-i", build(repo, "1.0")], check=True,
+                       capture_output=True)
+        os.remove(os.path.join(repo, f"{PACKAGE}_1.0_all.deb"))
+
+        build(repo, "1.1")
+        publish(repo)
+        check("update installed from the file:// repo",
+              secupdates() == 0 and installed() == "1.1 installed")
+
+        build(repo, "1.2", postinst="exit 1")
+        publish(repo)
+        check("failed install reported",
+              secupdates() == 1 and installed() == "1.2 half-configured")
+
+        # dpkg --configure -a fails as well, but doesn't stop the install
+        check("failed dpkg --configure -a, then failed install reported",
+              secupdates() == 1 and installed() == "1.2 half-configured")
+
+        build(repo, "1.3")
+        publish(repo)
+        check("update installed after dpkg --configure -a failed",
+              secupdates() == 0 and installed() == "1.3 installed")
+    finally:
+        subprocess.run(["dpkg", "--purge", "--force-all", PACKAGE],
+                       capture_output=True)
+        # index of the file:// repo, kept by apt-get update
+        lists = "/var/lib/apt/lists"
+        quoted = repo.strip("/").replace("/", "_")
+        for name in os.listdir(lists):
+            if quoted in name:
+                os.remove(os.path.join(lists, name))
+        shutil.rmtree(tmpdir)
+
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/python3
+"""Run inithooks_wait against a fake systemd on a private D-Bus bus - waits
+for boot and for units to stop, woken by the signals the fake emits, and
+times out when they aren't
+
+Needs dbus-daemon and python3-jeepney.
+
+Options:
+
+    --verbose           print inithooks_wait's output and the calls made
+"""
+
+import getopt
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, NoReturn
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+SYSTEMD_BUS_NAME = "org.freedesktop.systemd1"
+SYSTEMD_PATH = "/org/freedesktop/systemd1"
+MANAGER_IFACE = "org.freedesktop.systemd1.Manager"
+UNIT_IFACE = "org.freedesktop.systemd1.Unit"
+PROPERTIES_IFACE = "org.freedesktop.DBus.Properties"
+
+BUS_CONFIG = """<!DOCTYPE busconfig PUBLIC
+ "-//freedesktop//DTD D-BUS Bus Configuration 1.0//EN"
+ "http://www.freedesktop.org/standards/dbus/1.0/busconfig.dtd">
+<busconfig>
+  <type>system</type>
+  <listen>unix:path={path}</listen>
+  <auth>EXTERNAL</auth>
+  <policy context="default">
+    <allow user="*"/>
+    <allow own="*"/>
+    <allow send_type="method_call"/>
+    <allow send_type="signal"/>
+    <allow send_type="method_return"/>
+    <allow send_type="error"/>
+    <allow receive_type="method_call"/>
+    <allow receive_type="signal"/>
+    <allow receive_type="method_return"/>
+    <allow receive_type="error"/>
+  </policy>
+</busconfig>
+"""
+
+
+def usage(msg: str | getopt.GetoptError = "") -> NoReturn:
+    if msg:
+        print(f"Error: {msg}", file=sys.stderr)
+    print(f"Syntax: {sys.argv[0]} [options]", file=sys.stderr)
+    print(__doc__, file=sys.stderr)
+    sys.exit(1)
+
+
+def unit_path(unit: str) -> str:
+    return f"{SYSTEMD_PATH}/unit/{unit.replace('.', '_2e')}"
+
+
+class FakeSystemd(threading.Thread):
+    """systemd's Manager (SystemState, Subscribe, GetUnit) and units'
+    ActiveState; actions set with after_subscribe are run (in this thread,
+    which owns the connection) that many secs after the next Subscribe"""
+
+    def __init__(self, address: str) -> None:
+        from jeepney import message_bus
+        from jeepney.io.blocking import open_dbus_connection
+
+        super().__init__(daemon=True)
+        self.conn = open_dbus_connection(bus=address)
+        self.conn.send_and_get_reply(
+            message_bus.RequestName(SYSTEMD_BUS_NAME)
+        )
+        self.system_state = "running"
+        self.units: dict[str, str] = {}
+        self.after_subscribe: list[tuple[float, Callable[[], None]]] = []
+        self.calls: list[str] = []
+        self._due: list[tuple[float, Callable[[], None]]] = []
+        self._stopping = False
+
+    def stop(self) -> None:
+        self._stopping = True
+        self.join()
+        self.conn.close()
+
+    def boot(self) -> None:
+        from jeepney import DBusAddress, new_signal
+
+        self.system_state = "running"
+        self.conn.send(new_signal(
+            DBusAddress(SYSTEMD_PATH, interface=MANAGER_IFACE),
+            "StartupFinished", "tttttt", (0, 0, 0, 0, 0, 0),
+        ))
+
+    def set_state(self, unit: str, state: str) -> None:
+        from jeepney import DBusAddress, new_signal
+
+        self.units[unit] = state
+        self.conn.send(new_signal(
+            DBusAddress(unit_path(unit), interface=PROPERTIES_IFACE),
+            "PropertiesChanged", "sa{sv}as",
+            (UNIT_IFACE, {"ActiveState": ("s", state)}, []),
+        ))
+
+    def run(self) -> None:
+        from jeepney import MessageType
+
+        while not self._stopping:
+            try:
+                msg = self.conn.receive(timeout=0.05)
+            except TimeoutError:
+                msg = None
+            if msg is not None and (
+                msg.header.message_type == MessageType.method_call
+            ):
+                self._handle(msg)
+            now = time.monotonic()
+            for due in [d for d in self._due if d[0] <= now]:
+                self._due.remove(due)
+                due[1]()
+
+    def _handle(self, msg) -> None:
+        from jeepney import HeaderFields, new_error, new_method_return
+
+        member = msg.header.fields[HeaderFields.member]
+        path = msg.header.fields[HeaderFields.path]
+        self.calls.append(member)
+        paths = {unit_path(unit): unit for unit in self.units}
+        if member == "Get" and path == SYSTEMD_PATH:
+            reply = new_method_return(msg, "v", (("s", self.system_state),))
+        elif member == "Get" and path in paths:
+            reply = new_method_return(
+                msg, "v", (("s", self.units[paths[path]]),)
+            )
+        elif member == "Subscribe":
+            reply = new_method_return(msg)
+            now = time.monotonic()
+            self._due += [(now + delay, action)
+                          for delay, action in self.after_subscribe]
+            self.after_subscribe = []
+        elif member == "GetUnit" and msg.body[0] in self.units:
+            reply = new_method_return(msg, "o", (unit_path(msg.body[0]),))
+        elif member == "GetUnit":
+            reply = new_error(msg, "org.freedesktop.systemd1.NoSuchUnit",
+                              "s", (f"Unit {msg.body[0]} not loaded.",))
+        else:
+            reply = new_error(msg, "org.freedesktop.DBus.Error.UnknownMethod")
+        self.conn.send(reply)
+
+
+def main() -> None:
+    opts = []
+    try:
+        opts, _ = getopt.gnu_getopt(sys.argv[1:], "hv", ["help", "verbose"])
+    except getopt.GetoptError as e:
+        usage(e)
+
+    verbose = False
+    for opt, _ in opts:
+        if opt in ("-h", "--help"):
+            usage()
+        elif opt in ("-v", "--verbose"):
+            verbose = True
+
+    try:
+        import jeepney  # noqa: F401
+    except ImportError:
+        print("skipped - python3-jeepney not installed")
+        return
+    if not shutil.which("dbus-daemon"):
+        print("skipped - dbus-daemon not found")
+        return
+
+    tmpdir = tempfile.mkdtemp()
+    config = os.path.join(tmpdir, "bus.conf")
+    with open(config, "w") as fob:
+        fob.write(BUS_CONFIG.format(path=os.path.join(tmpdir, "bus")))
+    daemon = subprocess.Popen(
+        ["dbus-daemon", f"--config-file={config}", "--nofork",
+         "--print-address"],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+    )
+    assert daemon.stdout is not None
+    address = daemon.stdout.readline().strip()
+    fake = FakeSystemd(address)
+    fake.start()
+    env = dict(os.environ, PYTHONPATH=SRC, DBUS_SYSTEM_BUS_ADDRESS=address)
+
+    def wait(*args: str) -> tuple[int, float]:
+        fake.calls.clear()
+        start = time.monotonic()
+        proc = subprocess.run(
+            [sys.executable, "-m", "libinithooks.inithooks_wait", *args],
+            capture_output=True, text=True, env=env,
+        )
+        elapsed = time.monotonic() - start
+        if verbose:
+            print(f"$ wait {' '.join(args)} -> {proc.returncode}"
+                  f" ({elapsed:.2f}s) calls: {' '.join(fake.calls)}")
+            print(proc.stdout + proc.stderr, end="")
+        return proc.returncode, elapsed
+
+    failures = []
+
+    def check(what: str, ok: bool) -> None:
+        print(f"{'ok' if ok else 'FAIL':4} {what}")
+        if not ok:
+            failures.append(what)
+
+    try:
+        exit_code, _ = wait("boot")
+        check("already booted", exit_code == 0 and "Subscribe" in fake.calls)
+
+        fake.system_state = "starting"
+        fake.after_subscribe = [(0.5, fake.boot)]
+        exit_code, elapsed = wait("--timeout=10", "boot")
+        check("woken by StartupFinished",
+              exit_code == 0 and 0.5 <= elapsed < 5)
+
+        fake.system_state = "starting"
+        exit_code, elapsed = wait("--timeout=0.5", "boot")
+        check("boot times out", exit_code == 2 and elapsed < 5)
+
+        fake.system_state = "running"
+        exit_code, _ = wait("inactive", "missing.service")
+        check("unit not loaded is inactive",
+              exit_code == 0 and "Subscribe" not in fake.calls)
+
+        fake.units["busy.service"] = "deactivating"
+        fake.after_subscribe = [
+            (0.2, lambda: fake.set_state("busy.service", "deactivating")),
+            (0.5, lambda: fake.set_state("busy.service", "inactive")),
+        ]
+        exit_code, elapsed = wait("--timeout=10", "inactive", "busy.service")
+        check("woken by PropertiesChanged once inactive",
+              exit_code == 0 and 0.5 <= elapsed < 5)
+
+        fake.units["busy.service"] = "active"
+        exit_code, elapsed = wait("--timeout=0.5", "inactive", "busy.service")
+        check("inactive times out", exit_code == 2 and elapsed < 5)
+
+        fake.units["busy.service"] = "failed"
+        exit_code, _ = wait("inactive", "busy.service")
+        check("failed unit is inactive", exit_code == 0)
+    finally:
+        fake.stop()
+        daemon.terminate()
+        daemon.wait()
+        shutil.rmtree(tmpdir)
+
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()